@@ -0,0 +1,26 @@
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .profiling import RequestProfile
+    from .tracing import Span
+
+# Set per HTTP request by the deadline middleware; copied into Motor's
+# executor threads along with the rest of the context. The request id may
+# come from the client's X-Request-Id and is only used in logs and headers;
+# Mongo reads are tagged with the server-generated operation id, the one
+# killOp matches, so a client cannot name another request's operations.
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+operation_id_var: ContextVar[Optional[str]] = ContextVar("operation_id", default=None)
+
+# Set by the read preference middleware when the client asks to read its own
+# writes; secondary-preferred collections then fall back to the primary.
+force_primary_var: ContextVar[bool] = ContextVar("force_primary", default=False)
+
+# Set by the profiling middleware while a sampled request runs; read by the
+# Mongo command listener to attach each command to that request's profile.
+profile_var: ContextVar[Optional["RequestProfile"]] = ContextVar("profile", default=None)
+
+# The innermost open tracing span; new spans and Mongo command spans become
+# its children.
+current_span_var: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
@@ -1,18 +1,178 @@
-from pydantic import BaseSettings
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+import contextvars
+import functools
+import os
+from collections import defaultdict
+from typing import Dict, Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.read_preferences import SecondaryPreferred
+from .context import force_primary_var, operation_id_var
+from .profiling import ProfilingCommandListener, profiling_enabled
+from .settings import settings
+from .tracing import TracingCommandListener, tracing_enabled
 
-class Settings(BaseSettings):
-    MONGO_HOST: str
-    MONGO_PORT: int
-    MONGO_DB: str
+MONGO_URI = f"mongodb://{settings.MONGO_HOSTS or f'{settings.MONGO_HOST}:{settings.MONGO_PORT}'}"
+if settings.MONGO_REPLICA_SET:
+    MONGO_URI += f"/?replicaSet={settings.MONGO_REPLICA_SET}"
 
-    class Config:
-        env_file = ".env"
+# Lists, reports and exports tolerate slightly stale data; a secondary that
+# lags more than MONGO_MAX_STALENESS_SECONDS is not picked
+SECONDARY_READS = SecondaryPreferred(max_staleness=settings.MONGO_MAX_STALENESS_SECONDS)
 
+_client: Optional[AsyncIOMotorClient] = None
 
-settings = Settings()
 
-MONGO_URI = f"mongodb://{settings.MONGO_HOST}:{settings.MONGO_PORT}"
+def _event_listeners() -> list:
+    listeners = []
+    if profiling_enabled():
+        listeners.append(ProfilingCommandListener())
+    if tracing_enabled():
+        listeners.append(TracingCommandListener())
+    return listeners
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[settings.MONGO_DB]
+
+def get_client() -> AsyncIOMotorClient:
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            MONGO_URI,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            event_listeners=_event_listeners(),
+        )
+    return _client
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    return get_client()[settings.MONGO_DB]
+
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def _discard_client_after_fork() -> None:
+    # The parent's sockets and monitor threads are not usable in the child,
+    # so forget the client instead of closing it and let the worker open its own.
+    global _client
+    _client = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_discard_client_after_fork)
+
+
+# Read commands are tagged with the request's operation id so they can be found
+# and killed with killOp when the HTTP client goes away
+COMMENTED_METHODS = {"find", "find_one", "aggregate", "count_documents", "distinct"}
+
+
+def _with_comment(method, operation_id: str):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        kwargs.setdefault("comment", operation_id)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+# Collections read by cached queries: every write to them bumps a generation
+# counter, so the query cache can tell its entries are out of date
+GENERATION_COLLECTIONS = {
+    "authors", "books", "categories", "holdings", "libraries", "rentals", "users", "user_rental_reports",
+}
+GENERATIONS_COLLECTION = "cache_generations"
+WRITE_METHODS = {
+    "insert_one", "insert_many", "replace_one", "update_one", "update_many", "delete_one", "delete_many",
+    "bulk_write", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+}
+
+# Bumped on every write, before the shared counter, so this process never
+# serves its own writes stale even if the shared bump fails
+local_generations: Dict[str, int] = defaultdict(int)
+
+
+def generations_enabled() -> bool:
+    return settings.QUERY_CACHE_SIZE > 0
+
+
+async def _bump_shared_generation(name: str) -> None:
+    await get_database()[GENERATIONS_COLLECTION].update_one(
+        {"_id": name}, {"$inc": {"generation": 1}}, upsert=True
+    )
+
+
+async def bump_generation(name: str) -> None:
+    """Marks ``name`` as written to, for this process and for the others.
+
+    The shared bump runs in an empty context, shielded, so a spent request
+    budget or a client disconnect does not skip it. If it fails anyway the
+    error propagates: other processes would go on serving entries older
+    than the write, so the caller must not report it as done.
+    """
+    local_generations[name] += 1
+    await asyncio.shield(asyncio.get_running_loop().create_task(
+        _bump_shared_generation(name), context=contextvars.Context()
+    ))
+
+
+def _bumping_generation(method, name: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            # Also after a failed write, which may have been partly applied.
+            # A failed bump replaces the write's result or error
+            await bump_generation(name)
+    return wrapper
+
+
+class LazyCollection:
+    """Resolves the Motor collection on every access, so module-level
+    ``collection = db.books`` handles always use the current process' client.
+
+    Handles read from and write to the primary. ``secondary_preferred()``
+    returns a handle for heavy reads that may be served by a secondary.
+    Writes to ``GENERATION_COLLECTIONS`` bump the collection's generation
+    once they complete, whichever service issued them.
+    """
+
+    def __init__(self, name: str, secondary: bool = False):
+        self.name = name
+        self.secondary = secondary
+
+    def secondary_preferred(self) -> "LazyCollection":
+        return LazyCollection(self.name, secondary=True)
+
+    def resolve(self):
+        if self.secondary and settings.MONGO_SECONDARY_READS and not force_primary_var.get():
+            return get_database().get_collection(self.name, read_preference=SECONDARY_READS)
+        return get_database()[self.name]
+
+    def __getattr__(self, attr):
+        value = getattr(self.resolve(), attr)
+
+        if attr in WRITE_METHODS and self.name in GENERATION_COLLECTIONS and generations_enabled():
+            return _bumping_generation(value, self.name)
+
+        operation_id = operation_id_var.get()
+        if operation_id and attr in COMMENTED_METHODS:
+            return _with_comment(value, operation_id)
+
+        return value
+
+
+class LazyDatabase:
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return LazyCollection(name)
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        return LazyCollection(name)
+
+
+db = LazyDatabase()
@@ -0,0 +1,32 @@
+import sys
+from fastapi import HTTPException
+from pymongo.errors import ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WTimeoutError
+from .settings import settings
+
+# Raised by pymongo once the request's time budget (pymongo.timeout) runs out
+MONGO_TIMEOUT_ERRORS = (ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WTimeoutError)
+
+
+def route_deadlines() -> dict:
+    return {
+        "reports": settings.DEADLINE_REPORTS_SECONDS,
+        "lists": settings.DEADLINE_LISTS_SECONDS,
+        "lookups": settings.DEADLINE_LOOKUPS_SECONDS,
+        "writes": settings.DEADLINE_WRITES_SECONDS,
+    }
+
+
+def database_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Database unavailable",
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)}
+    )
+
+
+def deadline_exceeded() -> HTTPException:
+    # Raised from ``except MONGO_TIMEOUT_ERRORS`` blocks; when no server could
+    # be selected the database is down, not the request out of time
+    if isinstance(sys.exc_info()[1], ServerSelectionTimeoutError):
+        return database_unavailable()
+    return HTTPException(status_code=504, detail="Request time budget exceeded")
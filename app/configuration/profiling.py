@@ -0,0 +1,208 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from datetime import datetime
+from pymongo import monitoring
+from .context import profile_var
+from .settings import settings
+
+MAX_STACKS = 1000
+
+
+def profiling_enabled() -> bool:
+    # Profiles are only readable with the token, so without one nothing is captured
+    return bool(settings.PROFILING_TOKEN)
+
+
+def _label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_qualname}"
+
+
+def _running_stack(frame, root) -> List[str]:
+    """Frames from the task's outermost coroutine down to ``frame``; the event
+    loop frames above it are the same for every request and are dropped."""
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _suspended_stack(coroutine) -> List[str]:
+    # A suspended coroutine has no f_back chain; follow what each one awaits instead
+    stack = []
+    while coroutine is not None:
+        frame = getattr(coroutine, "cr_frame", None) or getattr(coroutine, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_label(frame))
+        coroutine = getattr(coroutine, "cr_await", None) or getattr(coroutine, "gi_yieldfrom", None)
+    return stack
+
+
+class RequestProfile:
+    """Wall-clock stack samples and Mongo commands of one profiled request.
+
+    Samples taken while the request's task runs record its Python stack;
+    samples taken while it is suspended record the await chain ending in
+    ``(waiting)``, so time spent waiting on Mongo shows up in the flamegraph
+    next to the CPU time. Each sample is weighted by the microseconds since
+    the previous one: a CPU-bound request holds the GIL and is sampled less
+    often than one that waits, and the weights keep both in proportion.
+    """
+
+    def __init__(self, method: str, path: str, trigger: str, request_id: Optional[str] = None):
+        self.id = ObjectId()
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.request_id = request_id
+        self.status_code: Optional[int] = None
+
+        self.task = asyncio.current_task()
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+
+        self.created_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self.duration = 0.0
+
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.commands: List[dict] = []
+        self.commands_dropped = 0
+        self._pending: Dict[int, Tuple[float, dict]] = {}
+
+    def sample(self, frames: dict, micros: int) -> None:
+        if self.task is None or self.task.done():
+            return
+
+        root = self.task.get_coro()
+        if asyncio.current_task(self.loop) is self.task:
+            stack = _running_stack(frames.get(self.thread_id), root.cr_frame)
+        else:
+            stack = _suspended_stack(root) + ["(waiting)"]
+
+        if stack:
+            self.stacks[";".join(stack)] += micros
+            self.samples += 1
+
+    def command_started(self, event: monitoring.CommandStartedEvent) -> None:
+        if len(self.commands) + len(self._pending) >= settings.PROFILING_MAX_COMMANDS:
+            self.commands_dropped += 1
+            return
+
+        target = event.command.get(event.command_name)
+        self._pending[event.request_id] = (time.perf_counter(), {
+            "command": event.command_name,
+            "database": event.database_name,
+            "collection": target if isinstance(target, str) else None,
+        })
+
+    def command_finished(self, event, error: Optional[str] = None) -> None:
+        pending = self._pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        started, command = pending
+        self.commands.append({
+            **command,
+            "offset_ms": round((started - self._started) * 1000, 3),
+            "duration_ms": round(event.duration_micros / 1000, 3),
+            "error": error,
+        })
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._started
+        self.task = None
+
+    def to_document(self) -> dict:
+        return {
+            "_id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "request_id": self.request_id,
+            "status_code": self.status_code,
+            "pid": os.getpid(),
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": settings.PROFILING_INTERVAL_SECONDS * 1000,
+            "samples": self.samples,
+            "stacks": [{"stack": stack, "micros": micros} for stack, micros in self.stacks.most_common(MAX_STACKS)],
+            "commands": sorted(self.commands, key=lambda command: command["offset_ms"]),
+            "commands_dropped": self.commands_dropped,
+        }
+
+
+class StackSampler:
+    """One daemon thread that samples every profile in progress each
+    ``interval`` seconds; it exits when none is left and restarts on demand."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: Set[RequestProfile] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def discard(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            micros, last = int((now - last) * 1_000_000), now
+            for profile in profiles:
+                try:
+                    profile.sample(frames, micros)
+                except Exception:
+                    # The loop thread moves on while it is being sampled; skip the sample
+                    pass
+
+
+class ProfilingCommandListener(monitoring.CommandListener):
+    """Records the Mongo commands of profiled requests. Motor runs pymongo
+    with a copy of the caller's context, so ``profile_var`` is visible here."""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        profile = profile_var.get()
+        if profile is not None:
+            profile.command_started(event)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        profile = profile_var.get()
+        if profile is not None:
+            profile.command_finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        profile = profile_var.get()
+        if profile is not None:
+            failure = event.failure if isinstance(event.failure, dict) else {}
+            profile.command_finished(event, error=failure.get("errmsg") or "failed")
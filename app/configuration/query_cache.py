@@ -0,0 +1,138 @@
+import copy
+import functools
+import inspect
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+from .context import current_span_var, force_primary_var
+from .database import GENERATION_COLLECTIONS, GENERATIONS_COLLECTION, db, generations_enabled, local_generations
+from .settings import settings
+
+
+class QueryCache:
+    """Size-bounded LRU of query results.
+
+    Keys carry the generations of the collections a result was read from,
+    so an entry is never looked up again once any of them is written to;
+    stale entries are not removed, they age out of the LRU.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits_total": self.hits, "misses_total": self.misses}
+
+
+query_cache = QueryCache(settings.QUERY_CACHE_SIZE)
+
+generations_collection = db[GENERATIONS_COLLECTION]
+
+
+async def get_generations(collections: Tuple[str, ...]) -> Tuple[Tuple[int, int], ...]:
+    """Shared and local generation of each collection. The shared ones are
+    read from the primary on every lookup, so a write by any process is seen
+    by the next lookup in all of them."""
+    found = {
+        document["_id"]: document["generation"]
+        async for document in generations_collection.find({"_id": {"$in": list(collections)}})
+    }
+    return tuple((found.get(name, 0), local_generations[name]) for name in collections)
+
+
+def _freeze(value) -> Hashable:
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def _expanded_collections(expansions: Optional[Dict[str, Any]], expand: Optional[str]) -> Iterable[str]:
+    if not expansions or not expand:
+        return ()
+    return {expansions[field].collection for field in (part.strip() for part in expand.split(",")) if field in expansions}
+
+
+def cached(*collections: str, expansions: Optional[Dict[str, Any]] = None):
+    """Caches the results of an async query function in ``query_cache``.
+
+    ``collections`` are the collections the query reads; with
+    ``expansions``, the ones its ``expand`` argument pulls in are added per
+    call. Calls with the same arguments, defaults filled in, share an entry
+    until one of those collections is written to. Misses are computed on the
+    primary, since a lagging secondary would pin old data under the new
+    generation. Results are copied in and out, so callers may modify them.
+    Without ``QUERY_CACHE_SIZE`` the function is returned unchanged.
+    """
+    unknown = set(collections).union(*(
+        {expansion.collection} for expansion in (expansions or {}).values()
+    )) - GENERATION_COLLECTIONS
+    if unknown:
+        raise ValueError(f"Writes to {', '.join(sorted(unknown))} do not bump a generation")
+
+    def decorate(function):
+        if not generations_enabled():
+            return function
+
+        signature = inspect.signature(function)
+        name = f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+
+            depends = tuple(sorted({*collections, *_expanded_collections(expansions, arguments.arguments.get("expand"))}))
+            key = (name, _freeze(arguments.arguments), depends, await get_generations(depends))
+
+            span = current_span_var.get()
+            found, result = query_cache.get(key)
+            if span is not None:
+                span.set_attribute("app.cache", "hit" if found else "miss")
+            if found:
+                return copy.deepcopy(result)
+
+            token = force_primary_var.set(True)
+            try:
+                result = await function(*args, **kwargs)
+            finally:
+                force_primary_var.reset(token)
+
+            query_cache.put(key, copy.deepcopy(result))
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def render_metrics() -> str:
+    stats = query_cache.stats()
+    return "\n".join([
+        "# TYPE query_cache_entries gauge",
+        f"query_cache_entries {stats['entries']}",
+        "# TYPE query_cache_hits_total counter",
+        f"query_cache_hits_total {stats['hits_total']}",
+        "# TYPE query_cache_misses_total counter",
+        f"query_cache_misses_total {stats['misses_total']}",
+    ]) + "\n"
@@ -0,0 +1,124 @@
+from typing import Optional
+from pydantic import BaseSettings, Field
+
+
+class Settings(BaseSettings):
+    MONGO_HOST: str
+    MONGO_PORT: int
+    MONGO_DB: str
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_POOL_SIZE: int = 100
+    # Replica set: comma-separated host:port seeds replace MONGO_HOST/MONGO_PORT
+    MONGO_HOSTS: Optional[str] = None
+    MONGO_REPLICA_SET: Optional[str] = None
+    MONGO_SECONDARY_READS: bool = True
+    MONGO_MAX_STALENESS_SECONDS: int = Field(90, ge=90)
+
+    APP_HOST: str = "0.0.0.0"
+    APP_PORT: int = 8000
+    APP_WORKERS: Optional[int] = None
+    APP_MAX_WORKERS: int = 8
+    APP_KEEP_ALIVE: int = 5
+    APP_BACKLOG: int = 2048
+    APP_GRACEFUL_SHUTDOWN: int = 30
+
+    # Startup: ping and index creation are retried until they succeed; the
+    # warm-up (pool, prefix indexes, hot pages, analytics) is restarted every
+    # STARTUP_WARMUP_SECONDS until it completes, and /health/ready reports
+    # ready only then. With STARTUP_READY_ON_WARMUP_TIMEOUT the process goes
+    # ready after the first timed-out attempt instead
+    STARTUP_RETRY_SECONDS: float = 2.0
+    STARTUP_WARMUP_SECONDS: float = 30.0
+    STARTUP_READY_ON_WARMUP_TIMEOUT: bool = False
+    STARTUP_PRELOAD: bool = True
+
+    RECOMMENDATIONS_REFRESH_SECONDS: int = 0
+    AUTOCOMPLETE_REBUILD_SECONDS: int = 300
+    ANALYTICS_REFRESH_SECONDS: int = 300
+
+    # populate-books write-behind: off, async (ack before the write) or
+    # durable (ack after the batched write)
+    READ_BUFFER_MODE: str = Field("off", regex="^(off|async|durable)$")
+    READ_BUFFER_FLUSH_SECONDS: float = 1.0
+    READ_BUFFER_FLUSH_SIZE: int = 1000
+    READ_BUFFER_MAX_PENDING: int = 50000
+
+    # expand=: list references (libraries, books, readed_books) resolve at
+    # most this many items per document
+    EXPAND_MAX_LIST_ITEMS: int = 20
+
+    # Query cache for lists and the books/authors and users/rentals reports;
+    # 0 disables it. Entries are dropped as soon as a collection they read is
+    # written to, by this or any other process
+    QUERY_CACHE_SIZE: int = 0
+
+    JOB_WORKERS: int = 2
+    JOB_QUEUE_SIZE: int = 100
+    JOB_RESULT_CHUNK_SIZE: int = 1000
+    JOB_TIMEOUT_SECONDS: int = 600
+    JOB_RETENTION_SECONDS: int = 86400
+    # How often persisted jobs that are not in this process' queue are picked up
+    JOB_POLL_SECONDS: float = 5.0
+
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_IN_FLIGHT: int = 4
+    IMPORT_MAX_ERRORS: int = 1000
+    # Longer lines (and quoted CSV records) are skipped and recorded as
+    # errors instead of being buffered whole
+    IMPORT_MAX_LINE_BYTES: int = 1048576
+
+    SNAPSHOT_DIR: str = "snapshots"
+    SNAPSHOT_PARTITIONS: int = 4
+    SNAPSHOT_BATCH_SIZE: int = 10000
+
+    REPORT_REFRESH_SECONDS: int = 60
+    REPORT_REFRESH_BATCH: int = 1000
+    # One worker refreshes the report at a time; if it stops renewing its
+    # lease for this long, another worker takes over. Keep it above the
+    # slowest incremental refresh
+    REPORT_REFRESH_LEASE_SECONDS: int = 300
+    REPORT_FULL_REBUILD_THRESHOLD: int = 50000
+
+    # Profiling: requests carrying X-Profile-Token (and a PROFILING_SAMPLE_RATE
+    # share of the rest) are sampled and kept for /debug/profiles
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_SAMPLE_RATE: float = Field(0.0, ge=0, le=1)
+    PROFILING_INTERVAL_SECONDS: float = 0.005
+    PROFILING_MAX_CONCURRENT: int = 4
+    PROFILING_MAX_COMMANDS: int = 1000
+    PROFILING_MAX_PROFILES: int = 200
+    PROFILING_RETENTION_SECONDS: int = 86400
+
+    # Tracing: spans for routes, services and Mongo commands, exported with
+    # none, file, otlp-http or a module:Class SpanExporter. Slow, failed and
+    # upstream-sampled traces are always kept, plus a TRACING_SAMPLE_RATE share
+    TRACING_EXPORTER: str = "none"
+    TRACING_SERVICE_NAME: str = "library-api"
+    TRACING_FILE: str = "traces/traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_SLOW_SECONDS: float = 1.0
+    TRACING_SAMPLE_RATE: float = Field(0.0, ge=0, le=1)
+    TRACING_MAX_SPANS: int = 1000
+    TRACING_QUEUE_SIZE: int = 1000
+
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_ADAPTIVE: bool = False
+    ADMISSION_REPORTS_LIMIT: int = 4
+    ADMISSION_LISTS_LIMIT: int = 32
+    ADMISSION_LOOKUPS_LIMIT: int = 64
+    ADMISSION_WRITES_LIMIT: int = 32
+    ADMISSION_QUEUE_FACTOR: int = 2
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+    ADMISSION_RETRY_AFTER: int = 1
+
+    DEADLINE_REPORTS_SECONDS: float = 30
+    DEADLINE_LISTS_SECONDS: float = 10
+    DEADLINE_LOOKUPS_SECONDS: float = 3
+    DEADLINE_WRITES_SECONDS: float = 10
+    DEADLINE_MAX_SECONDS: float = 60
+
+    class Config:
+        env_file = ".env"
+
+
+settings = Settings()
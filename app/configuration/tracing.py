@@ -0,0 +1,389 @@
+import functools
+import importlib
+import inspect
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Union
+from pymongo import monitoring
+from .context import current_span_var
+from .settings import settings
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def tracing_enabled() -> bool:
+    return settings.TRACING_EXPORTER != "none"
+
+
+class SpanContext(NamedTuple):
+    """A parent span that lives in another process, read from ``traceparent``."""
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    match = TRACEPARENT.match((value or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+class Trace:
+    """Spans of one trace recorded in this process. They are held until the
+    local root span ends, when the whole trace is kept or dropped at once."""
+
+    def __init__(self, trace_id: str, sampled: bool = False):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.dropped_spans = 0
+        self.has_error = False
+
+
+class Span:
+    def __init__(self, name: str, kind: int, trace: Trace, parent_id: Optional[str], attributes: Optional[dict] = None):
+        self.name = name
+        self.kind = kind
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+        if len(trace.spans) < settings.TRACING_MAX_SPANS:
+            trace.spans.append(self)
+        else:
+            trace.dropped_spans += 1
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: Union[BaseException, str]) -> None:
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+        self.trace.has_error = True
+
+    def finish(self) -> None:
+        self.end_ns = time.time_ns()
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    return {"key": key, "value": _otlp_value(value)}
+
+
+def to_otlp_request(traces: List[Trace]) -> dict:
+    """An OTLP/JSON ``ExportTraceServiceRequest`` holding ``traces``."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _otlp_attribute("service.name", settings.TRACING_SERVICE_NAME),
+                _otlp_attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [span.to_otlp() for trace in traces for span in trace.spans],
+            }],
+        }]
+    }
+
+
+# -- EXPORTERS --
+# Called from the export thread with the traces the tail sampler kept
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, traces: List[Trace]) -> None:
+        ...
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends one OTLP/JSON request per line, the format read by the
+    OpenTelemetry Collector's ``otlpjsonfile`` receiver."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.TRACING_FILE
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, traces: List[Trace]) -> None:
+        with open(self.path, "a") as file:
+            file.write(json.dumps(to_otlp_request(traces), separators=(",", ":")) + "\n")
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """Posts OTLP/JSON to a collector's ``/v1/traces`` endpoint."""
+
+    def __init__(self, endpoint: Optional[str] = None):
+        self.endpoint = endpoint or settings.TRACING_OTLP_ENDPOINT
+
+    def export(self, traces: List[Trace]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(to_otlp_request(traces)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=10):
+            pass
+
+
+EXPORTERS = {
+    "file": FileSpanExporter,
+    "otlp-http": OtlpHttpSpanExporter,
+}
+
+
+def load_exporter(name: str) -> SpanExporter:
+    """One of ``EXPORTERS`` or a ``module:Class`` path to a ``SpanExporter``."""
+    if name in EXPORTERS:
+        return EXPORTERS[name]()
+    module, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module), attribute)()
+
+
+class ExportQueue:
+    """Hands kept traces to the exporter on a daemon thread, in batches, so
+    exporting never blocks the event loop. A full queue drops traces."""
+
+    def __init__(self, exporter: SpanExporter, size: int, batch_size: int = 64):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+            return
+
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                print(f"⚠️ Falha ao exportar traces: {e}")
+
+
+_export_queue: Optional[ExportQueue] = None
+
+
+def _keep(trace: Trace, root: Span) -> bool:
+    """Tail sampling: the decision is taken once the root span has ended."""
+    if trace.sampled or trace.has_error:
+        return True
+    if (root.end_ns - root.start_ns) / 1e9 >= settings.TRACING_SLOW_SECONDS:
+        return True
+    return random.random() < settings.TRACING_SAMPLE_RATE
+
+
+def _finish_trace(trace: Trace, root: Span) -> None:
+    global _export_queue
+    if not tracing_enabled() or not _keep(trace, root):
+        return
+    if _export_queue is None:
+        _export_queue = ExportQueue(load_exporter(settings.TRACING_EXPORTER), settings.TRACING_QUEUE_SIZE)
+    _export_queue.put(trace)
+
+
+def _open_span(name: str, kind: int, parent: Union[Span, SpanContext, None], attributes: Optional[dict]) -> Span:
+    parent = parent or current_span_var.get()
+    if isinstance(parent, Span):
+        return Span(name, kind, parent.trace, parent.span_id, attributes)
+    if isinstance(parent, SpanContext):
+        return Span(name, kind, Trace(parent.trace_id, parent.sampled), parent.span_id, attributes)
+    return Span(name, kind, Trace(os.urandom(16).hex()), None, attributes)
+
+
+def _close_span(span: Span) -> None:
+    span.finish()
+    if span.trace.spans and span.trace.spans[0] is span:
+        _finish_trace(span.trace, span)
+
+
+@contextmanager
+def start_span(
+    name: str,
+    kind: int = INTERNAL,
+    parent: Union[Span, SpanContext, None] = None,
+    attributes: Optional[dict] = None
+) -> Iterator[Span]:
+    """Runs the block in a new span, child of ``parent`` or else of the
+    current span. A span without a local parent is the root of its trace
+    and triggers the sampling decision when it ends."""
+    span = _open_span(name, kind, parent, attributes)
+    token = current_span_var.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        current_span_var.reset(token)
+        _close_span(span)
+
+
+def current_traceparent() -> Optional[str]:
+    span = current_span_var.get()
+    return span.traceparent if span else None
+
+
+def traced(function):
+    """Runs every call of an async service function in a span named after
+    it, e.g. ``book_service.create_book``. Without tracing the function is
+    returned unchanged."""
+    if not tracing_enabled():
+        return function
+
+    name = f"{function.__module__.rsplit('.', 1)[-1]}.{function.__qualname__}"
+
+    if inspect.isasyncgenfunction(function):
+        @functools.wraps(function)
+        async def generator_wrapper(*args, **kwargs):
+            # The span is current only while the generator runs, not while
+            # the caller handles the items it yields
+            span = _open_span(name, INTERNAL, None, None)
+            generator = function(*args, **kwargs)
+            items = 0
+            try:
+                while True:
+                    token = current_span_var.set(span)
+                    try:
+                        item = await generator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        current_span_var.reset(token)
+                    items += 1
+                    yield item
+            except GeneratorExit:
+                await generator.aclose()
+                raise
+            except BaseException as e:
+                span.record_error(e)
+                raise
+            finally:
+                span.set_attribute("app.items", items)
+                _close_span(span)
+        return generator_wrapper
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        with start_span(name):
+            return await function(*args, **kwargs)
+    return wrapper
+
+
+def _pipeline_stages(pipeline) -> List[str]:
+    stages = []
+    for stage in pipeline if isinstance(pipeline, list) else []:
+        for operator, spec in stage.items():
+            if operator == "$lookup" and isinstance(spec, dict):
+                operator = f"$lookup({spec.get('from')})"
+            stages.append(operator)
+    return stages
+
+
+class TracingCommandListener(monitoring.CommandListener):
+    """Opens a client span per Mongo command issued inside a traced request.
+
+    Motor runs pymongo with a copy of the caller's context, so the current
+    span is visible here. Commands outside any span (startup, background
+    loops) are not traced.
+    """
+
+    def __init__(self):
+        self._spans: Dict[int, Span] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        parent = current_span_var.get()
+        if parent is None:
+            return
+
+        target = event.command.get(event.command_name)
+        attributes = {
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.collection": target if isinstance(target, str) else None,
+        }
+        if event.command_name == "aggregate":
+            attributes["db.mongodb.pipeline"] = _pipeline_stages(event.command.get("pipeline"))
+        if isinstance(event.connection_id, tuple):
+            attributes["net.peer.name"], attributes["net.peer.port"] = event.connection_id[:2]
+
+        self._spans[event.request_id] = Span(
+            f"mongodb.{event.command_name}", CLIENT, parent.trace, parent.span_id, attributes
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        span = self._spans.pop(event.request_id, None)
+        if span is not None:
+            span.finish()
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        span = self._spans.pop(event.request_id, None)
+        if span is not None:
+            failure = event.failure if isinstance(event.failure, dict) else {}
+            span.record_error(failure.get("errmsg") or "failed")
+            span.finish()
@@ -0,0 +1,23 @@
+import argparse
+import asyncio
+from typing import List
+from app.configuration.database import close_client
+from app.services.snapshot_service import SNAPSHOT_SCHEMAS, export_collection
+
+
+async def main(collections: List[str], incremental: bool) -> None:
+    try:
+        for name in collections:
+            directory, rows = await export_collection(name, incremental=incremental)
+            print(f"🗂️ {name}: {rows} documentos exportados para {directory}")
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export collections to Parquet snapshots for analytics.")
+    parser.add_argument("collections", nargs="*", choices=list(SNAPSHOT_SCHEMAS), help="Defaults to all of them")
+    parser.add_argument("--incremental", action="store_true", help="Only export changes since the last snapshot")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.collections or list(SNAPSHOT_SCHEMAS), args.incremental))
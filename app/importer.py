@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import os
+from typing import AsyncIterator
+from app.configuration.database import close_client
+from app.services import book_service, import_service, isbn_service
+from app.services.import_service import IMPORT_FORMATS, IMPORT_KINDS, run_import
+
+CHUNK_SIZE = 1 << 20
+
+
+async def read_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while True:
+            chunk = await asyncio.to_thread(file.read, CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def main(kind: str, path: str, format: str, resume: str = None) -> None:
+    try:
+        await book_service.create_indexes()
+        await import_service.create_indexes()
+        await isbn_service.create_indexes()
+        try:
+            await isbn_service.rebuild_isbn_filter()
+        except Exception as e:
+            # Without the filter every ISBN is checked against the index
+            print(f"⚠️ Filtro de ISBN não construído: {e}")
+
+        job = await run_import(kind, format, read_chunks(path), source=os.path.basename(path), import_id=resume)
+        print(
+            f"📦 Importação {job.id} ({job.status}): {job.rows_read} linhas lidas, "
+            f"{job.inserted} inseridas, {job.duplicates} duplicadas, {job.failed} com erro"
+        )
+        if job.status != "done":
+            print(f"⚠️ {job.error} — retome com --resume {job.id}")
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a CSV or JSONL file into the library database.")
+    parser.add_argument("kind", choices=list(IMPORT_KINDS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--resume", help="ID of an interrupted import to resume")
+    args = parser.parse_args()
+
+    format = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+    if format not in IMPORT_FORMATS:
+        parser.error("could not infer the format from the file extension, use --format")
+
+    asyncio.run(main(args.kind, args.path, format, args.resume))
@@ -1,6 +1,37 @@
-from fastapi import FastAPI
-from app.configuration.database import client
-from app.routers import book_router, library_router, user_router, category_router, author_router
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import ServerSelectionTimeoutError
+from app.configuration.database import close_client
+from app.configuration.deadlines import MONGO_TIMEOUT_ERRORS
+from app.configuration.profiling import profiling_enabled
+from app.configuration.settings import settings
+from app.configuration.tracing import tracing_enabled
+from app.middlewares.admission import AdmissionControlMiddleware
+from app.middlewares.deadline import DeadlineMiddleware
+from app.middlewares.profiling import ProfilingMiddleware
+from app.middlewares.read_preference import ReadPreferenceMiddleware
+from app.middlewares.tracing import TracingMiddleware
+from app.routers import analytics_router, book_router, library_router, user_router, category_router, author_router, holding_router, import_router, job_router, metrics_router, debug_router, health_router
+from app.services import (
+    analytics_service,
+    author_service,
+    autocomplete_service,
+    book_service,
+    category_service,
+    health_service,
+    holding_service,
+    import_service,
+    isbn_service,
+    job_service,
+    library_service,
+    profile_service,
+    recommendation_service,
+    read_buffer_service,
+    rental_report_service,
+    rental_service,
+    user_service
+)
 
 app = FastAPI(
     title="Library System API",
@@ -9,20 +40,163 @@ app = FastAPI(
     docs_url="/swagger",
 )
 
+# -- MIDDLEWARES --
+# Added innermost first: admission control wraps the deadline budget, and the
+# read preference is set before the deadline middleware spawns the handler.
+# Profiling runs inside the handler task so it samples only that request.
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(ReadPreferenceMiddleware)
+
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Outermost, so the server span includes time spent queued for admission
+if tracing_enabled():
+    app.add_middleware(TracingMiddleware)
+
+# -- EXCEPTION HANDLERS --
+async def mongo_timeout_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=504, content={"detail": "Request time budget exceeded"})
+
+async def mongo_unavailable_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database unavailable"},
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)}
+    )
+
+# No selectable server means the database is down, not that the budget ran out
+for error in MONGO_TIMEOUT_ERRORS:
+    app.add_exception_handler(
+        error, mongo_unavailable_handler if error is ServerSelectionTimeoutError else mongo_timeout_handler
+    )
+
 # -- ROUTERS --
 app.include_router(book_router.router, prefix="/books", tags=["Books"])
 app.include_router(library_router.router, prefix="/libraries", tags=["Libraries"])
 app.include_router(user_router.router, prefix="/users", tags=["Users"])
 app.include_router(author_router.router, prefix="/authors", tags=["Authors"])
 app.include_router(category_router.router, prefix="/categories", tags=["Categories"])
+app.include_router(holding_router.router, prefix="/holdings", tags=["Holdings"])
+app.include_router(import_router.router, prefix="/imports", tags=["Imports"])
+app.include_router(job_router.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(analytics_router.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(metrics_router.router, prefix="/metrics", tags=["Metrics"])
+app.include_router(debug_router.router, prefix="/debug", tags=["Debug"])
+app.include_router(health_router.router, prefix="/health", tags=["Health"])
+
+background_tasks = []
+
+# Every service that owns indexes; they are created before the process is ready
+INDEXED_SERVICES = [
+    author_service,
+    book_service,
+    category_service,
+    holding_service,
+    import_service,
+    isbn_service,
+    job_service,
+    library_service,
+    profile_service,
+    rental_report_service,
+    rental_service,
+    user_service,
+]
+
+
+async def create_indexes():
+    for service in INDEXED_SERVICES:
+        await service.create_indexes()
+
+
+async def preload_hot_pages():
+    # The first page of each list is what most clients ask for first; reading
+    # it warms the secondaries' connections and the server's cache
+    await book_service.get_all_books(page=1, limit=10)
+    await user_service.get_all_users(page=1, limit=10)
+    await author_service.get_all_authors(page=1, limit=10)
+    await library_service.get_all_libraries(page=1, limit=10)
+    await category_service.get_all_categories(page=1, limit=10)
+
+
+def start_background_loops():
+    if settings.AUTOCOMPLETE_REBUILD_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            autocomplete_service.run_rebuild_loop(settings.AUTOCOMPLETE_REBUILD_SECONDS)
+        ))
+
+    if settings.ANALYTICS_REFRESH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            analytics_service.run_refresh_loop(settings.ANALYTICS_REFRESH_SECONDS)
+        ))
+
+    if settings.READ_BUFFER_MODE != "off":
+        background_tasks.append(asyncio.create_task(
+            read_buffer_service.readed_books_buffer.run_flush_loop(settings.READ_BUFFER_FLUSH_SECONDS)
+        ))
+
+    if settings.REPORT_REFRESH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            rental_report_service.run_refresh_loop(settings.REPORT_REFRESH_SECONDS)
+        ))
+
+    if settings.RECOMMENDATIONS_REFRESH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            recommendation_service.run_refresh_loop(settings.RECOMMENDATIONS_REFRESH_SECONDS)
+        ))
+
+
+async def warm_up():
+    run_step = health_service.run_step
+    await run_step("connection-pool", lambda: health_service.warm_connection_pool(settings.MONGO_MIN_POOL_SIZE))
+    await run_step("title-index", autocomplete_service.title_index.rebuild)
+    await run_step("isbn-filter", isbn_service.rebuild_isbn_filter)
+    if settings.STARTUP_PRELOAD:
+        await run_step("hot-pages", preload_hot_pages)
+    if settings.ANALYTICS_REFRESH_SECONDS > 0:
+        # Loaded by the refresh loop, which starts before the warm-up
+        await run_step("analytics", analytics_service.analytics_store.wait_ready)
+
+
+async def start_up():
+    await health_service.run_step("ping", health_service.ping, required=True)
+    await health_service.run_step("indexes", create_indexes, required=True)
+    print("✅ Conectado ao MongoDB!")
+
+    await job_service.start_workers()
+    start_background_loops()
+
+    while True:
+        try:
+            await asyncio.wait_for(warm_up(), timeout=settings.STARTUP_WARMUP_SECONDS)
+            break
+        except asyncio.TimeoutError:
+            if settings.STARTUP_READY_ON_WARMUP_TIMEOUT:
+                print(f"⚠️ Aquecimento excedeu {settings.STARTUP_WARMUP_SECONDS}s; seguindo sem ele")
+                break
+            print(f"⚠️ Aquecimento excedeu {settings.STARTUP_WARMUP_SECONDS}s; tentando de novo")
+
+    health_service.readiness.mark_ready()
+    print("✅ Pronto para receber tráfego")
 
 @app.on_event("startup")
 async def startup_db_client():
-    print("✅ Conectado ao MongoDB!")
+    # The server accepts connections (and answers /health/live) right away;
+    # /health/ready reports 503 until start_up has finished
+    background_tasks.append(asyncio.create_task(start_up()))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    health_service.readiness.mark_draining()
+    for task in background_tasks:
+        task.cancel()
+    await job_service.stop_workers()
+    # Buffered populate-books ids are written before the client goes away
+    await read_buffer_service.readed_books_buffer.flush()
+    close_client()
     print("🛑 Conexão com MongoDB encerrada!")
 
 # Root path test
@@ -0,0 +1,186 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+from fastapi.responses import JSONResponse
+from ..configuration.settings import settings
+from .routes import classify_route
+
+
+class ConcurrencyLimiter:
+    """Concurrency budget with a bounded FIFO queue for one route class.
+
+    With ``adaptive`` the limit follows a gradient rule: it shrinks when the
+    smoothed latency rises above the best latency seen recently and grows
+    while the class is saturated and latency stays flat.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int,
+        queue_timeout: float,
+        retry_after: int = 1,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+    ):
+        self.name = name
+        self.limit = float(limit)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit * 4
+
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.queue_timeouts = 0
+
+        self._latency_ewma: Optional[float] = None
+        self._latency_floor: Optional[float] = None
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self.waiters if not waiter.done())
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.current_limit and not self.queue_depth:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+        if self.queue_depth >= self.queue_size:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before the client went away
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters and waiter.done():
+                self.waiters.remove(waiter)
+
+        self.admitted += 1
+        return True
+
+    def release(self, latency: Optional[float] = None) -> None:
+        if latency is not None and self.adaptive:
+            self._adapt(latency)
+
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                if self.in_flight <= self.current_limit:
+                    # Hand the slot straight to the next waiter
+                    waiter.set_result(None)
+                    return
+                self.waiters.appendleft(waiter)
+                break
+
+        self.in_flight -= 1
+
+    def _adapt(self, latency: float) -> None:
+        self._latency_ewma = latency if self._latency_ewma is None else 0.9 * self._latency_ewma + 0.1 * latency
+        # Let the floor drift up slowly so it tracks shifts in the baseline
+        self._latency_floor = latency if self._latency_floor is None else min(self._latency_floor * 1.001, latency)
+
+        gradient = max(0.5, min(1.0, 1.5 * self._latency_floor / self._latency_ewma))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        if self.in_flight < self.limit / 2:
+            target = min(target, self.limit)
+        self.limit = min(self.max_limit, max(self.min_limit, 0.8 * self.limit + 0.2 * target))
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted_total": self.admitted,
+            "shed_total": self.shed,
+            "queue_timeouts_total": self.queue_timeouts,
+        }
+
+
+limiters: Dict[str, ConcurrencyLimiter] = {}
+
+
+def default_limiters() -> Dict[str, ConcurrencyLimiter]:
+    for name, limit in (
+        ("reports", settings.ADMISSION_REPORTS_LIMIT),
+        ("lists", settings.ADMISSION_LISTS_LIMIT),
+        ("lookups", settings.ADMISSION_LOOKUPS_LIMIT),
+        ("writes", settings.ADMISSION_WRITES_LIMIT),
+    ):
+        limiters[name] = ConcurrencyLimiter(
+            name,
+            limit=limit,
+            queue_size=limit * settings.ADMISSION_QUEUE_FACTOR,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+            retry_after=settings.ADMISSION_RETRY_AFTER,
+            adaptive=settings.ADMISSION_ADAPTIVE,
+        )
+    return limiters
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app, route_limiters: Optional[Dict[str, ConcurrencyLimiter]] = None):
+        self.app = app
+        self.route_limiters = route_limiters if route_limiters is not None else default_limiters()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limiter = self.route_limiters.get(classify_route(scope["method"], scope["path"]))
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        if not await limiter.acquire():
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server overloaded, try again later"},
+                headers={"Retry-After": str(limiter.retry_after)},
+            )
+            return await response(scope, receive, send)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - started)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric, kind in (
+        ("limit", "gauge"),
+        ("in_flight", "gauge"),
+        ("queue_depth", "gauge"),
+        ("admitted_total", "counter"),
+        ("shed_total", "counter"),
+        ("queue_timeouts_total", "counter"),
+    ):
+        lines.append(f"# TYPE admission_{metric} {kind}")
+        for name, limiter in limiters.items():
+            lines.append(f'admission_{metric}{{route_class="{name}"}} {limiter.stats()[metric]}')
+    return "\n".join(lines) + "\n"
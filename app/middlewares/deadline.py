@@ -0,0 +1,128 @@
+import asyncio
+import uuid
+from contextlib import suppress
+from typing import Optional
+import pymongo
+from ..configuration.context import operation_id_var, request_id_var
+from ..configuration.database import get_client
+from ..configuration.deadlines import route_deadlines
+from ..configuration.settings import settings
+from .routes import STREAMING_PATHS, classify_route
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def kill_operations(operation_id: str) -> None:
+    """Kills the server-side operations tagged with this request's comment."""
+    admin = get_client().admin
+    with pymongo.timeout(5):
+        operations = await admin.aggregate([
+            {"$currentOp": {}},
+            {"$match": {"command.comment": operation_id}},
+            {"$project": {"opid": 1}},
+        ]).to_list(length=None)
+        for operation in operations:
+            await admin.command("killOp", op=operation["opid"])
+
+
+class DeadlineMiddleware:
+    """Gives every request a time budget that pymongo turns into ``maxTimeMS``
+    on each command, and cancels the request when the client disconnects.
+
+    The budget comes from the route class, optionally shortened (or extended
+    up to ``DEADLINE_MAX_SECONDS``) by an ``X-Request-Timeout`` header in seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.deadlines = route_deadlines()
+
+    def budget_for(self, scope) -> Optional[float]:
+        route_class = classify_route(scope["method"], scope["path"])
+        if route_class is None:
+            return None
+
+        budget = self.deadlines.get(route_class, settings.DEADLINE_WRITES_SECONDS)
+        requested = _header(scope, b"x-request-timeout")
+        if requested:
+            with suppress(ValueError):
+                budget = min(max(float(requested), 0.001), settings.DEADLINE_MAX_SECONDS)
+        return budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Streaming uploads own the receive channel and run until the body ends
+        if scope["method"] == "POST" and STREAMING_PATHS.match(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        budget = self.budget_for(scope)
+        if budget is None:
+            return await self.app(scope, receive, send)
+
+        # Buffer the (small JSON) body so the real receive channel is free to
+        # watch for a disconnect while the handler runs
+        body_messages = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body_messages.append(message)
+            if not message.get("more_body", False):
+                break
+
+        disconnected = asyncio.Event()
+
+        async def replay_receive():
+            if body_messages:
+                return body_messages.pop(0)
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        operation_id = uuid.uuid4().hex
+        request_id = _header(scope, b"x-request-id") or operation_id
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]}
+            await send(message)
+
+        request_token = request_id_var.set(request_id)
+        operation_token = operation_id_var.set(operation_id)
+        try:
+            with pymongo.timeout(budget):
+                handler = asyncio.create_task(self.app(scope, replay_receive, send_with_request_id))
+        finally:
+            operation_id_var.reset(operation_token)
+            request_id_var.reset(request_token)
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await asyncio.wait({handler, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            handler.cancel()
+            watcher.cancel()
+            raise
+
+        if handler.done():
+            watcher.cancel()
+            return handler.result()
+
+        disconnected.set()
+        handler.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await handler
+        with suppress(Exception):
+            await kill_operations(operation_id)
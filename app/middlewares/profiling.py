@@ -0,0 +1,74 @@
+import asyncio
+import contextvars
+import random
+from typing import Optional, Set
+from ..configuration.context import profile_var, request_id_var
+from ..configuration.profiling import RequestProfile, StackSampler
+from ..configuration.settings import settings
+from ..services.profile_service import is_authorized, save_profile
+from .routes import EXCLUDED_PATHS
+
+_pending_saves: Set[asyncio.Task] = set()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """Profiles requests that carry ``X-Profile-Token: <PROFILING_TOKEN>`` and
+    a random ``PROFILING_SAMPLE_RATE`` share of the others.
+
+    The request runs as usual while a background thread samples its stack;
+    the profile id is returned in ``X-Profile-Id`` and the profile is stored
+    once the response is sent. At most ``PROFILING_MAX_CONCURRENT`` requests
+    are profiled at a time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.sampler = StackSampler(settings.PROFILING_INTERVAL_SECONDS)
+
+    def trigger_for(self, scope) -> Optional[str]:
+        if EXCLUDED_PATHS.match(scope["path"]):
+            return None
+        if is_authorized(_header(scope, b"x-profile-token")):
+            return "header"
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trigger = self.trigger_for(scope)
+        if trigger is None or len(self.sampler) >= settings.PROFILING_MAX_CONCURRENT:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"], trigger, request_id_var.get())
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", str(profile.id).encode())]}
+            await send(message)
+
+        token = profile_var.set(profile)
+        self.sampler.add(profile)
+        try:
+            return await self.app(scope, receive, send_with_profile_id)
+        finally:
+            self.sampler.discard(profile)
+            profile_var.reset(token)
+            profile.finish()
+
+            # A fresh context keeps the save out of the request's deadline and profile
+            task = asyncio.get_running_loop().create_task(
+                save_profile(profile.to_document()), context=contextvars.Context()
+            )
+            _pending_saves.add(task)
+            task.add_done_callback(_pending_saves.discard)
@@ -0,0 +1,25 @@
+from ..configuration.context import force_primary_var
+
+PRIMARY_VALUES = {"primary", "1", "true"}
+
+
+class ReadPreferenceMiddleware:
+    """Pins every read of the request to the primary when it carries
+    ``X-Read-Preference: primary``, e.g. a client reading back its own write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        for key, value in scope.get("headers", []):
+            if key == b"x-read-preference" and value.decode("latin-1").strip().lower() in PRIMARY_VALUES:
+                token = force_primary_var.set(True)
+                try:
+                    return await self.app(scope, receive, send)
+                finally:
+                    force_primary_var.reset(token)
+
+        return await self.app(scope, receive, send)
@@ -0,0 +1,26 @@
+import re
+from typing import Optional
+
+EXCLUDED_PATHS = re.compile(r"^/($|metrics/?$|debug/|health/|swagger|openapi\.json|docs|redoc)")
+
+# Uploads streamed straight into the handler instead of being buffered
+STREAMING_PATHS = re.compile(r"^/imports/[^/]+/?$")
+
+# First match wins: (method or None for any, path pattern, route class)
+ROUTE_CLASSES = [
+    (None, re.compile(r"^/(books/list-books-authors|users/list-rental-books-libraries|jobs)(/|$)"), "reports"),
+    ("POST", STREAMING_PATHS, "reports"),
+    (None, re.compile(r"^/[^/]+/[^/]+/refresh$"), "reports"),
+    ("GET", re.compile(r"^/[^/]+/?$"), "lists"),
+    ("GET", re.compile(r"^/"), "lookups"),
+    (None, re.compile(r"^/"), "writes"),
+]
+
+
+def classify_route(method: str, path: str) -> Optional[str]:
+    if EXCLUDED_PATHS.match(path):
+        return None
+    for route_method, pattern, route_class in ROUTE_CLASSES:
+        if (route_method is None or route_method == method) and pattern.match(path):
+            return route_class
+    return None
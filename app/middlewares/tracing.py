@@ -0,0 +1,51 @@
+from typing import Optional
+from ..configuration.tracing import SERVER, parse_traceparent, start_span
+from .routes import EXCLUDED_PATHS
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class TracingMiddleware:
+    """Opens the server span of every request, continuing the caller's trace
+    when it sends a W3C ``traceparent`` header.
+
+    The span is named after the matched route template (``GET /books/{book_id}``)
+    so requests for different ids group together. Its ``traceparent`` is
+    returned in the ``traceresponse`` header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or EXCLUDED_PATHS.match(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        parent = parse_traceparent(_header(scope, b"traceparent"))
+        attributes = {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+            "http.request_id": _header(scope, b"x-request-id"),
+        }
+
+        with start_span(f"{scope['method']} {scope['path']}", SERVER, parent, attributes) as span:
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.record_error(f"HTTP {message['status']}")
+                    message = {**message, "headers": [*message.get("headers", []), (b"traceresponse", span.traceparent.encode())]}
+                await send(message)
+
+            try:
+                return await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get("route")
+                if getattr(route, "path", None):
+                    span.name = f"{scope['method']} {route.path}"
+                    span.set_attribute("http.route", route.path)
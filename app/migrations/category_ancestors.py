@@ -0,0 +1,67 @@
+"""Backfills ``categories.ancestors`` level by level from the roots.
+
+Run with ``python -m app.migrations.category_ancestors``. String
+``parent_category`` values written by older versions are converted to
+ObjectIds first.
+"""
+import asyncio
+from pymongo import UpdateOne
+from ..configuration.database import db, close_client
+from ..services.category_service import create_indexes
+
+BATCH_SIZE = 1000
+
+
+async def migrate(batch_size: int = BATCH_SIZE) -> int:
+    await create_indexes()
+
+    await db.categories.update_many(
+        {"parent_category": {"$type": "string"}},
+        [{"$set": {"parent_category": {"$convert": {"input": "$parent_category", "to": "objectId", "onError": None}}}}]
+    )
+    await db.categories.update_many(
+        {"parent_category": None},
+        {"$set": {"ancestors": []}}
+    )
+
+    migrated = 0
+    level = {
+        category["_id"]: []
+        async for category in db.categories.find({"parent_category": None}, {"_id": 1})
+    }
+
+    while level:
+        next_level = {}
+        parents = list(level)
+
+        for start in range(0, len(parents), batch_size):
+            batch = parents[start:start + batch_size]
+            operations = []
+
+            async for child in db.categories.find({"parent_category": {"$in": batch}}, {"parent_category": 1}):
+                ancestors = level[child["parent_category"]] + [child["parent_category"]]
+                if child["_id"] in ancestors:
+                    continue
+                next_level[child["_id"]] = ancestors
+                operations.append(UpdateOne({"_id": child["_id"]}, {"$set": {"ancestors": ancestors}}))
+
+            if operations:
+                await db.categories.bulk_write(operations, ordered=False)
+                migrated += len(operations)
+
+        level = next_level
+        print(f"🌳 {migrated} subcategorias atualizadas")
+
+    return migrated
+
+
+async def main():
+    try:
+        total = await migrate()
+        print(f"✅ Migração concluída: {total} subcategorias")
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
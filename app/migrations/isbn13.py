@@ -0,0 +1,111 @@
+"""Rewrites ``books.isbn`` values to the canonical ISBN-13 form.
+
+Run with ``python -m app.migrations.isbn13``. Legacy ISBN-10s and
+hyphenated or spaced values are normalized like new writes are, so lookups,
+the duplicate check and the unique index see one form. Values that fail the
+checksum, and values whose canonical form already belongs to another book,
+are left in place and listed at the end. Books are processed in ``_id``
+order, so the migration can be re-run after an interruption.
+"""
+import asyncio
+import sys
+from datetime import datetime
+from typing import List, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ..configuration.database import db, close_client
+from ..models.isbn import normalize_isbn
+from ..services.isbn_service import create_indexes
+from ..services.rental_service import DUPLICATE_KEY_ERROR
+
+BATCH_SIZE = 1000
+
+# Anything that is not already 13 plain digits
+LEGACY_ISBN = {"$type": "string", "$not": {"$regex": "^[0-9]{13}$"}}
+
+
+async def migrate(batch_size: int = BATCH_SIZE) -> Tuple[int, List[str], List[str]]:
+    normalized, invalid, conflicts = 0, [], []
+    last_id = None
+
+    while True:
+        query = {"isbn": LEGACY_ISBN}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        books = await db.books.find(query, {"isbn": 1}) \
+            .sort("_id", 1) \
+            .limit(batch_size) \
+            .to_list(length=batch_size)
+
+        if not books:
+            break
+        last_id = books[-1]["_id"]
+
+        raw = {book["_id"]: book["isbn"] for book in books}
+        targets = {}
+        for book_id, value in raw.items():
+            try:
+                isbn = normalize_isbn(value)
+            except ValueError:
+                invalid.append(value)
+                continue
+            targets.setdefault(isbn, book_id)
+            if targets[isbn] != book_id:
+                conflicts.append(f"{value} -> {isbn}")
+
+        # Canonical values already stored on other books stay with those books
+        taken = set(await db.books.distinct("isbn", {"isbn": {"$in": list(targets)}}))
+        for isbn in taken & set(targets):
+            conflicts.append(f"{raw[targets.pop(isbn)]} -> {isbn}")
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": book_id, "isbn": LEGACY_ISBN}, {"$set": {"isbn": isbn, "updated_at": now}})
+            for isbn, book_id in targets.items()
+        ]
+
+        if operations:
+            try:
+                result = await db.books.bulk_write(operations, ordered=False)
+                normalized += result.modified_count
+            except BulkWriteError as e:
+                # Another writer took the canonical value since the check above
+                normalized += e.details["nModified"]
+                for error in e.details["writeErrors"]:
+                    if error["code"] != DUPLICATE_KEY_ERROR:
+                        raise
+                    conflicts.append(f"{raw[error['op']['q']['_id']]} -> {error['op']['u']['$set']['isbn']}")
+
+        print(f"📚 books.isbn: {normalized} normalizados, {len(invalid)} inválidos, {len(conflicts)} em conflito")
+
+    return normalized, invalid, conflicts
+
+
+async def main():
+    index_error = None
+    try:
+        normalized, invalid, conflicts = await migrate()
+        # The unique index could not be built while raw and canonical
+        # duplicates coexisted; retry it now
+        try:
+            await create_indexes()
+        except RuntimeError as e:
+            index_error = e
+    finally:
+        close_client()
+
+    for isbn in invalid[:50]:
+        print(f"   ❓ ISBN inválido: {isbn}", file=sys.stderr)
+    for conflict in conflicts[:50]:
+        print(f"   ⚠️ Duplicado: {conflict}", file=sys.stderr)
+    print(f"✅ {normalized} ISBNs normalizados, {len(invalid)} inválidos, {len(conflicts)} em conflito")
+
+    if index_error:
+        # The conflicts above still share an ISBN; the API stays unready until they are fixed
+        print(f"❌ {index_error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+"""Fills ``libraries.geo`` from a local gazetteer file.
+
+Run with ``python -m app.migrations.library_geo places.csv``. The gazetteer
+is a CSV (or, with ``--delimiter tab``, TSV) with a header naming a place
+column (``name``) and coordinate columns (``latitude``/``lat`` and
+``longitude``/``lng``/``lon``); ``--geonames`` reads a GeoNames dump such as
+``cities15000.txt`` instead, matching names, ASCII names and alternate names.
+
+A library's free-text ``location`` is matched as a whole and then by its
+comma-separated parts, ignoring case and accents. Libraries are processed
+in ``_id`` order, so the backfill can be re-run after an interruption;
+unmatched locations are listed at the end.
+"""
+import argparse
+import asyncio
+import csv
+import re
+import sys
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from pymongo import UpdateOne
+from ..configuration.database import db, close_client
+from ..services.library_service import create_indexes
+
+BATCH_SIZE = 500
+
+NAME_COLUMNS = ("name", "place", "location")
+LATITUDE_COLUMNS = ("latitude", "lat")
+LONGITUDE_COLUMNS = ("longitude", "lng", "lon")
+
+# The largest place wins when a GeoNames name is ambiguous
+GEONAMES_POPULATION = 14
+
+
+def normalize(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name.casefold())
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def _column(header: List[str], candidates: Tuple[str, ...]) -> int:
+    lowered = [column.strip().lower() for column in header]
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered.index(candidate)
+    raise ValueError(f"Gazetteer header needs one of: {', '.join(candidates)}")
+
+
+def _csv_places(file, delimiter: str) -> Iterator[Tuple[List[str], float, float, int]]:
+    reader = csv.reader(file, delimiter=delimiter)
+    header = next(reader)
+    name, latitude, longitude = (
+        _column(header, NAME_COLUMNS), _column(header, LATITUDE_COLUMNS), _column(header, LONGITUDE_COLUMNS)
+    )
+    for row in reader:
+        yield [row[name]], float(row[latitude]), float(row[longitude]), 0
+
+
+def _geonames_places(file) -> Iterator[Tuple[List[str], float, float, int]]:
+    for line in file:
+        row = line.rstrip("\n").split("\t")
+        names = [row[1], row[2], *filter(None, row[3].split(","))]
+        yield names, float(row[4]), float(row[5]), int(row[GEONAMES_POPULATION] or 0)
+
+
+def load_gazetteer(path: str, delimiter: str = ",", geonames: bool = False) -> Dict[str, List[float]]:
+    """Maps normalized place names to GeoJSON ``[longitude, latitude]``."""
+    places: Dict[str, Tuple[List[float], int]] = {}
+    with open(path, encoding="utf-8", newline="") as file:
+        rows = _geonames_places(file) if geonames else _csv_places(file, delimiter)
+        for names, latitude, longitude, population in rows:
+            if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+                continue
+            for name in names:
+                key = normalize(name)
+                if key and (key not in places or population > places[key][1]):
+                    places[key] = ([longitude, latitude], population)
+    return {key: coordinates for key, (coordinates, _) in places.items()}
+
+
+def locate(location: Optional[str], gazetteer: Dict[str, List[float]]) -> Optional[List[float]]:
+    if not isinstance(location, str):
+        return None
+    candidates = [location] + location.split(",")
+    for candidate in candidates:
+        coordinates = gazetteer.get(normalize(candidate))
+        if coordinates:
+            return coordinates
+    return None
+
+
+async def backfill(gazetteer: Dict[str, List[float]], overwrite: bool = False, batch_size: int = BATCH_SIZE) -> Tuple[int, List[str]]:
+    await create_indexes()
+
+    located, unmatched = 0, []
+    last_id = None
+
+    while True:
+        query = {} if overwrite else {"geo": None}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        libraries = await db.libraries.find(query, {"location": 1}) \
+            .sort("_id", 1) \
+            .limit(batch_size) \
+            .to_list(length=batch_size)
+
+        if not libraries:
+            break
+        last_id = libraries[-1]["_id"]
+
+        now = datetime.utcnow()
+        operations = []
+        for library in libraries:
+            coordinates = locate(library.get("location"), gazetteer)
+            if coordinates is None:
+                unmatched.append(str(library.get("location")))
+                continue
+            operations.append(UpdateOne(
+                {"_id": library["_id"]},
+                {"$set": {"geo": {"type": "Point", "coordinates": coordinates}, "updated_at": now}}
+            ))
+
+        if operations:
+            await db.libraries.bulk_write(operations, ordered=False)
+        located += len(operations)
+        print(f"📍 libraries.geo: {located} localizadas, {len(unmatched)} sem correspondência")
+
+    return located, unmatched
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Backfill library coordinates from a local gazetteer.")
+    parser.add_argument("gazetteer", help="Gazetteer file (CSV/TSV with a header, or a GeoNames dump)")
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter; 'tab' for TSV")
+    parser.add_argument("--geonames", action="store_true", help="Read the GeoNames tab-separated dump format")
+    parser.add_argument("--overwrite", action="store_true", help="Recompute libraries that already have coordinates")
+    args = parser.parse_args(argv)
+
+    delimiter = "\t" if args.delimiter == "tab" else args.delimiter
+    gazetteer = load_gazetteer(args.gazetteer, delimiter=delimiter, geonames=args.geonames)
+    print(f"🗺️ {len(gazetteer)} nomes de lugares carregados")
+
+    try:
+        located, unmatched = await backfill(gazetteer, overwrite=args.overwrite)
+    finally:
+        close_client()
+
+    for location in sorted(set(unmatched))[:50]:
+        print(f"   ❓ {location}", file=sys.stderr)
+    print(f"✅ {located} bibliotecas localizadas, {len(unmatched)} sem correspondência")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
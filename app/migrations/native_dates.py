@@ -0,0 +1,92 @@
+"""Converts ``"YYYY-MM-DD"`` date strings to native BSON datetimes in place.
+
+Run with ``python -m app.migrations.native_dates``. Converted documents get
+a new ``updated_at`` so incremental exports pick them up. Values that cannot
+be parsed are left in place and listed at the end (responses show them as
+null until they are fixed); documents are processed in ``_id`` order, so the
+migration can be re-run after an interruption.
+"""
+import asyncio
+import sys
+from datetime import datetime
+from typing import List, Tuple
+from pymongo import UpdateOne
+from ..configuration.database import db, close_client
+from ..models.dates import as_datetime
+from ..services import author_service, book_service, user_service
+
+BATCH_SIZE = 1000
+
+DATE_FIELDS = [
+    ("books", "published_date"),
+    ("authors", "birthdate"),
+    ("users", "birthdate"),
+]
+
+
+def _parse(value: str):
+    parsed = as_datetime(value.strip())
+    if isinstance(parsed, datetime):
+        return parsed
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+
+async def migrate_field(collection_name: str, field: str, batch_size: int = BATCH_SIZE) -> Tuple[int, List[str]]:
+    collection = db[collection_name]
+    migrated, unparseable = 0, []
+    last_id = None
+
+    while True:
+        query = {field: {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        documents = await collection.find(query, {field: 1}) \
+            .sort("_id", 1) \
+            .limit(batch_size) \
+            .to_list(length=batch_size)
+
+        if not documents:
+            break
+        last_id = documents[-1]["_id"]
+
+        now = datetime.utcnow()
+        operations = []
+        for document in documents:
+            parsed = _parse(document[field])
+            if parsed is None:
+                unparseable.append(f"{document['_id']}: {document[field]!r}")
+                continue
+            operations.append(UpdateOne(
+                {"_id": document["_id"], field: document[field]},
+                {"$set": {field: parsed, "updated_at": now}}
+            ))
+
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+        print(f"📅 {collection_name}.{field}: {migrated} documentos convertidos, {len(unparseable)} ilegíveis")
+
+    return migrated, unparseable
+
+
+async def main():
+    try:
+        for collection_name, field in DATE_FIELDS:
+            _, unparseable = await migrate_field(collection_name, field)
+            for value in unparseable[:50]:
+                print(f"   ❓ {collection_name}.{field} {value}", file=sys.stderr)
+
+        await author_service.create_indexes()
+        await book_service.create_indexes()
+        await user_service.create_indexes()
+        print("✅ Migração de datas concluída")
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""Moves the legacy ``users.rental_books`` arrays into the ``rentals`` ledger.
+
+Run with ``python -m app.migrations.rental_ledger``. Users are processed in
+``_id`` order and batches are idempotent, so the migration can be re-run
+safely after an interruption.
+"""
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ..configuration.database import db, close_client
+from ..services.rental_service import create_indexes, DUPLICATE_KEY_ERROR
+
+BATCH_SIZE = 500
+
+
+async def migrate(batch_size: int = BATCH_SIZE) -> int:
+    await create_indexes()
+
+    migrated = 0
+    last_id = None
+
+    while True:
+        query = {"rental_books": {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        users = await db.users.find(query, {"rental_books": 1}) \
+            .sort("_id", 1) \
+            .limit(batch_size) \
+            .to_list(length=batch_size)
+
+        if not users:
+            break
+
+        now = datetime.utcnow()
+        rentals = [
+            {"user": user["_id"], "book": ObjectId(book_id), "library": None,
+             "checked_out_at": now, "active": True, "migrated": True}
+            for user in users
+            for book_id in dict.fromkeys(str(b) for b in user.get("rental_books") or [])
+            if ObjectId.is_valid(book_id)
+        ]
+
+        if rentals:
+            try:
+                await db.rentals.insert_many(rentals, ordered=False)
+            except BulkWriteError as e:
+                if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+                    raise
+
+        user_ids = [user["_id"] for user in users]
+        counters = {
+            row["_id"]: row
+            for row in await db.rentals.aggregate([
+                {"$match": {"user": {"$in": user_ids}}},
+                {"$group": {
+                    "_id": "$user",
+                    "total": {"$sum": 1},
+                    "active": {"$sum": {"$cond": [{"$eq": ["$active", True]}, 1, 0]}}
+                }}
+            ]).to_list(length=None)
+        }
+
+        await db.users.bulk_write([
+            UpdateOne(
+                {"_id": user_id},
+                {
+                    "$set": {
+                        "rentals_count": counters.get(user_id, {}).get("total", 0),
+                        "active_rentals_count": counters.get(user_id, {}).get("active", 0),
+                    },
+                    "$unset": {"rental_books": ""},
+                }
+            )
+            for user_id in user_ids
+        ], ordered=False)
+
+        migrated += len(users)
+        last_id = user_ids[-1]
+        print(f"🚚 {migrated} usuários migrados para o ledger de aluguéis")
+
+    return migrated
+
+
+async def main():
+    try:
+        total = await migrate()
+        print(f"✅ Migração concluída: {total} usuários")
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class CategoryMonthRentals(BaseModel):
+    category: Optional[str] = None
+    category_name: Optional[str] = None
+    month: str
+    rentals: int
+
+
+class AuthorReadership(BaseModel):
+    author: str
+    name: Optional[str] = None
+    readers: int
+    reads: int
+
+
+class LibraryUtilization(BaseModel):
+    library: str
+    name: Optional[str] = None
+    titles: int
+    total_copies: int
+    available_copies: int
+    active_rentals: int
+    utilization: float
+
+
+class AnalyticsStatsResponse(BaseModel):
+    ready: bool
+    refreshed_at: Optional[datetime] = None
+    refresh_seconds: float = 0
+    books: int = 0
+    rentals: int = 0
+    reads: int = 0
+    holdings: int = 0
+    memory_bytes: int = 0
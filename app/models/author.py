@@ -1,17 +1,19 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import date
+from datetime import date, datetime
+from bson import ObjectId
+from .dates import as_datetime, response_date
 
 class Author(BaseModel):
     name: str = Field(..., min_length=3, max_length=100)
     written_books: List[str] = []
-    birthdate: str = None
+    birthdate: Optional[datetime] = None
     nationality: Optional[str] = Field(..., min_length=3, max_length=100)
     fav_category: Optional[str] = None
     
     def __init__(self, **data):
-        if "birthdate" in data and isinstance(data["birthdate"], date):
-            data["birthdate"] = data["birthdate"].strftime("%Y-%m-%d")
+        if "birthdate" in data:
+            data["birthdate"] = as_datetime(data["birthdate"])
         super().__init__(**data)
 
 
@@ -22,11 +24,26 @@ class AuthorResponse(BaseModel):
     birthdate: Optional[date] = None
     nationality: Optional[str] = Field(..., min_length=3, max_length=100)
     fav_category: Optional[str] = None
+    written_books_count: Optional[int] = None
+
+    def __init__(self, **data):
+        if "birthdate" in data:
+            data["birthdate"] = response_date(data["birthdate"])
+        if isinstance(data.get("fav_category"), ObjectId):
+            data["fav_category"] = str(data["fav_category"])
+        if isinstance(data.get("written_books"), list):
+            data["written_books"] = [str(book) for book in data["written_books"]]
+        super().__init__(**data)
 
 
 class UpdateAuthorSchema(BaseModel):
     name: Optional[str] = Field(..., min_length=3, max_length=100)
-    birthdate: Optional[date] = None
+    birthdate: Optional[datetime] = None
     nationality: Optional[str] = Field(..., min_length=3, max_length=100)
     fav_category: Optional[str] = None
 
+    def __init__(self, **data):
+        if "birthdate" in data:
+            data["birthdate"] = as_datetime(data["birthdate"])
+        super().__init__(**data)
+
@@ -1,19 +1,24 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import date
+from datetime import date, datetime
 from bson import ObjectId
+from .dates import as_datetime, response_date
+from .isbn import normalize_isbn
+from .expand import BookExpansions, ExpandedBook
 
 class Book(BaseModel):
     title: str = Field(..., min_length=3, max_length=100)
     author: Optional[str] = None
     category: Optional[str] = None
-    published_date: str = None
+    published_date: Optional[datetime] = None
     isbn: str = Field(..., min_length=10, max_length=13)
     libraries: List[str] = []
     
     def __init__(self, **data):
-        if "published_date" in data and isinstance(data["published_date"], date):
-            data["published_date"] = data["published_date"].strftime("%Y-%m-%d")
+        if "published_date" in data:
+            data["published_date"] = as_datetime(data["published_date"])
+        if isinstance(data.get("isbn"), str):
+            data["isbn"] = normalize_isbn(data["isbn"])
         super().__init__(**data)
     
 
@@ -22,13 +27,14 @@ class BookResponse(BaseModel):
     title: Optional[str] = Field(..., min_length=3, max_length=100)
     author: Optional[str] = None
     category: Optional[str] = None
-    published_date: Optional[str] = None
+    published_date: Optional[date] = None
     isbn: Optional[str] = Field(..., min_length=10, max_length=13)
     libraries: Optional[List[str]] = None
+    expanded: Optional[BookExpansions] = None
     
     def __init__(self, **data):
-        if "published_date" in data and isinstance(data["published_date"], date):
-            data["published_date"] = data["published_date"].strftime("%Y-%m-%d")
+        if "published_date" in data:
+            data["published_date"] = response_date(data["published_date"])
         if "author" in data and isinstance(data["author"], ObjectId):
             data["author"] = str(data["author"])
         if "category" in data and isinstance(data["category"], ObjectId):
@@ -55,3 +61,33 @@ class UpdateBookSchema(BaseModel):
     isbn: Optional[str] = Field(..., min_length=10, max_length=13)
     libraries: Optional[str] = None
 
+    def __init__(self, **data):
+        if isinstance(data.get("isbn"), str):
+            data["isbn"] = normalize_isbn(data["isbn"])
+        super().__init__(**data)
+
+
+class BookSuggestion(BaseModel):
+    id: str
+    title: str
+
+
+class AutocompleteStatsResponse(BaseModel):
+    ready: bool
+    titles: int
+    cached_prefixes: int
+    memory_bytes: int
+    bytes_per_million_titles: int
+
+
+class BookIdsPageResponse(BaseModel):
+    total: int
+    page: int
+    limit: int
+    books: List[str] = []
+    expanded: Optional[List[ExpandedBook]] = None
+
+
+class BulkBooksResponse(BaseModel):
+    inserted: List[BookResponse] = []
+    duplicates: List[str] = []
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
+from bson import ObjectId
 
 class Category(BaseModel):
     name: str = Field(..., min_length=3, max_length=50)
@@ -17,9 +18,17 @@ class CategoryResponse(BaseModel):
     status: Optional[bool] = True
     popularity_score: Optional[float] = 0.0
     parent_category: Optional[str] = None
+    ancestors: Optional[List[str]] = []
     created_at: datetime
     updated_at: datetime
 
+    def __init__(self, **data):
+        if "parent_category" in data and isinstance(data["parent_category"], ObjectId):
+            data["parent_category"] = str(data["parent_category"])
+        if "ancestors" in data and isinstance(data["ancestors"], list):
+            data["ancestors"] = [str(ancestor) for ancestor in data["ancestors"]]
+        super().__init__(**data)
+
 
 class UpdateCategorySchema(BaseModel):
     name: Optional[str] = Field(None, min_length=3, max_length=50)
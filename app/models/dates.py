@@ -0,0 +1,30 @@
+from datetime import date, datetime, time
+from typing import Optional
+from pydantic.datetime_parse import parse_date
+
+
+def as_datetime(value):
+    """Calendar dates are stored as BSON datetimes at midnight UTC so they
+    compare and index as dates instead of strings."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time.min)
+    if isinstance(value, str) and len(value) == 10:
+        try:
+            return datetime.combine(date.fromisoformat(value), time.min)
+        except ValueError:
+            return value
+    return value
+
+
+def response_date(value) -> Optional[date]:
+    """Dates in responses. Legacy values the native_dates migration could not
+    parse are left in place; they come back as None instead of failing the
+    whole page."""
+    if value is None:
+        return None
+    try:
+        return parse_date(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,46 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+# Expanded references carry a fixed, small set of fields; clients that need
+# the full document fetch it by id
+
+class ExpandedAuthor(BaseModel):
+    id: str
+    name: Optional[str] = None
+    nationality: Optional[str] = None
+
+
+class ExpandedCategory(BaseModel):
+    id: str
+    name: Optional[str] = None
+
+
+class ExpandedLibrary(BaseModel):
+    id: str
+    name: Optional[str] = None
+    location: Optional[str] = None
+    is_public: Optional[bool] = None
+
+
+class ExpandedBook(BaseModel):
+    id: str
+    title: Optional[str] = None
+    author: Optional[str] = None
+    isbn: Optional[str] = None
+
+
+class BookExpansions(BaseModel):
+    author: Optional[ExpandedAuthor] = None
+    category: Optional[ExpandedCategory] = None
+    libraries: Optional[List[ExpandedLibrary]] = None
+
+
+class UserExpansions(BaseModel):
+    fav_library: Optional[ExpandedLibrary] = None
+    fav_category: Optional[ExpandedCategory] = None
+    fav_author: Optional[ExpandedAuthor] = None
+    readed_books: Optional[List[ExpandedBook]] = None
+
+
+class LibraryExpansions(BaseModel):
+    books: Optional[List[ExpandedBook]] = None
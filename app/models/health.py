@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class StartupStep(BaseModel):
+    name: str
+    status: str
+    attempts: int = 1
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ReadinessResponse(BaseModel):
+    status: str
+    ready: bool
+    started_at: datetime
+    ready_at: Optional[datetime] = None
+    steps: List[StartupStep] = []
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from bson import ObjectId
+
+class HoldingSchema(BaseModel):
+    total_copies: int = Field(..., ge=0)
+
+
+class HoldingResponse(BaseModel):
+    id: str
+    library: str
+    book: str
+    total_copies: int
+    available_copies: int
+    updated_at: Optional[datetime] = None
+
+    def __init__(self, **data):
+        for field in ("library", "book"):
+            if isinstance(data.get(field), ObjectId):
+                data[field] = str(data[field])
+        super().__init__(**data)
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Any, Optional
+from datetime import datetime
+
+class ImportJobResponse(BaseModel):
+    id: str
+    kind: str
+    format: str
+    source: Optional[str] = None
+    status: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    rows_read: int = 0
+    rows_committed: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+
+
+class ImportErrorResponse(BaseModel):
+    row: int
+    error: str
+    data: Optional[Any] = None
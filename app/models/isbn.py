@@ -0,0 +1,30 @@
+import re
+
+_NON_ISBN_CHARS = re.compile(r"[^0-9X]")
+
+
+def _isbn10_valid(digits: str) -> bool:
+    if not re.fullmatch(r"\d{9}[\dX]", digits):
+        return False
+    total = sum((10 - i) * (10 if char == "X" else int(char)) for i, char in enumerate(digits))
+    return total % 11 == 0
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    total = sum(int(char) * (1 if i % 2 == 0 else 3) for i, char in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(value: str) -> str:
+    """Returns the canonical 13-digit form of an ISBN-10 or ISBN-13, ignoring
+    hyphens and spaces. Raises ``ValueError`` when the checksum is wrong."""
+    digits = _NON_ISBN_CHARS.sub("", value.upper())
+
+    if len(digits) == 10 and _isbn10_valid(digits):
+        first12 = "978" + digits[:9]
+        return first12 + _isbn13_check_digit(first12)
+
+    if len(digits) == 13 and digits.isdigit() and _isbn13_check_digit(digits[:12]) == digits[12]:
+        return digits
+
+    raise ValueError("Invalid ISBN-10/ISBN-13")
@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Extra, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+class JobSchema(BaseModel):
+    kind: str = Field(..., min_length=3, max_length=100)
+    params: Dict[str, Any] = {}
+
+
+class NoJobParams(BaseModel):
+    """Parameters of job kinds that take none; anything sent is rejected."""
+
+    class Config:
+        extra = Extra.forbid
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    params: Dict[str, Any] = {}
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    total_items: int = 0
+    chunks: int = 0
+
+
+class JobResultChunkResponse(BaseModel):
+    job: str
+    chunk: int
+    chunks: int
+    items: List[Dict[str, Any]] = []
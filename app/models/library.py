@@ -1,6 +1,21 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, conlist, validator
 from typing import Optional, List
 from datetime import date
+from bson import ObjectId
+from .expand import LibraryExpansions
+
+class GeoPoint(BaseModel):
+    """GeoJSON point; coordinates are ``[longitude, latitude]``."""
+    type: str = Field("Point", const=True)
+    coordinates: conlist(float, min_items=2, max_items=2)
+
+    @validator("coordinates")
+    def check_range(cls, coordinates):
+        longitude, latitude = coordinates
+        if not -180 <= longitude <= 180 or not -90 <= latitude <= 90:
+            raise ValueError("coordinates must be [longitude, latitude] within [-180, 180] and [-90, 90]")
+        return coordinates
+
 
 class Library(BaseModel):
     name: str = Field(..., min_length=3, max_length=100)
@@ -8,6 +23,7 @@ class Library(BaseModel):
     is_public: bool = True
     location: str = Field(..., min_length=3, max_length=200)
     establish_year: Optional[int] = None
+    geo: Optional[GeoPoint] = None
     
 
 class LibraryResponse(BaseModel):
@@ -17,6 +33,14 @@ class LibraryResponse(BaseModel):
     is_public: Optional[bool] = True
     location: Optional[str] = Field(..., min_length=3, max_length=200)
     establish_year: Optional[int] = None
+    geo: Optional[GeoPoint] = None
+    books_count: Optional[int] = None
+    expanded: Optional[LibraryExpansions] = None
+
+    def __init__(self, **data):
+        if isinstance(data.get("books"), list):
+            data["books"] = [str(book) for book in data["books"]]
+        super().__init__(**data)
 
 
 class UpdateLibrarySchema(BaseModel):
@@ -24,4 +48,8 @@ class UpdateLibrarySchema(BaseModel):
     is_public: Optional[bool] = True
     location: Optional[str] = Field(..., min_length=3, max_length=200)
     establish_year: Optional[int] = None
+    geo: Optional[GeoPoint] = None
+
 
+class NearbyLibraryResponse(LibraryResponse):
+    distance_meters: float
@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class ProfileStack(BaseModel):
+    stack: str
+    micros: int
+
+
+class ProfileCommand(BaseModel):
+    command: str
+    database: str
+    collection: Optional[str] = None
+    offset_ms: float
+    duration_ms: float
+    error: Optional[str] = None
+
+
+class ProfileSummaryResponse(BaseModel):
+    id: str
+    method: str
+    path: str
+    trigger: str
+    request_id: Optional[str] = None
+    status_code: Optional[int] = None
+    pid: Optional[int] = None
+    created_at: datetime
+    duration_ms: float
+    interval_ms: float
+    samples: int = 0
+    command_count: int = 0
+    commands_dropped: int = 0
+    mongo_ms: float = 0
+
+
+class ProfileResponse(ProfileSummaryResponse):
+    stacks: List[ProfileStack] = []
+    commands: List[ProfileCommand] = []
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class RecommendedBook(BaseModel):
+    book: str
+    score: float
+    co_readers: int
+
+
+class BookRecommendationsResponse(BaseModel):
+    book: str
+    readers: int = 0
+    recommendations: List[RecommendedBook] = []
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from bson import ObjectId
+
+class RentalResponse(BaseModel):
+    id: str
+    user: str
+    book: str
+    library: Optional[str] = None
+    checked_out_at: datetime
+    returned_at: Optional[datetime] = None
+
+    def __init__(self, **data):
+        for field in ("user", "book", "library"):
+            if isinstance(data.get(field), ObjectId):
+                data[field] = str(data[field])
+        super().__init__(**data)
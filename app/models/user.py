@@ -1,19 +1,22 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import date
+from datetime import date, datetime
+from bson import ObjectId
+from .dates import as_datetime, response_date
+from .expand import UserExpansions
 
 class User(BaseModel):
     name: str = Field(..., min_length=3, max_length=100)
     readed_books: List[str] = []
     rental_books: List[str] = []
-    birthdate: str = None
+    birthdate: Optional[datetime] = None
     fav_library: Optional[str] = None
     fav_category: Optional[str] = None
     fav_author: Optional[str] = None
     
     def __init__(self, **data):
-        if "birthdate" in data and isinstance(data["birthdate"], date):
-            data["birthdate"] = data["birthdate"].strftime("%Y-%m-%d")
+        if "birthdate" in data:
+            data["birthdate"] = as_datetime(data["birthdate"])
         super().__init__(**data)
 
 
@@ -21,24 +24,43 @@ class UserResponse(BaseModel):
     id: str
     name: Optional[str] = Field(..., min_length=3, max_length=100)
     readed_books: Optional[List[str]] = []
-    rental_books: Optional[List[str]] = []
+    rentals_count: Optional[int] = 0
+    active_rentals_count: Optional[int] = 0
     birthdate: Optional[date] = None
     fav_library: Optional[str] = None
     fav_category: Optional[str] = None
     fav_author: Optional[str] = None
+    readed_books_count: Optional[int] = None
+    expanded: Optional[UserExpansions] = None
+
+    def __init__(self, **data):
+        if "birthdate" in data:
+            data["birthdate"] = response_date(data["birthdate"])
+        for field in ("fav_library", "fav_category", "fav_author"):
+            if isinstance(data.get(field), ObjectId):
+                data[field] = str(data[field])
+        if isinstance(data.get("readed_books"), list):
+            data["readed_books"] = [str(book) for book in data["readed_books"]]
+        super().__init__(**data)
 
 
 class UpdateUserSchema(BaseModel):
     name: Optional[str] = Field(..., min_length=3, max_length=100)
-    birthdate: Optional[date] = None
+    birthdate: Optional[datetime] = None
     fav_library: Optional[str] = None
     fav_category: Optional[str] = None
     fav_author: Optional[str] = None
 
+    def __init__(self, **data):
+        if "birthdate" in data:
+            data["birthdate"] = as_datetime(data["birthdate"])
+        super().__init__(**data)
+
 
 class PopulateBooksUserSchema(BaseModel):
     readed_books: Optional[List[str]] = []
     rental_books: Optional[List[str]] = []
+    library: Optional[str] = None
     
 
 class ULibraryAResponse(BaseModel):
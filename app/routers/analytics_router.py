@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Query
+from typing import List, Optional
+from datetime import date
+from app.models.analytics import AuthorReadership, CategoryMonthRentals, LibraryUtilization, AnalyticsStatsResponse
+from app.models.dates import as_datetime
+from app.services.analytics_service import analytics_store
+
+router = APIRouter()
+
+@router.get("/rentals-by-category", response_model=List[CategoryMonthRentals])
+async def rentals_by_category(
+    start_date: Optional[date] = Query(None, description="Only rentals from this month on"),
+    end_date: Optional[date] = Query(None, description="Only rentals up to this month"),
+    category: Optional[str] = Query(None, description="Filter by category ID"),
+):
+    return analytics_store.rentals_by_category(
+        start=as_datetime(start_date) if start_date else None,
+        end=as_datetime(end_date) if end_date else None,
+        category=category
+    )
+
+
+@router.get("/top-authors", response_model=List[AuthorReadership])
+async def top_authors(
+    limit: int = Query(10, description="Number of authors", ge=1, le=100)
+):
+    return analytics_store.top_authors(limit=limit)
+
+
+@router.get("/library-utilization", response_model=List[LibraryUtilization])
+async def library_utilization(
+    limit: int = Query(50, description="Number of libraries", ge=1, le=1000)
+):
+    return analytics_store.library_utilization(limit=limit)
+
+
+@router.get("/stats", response_model=AnalyticsStatsResponse)
+async def analytics_stats():
+    return analytics_store.stats()
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Query
 from typing import List, Optional
+from datetime import date
 from app.models.author import Author, AuthorResponse, UpdateAuthorSchema
+from app.models.book import BookIdsPageResponse
 from app.services.author_service import (
     get_all_authors,
     get_author_by_id,
+    get_author_books,
     create_author,
     update_author,
     delete_author
@@ -17,20 +20,37 @@ async def get_authors(
     limit: int = Query(10, description="Number of results per page", ge=1, le=100),
     name: Optional[str] = Query(None, description="Filter by author name"),
     written_book: Optional[str] = Query(None, description="Filter by author written books"),
-    nationality: Optional[str] = Query(None, description="Filter by nationality")
+    nationality: Optional[str] = Query(None, description="Filter by nationality"),
+    birthdate_from: Optional[date] = Query(None, description="Born on or after this date"),
+    birthdate_to: Optional[date] = Query(None, description="Born on or before this date")
 ):
     return await get_all_authors(
         page=page,
         limit=limit,
         name=name,
         written_book=written_book,
-        nationality=nationality
+        nationality=nationality,
+        birthdate_from=birthdate_from,
+        birthdate_to=birthdate_to
     )
 
 
 @router.get("/{author_id}", response_model=AuthorResponse)
-async def get_author(author_id: str):
-    return await get_author_by_id(author_id)
+async def get_author(
+    author_id: str,
+    counts_only: bool = Query(False, description="Return written_books_count instead of the written_books array")
+):
+    return await get_author_by_id(author_id, counts_only=counts_only)
+
+
+@router.get("/{author_id}/books", response_model=BookIdsPageResponse)
+async def get_books_of_author(
+    author_id: str,
+    page: int = Query(1, description="Page number, starting from 1", ge=1),
+    limit: int = Query(50, description="Number of results per page", ge=1, le=500),
+    expand: Optional[str] = Query(None, description="Set to 'books' to embed book summaries")
+):
+    return await get_author_books(author_id, page=page, limit=limit, expand=expand)
 
 
 @router.post("/", response_model=AuthorResponse)
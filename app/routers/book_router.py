@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Body, Query
 from typing import List, Optional
 from datetime import date
-from app.models.book import Book, BookResponse, UpdateBookSchema
+from app.models.book import Book, BookResponse, UpdateBookSchema, BookSuggestion, AutocompleteStatsResponse, BulkBooksResponse
+from app.models.holding import HoldingResponse
+from app.models.recommendation import BookRecommendationsResponse
+from app.models.job import JobSchema, JobResponse
 from app.services.book_service import (
     get_all_books,
     get_book_by_id,
+    get_book_by_isbn,
     create_book,
+    create_books,
     update_book,
     delete_book,
     list_books_with_authors
 )
+from app.services.holding_service import get_book_availability
+from app.services.autocomplete_service import title_index
+from app.services.job_service import submit_job
+from app.services.recommendation_service import get_book_recommendations, refresh_recommendations
 
 router = APIRouter()
 
@@ -21,6 +30,42 @@ async def get_books_with_authors(
     return await list_books_with_authors(page=page, limit=limit)
 
 
+@router.post("/list-books-authors/jobs", response_model=JobResponse, status_code=202)
+async def submit_books_with_authors_report():
+    return await submit_job(JobSchema(kind="books-with-authors"))
+
+
+@router.get("/autocomplete", response_model=List[BookSuggestion])
+async def autocomplete_titles(
+    q: str = Query(..., description="Title prefix", min_length=1, max_length=100),
+    limit: int = Query(10, description="Maximum number of suggestions", ge=1, le=20)
+):
+    return title_index.search(q, limit=limit)
+
+
+@router.get("/autocomplete/stats", response_model=AutocompleteStatsResponse)
+async def autocomplete_stats():
+    return title_index.stats()
+
+
+@router.post("/recommendations/refresh")
+async def rebuild_recommendations(
+    full: bool = Query(False, description="Rebuild from every reader instead of recent activity only")
+):
+    refreshed = await refresh_recommendations(full=full)
+    return {"message": "Recommendations refreshed", "books": refreshed}
+
+
+@router.get("/isbn/{isbn}", response_model=BookResponse)
+async def get_book_isbn(isbn: str):
+    return await get_book_by_isbn(isbn)
+
+
+@router.post("/bulk", response_model=BulkBooksResponse)
+async def post_books(books: List[Book] = Body(..., max_items=1000)):
+    return await create_books(books)
+
+
 @router.get("/", response_model=List[BookResponse])
 async def get_books(
     page: int = Query(1, description="Page number, starting from 1", ge=1),
@@ -28,8 +73,12 @@ async def get_books(
     title: Optional[str] = Query(None, description="Filter by book title"),
     author: Optional[str] = Query(None, description="Filter by author ID"),
     library: Optional[str] = Query(None, description="Filter by library ID"),
+    category: Optional[str] = Query(None, description="Filter by category ID"),
+    include_subcategories: bool = Query(False, description="Also match books in subcategories of the category"),
     start_date: Optional[date] = Query(None, description="Filter by start date"),
     end_date: Optional[date] = Query(None, description="Filter by end date"),
+    sort_by_date: Optional[str] = Query(None, description="Sort by published date", regex="^(asc|desc)$"),
+    expand: Optional[str] = Query(None, description="References to embed, comma-separated: author, category, libraries"),
 ):
     return await get_all_books(
         page=page,
@@ -37,8 +86,12 @@ async def get_books(
         title=title,
         author=author,
         library=library,
+        category=category,
+        include_subcategories=include_subcategories,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        sort_by_date=sort_by_date,
+        expand=expand
     )
 
 
@@ -47,6 +100,19 @@ async def get_book(book_id: str):
     return await get_book_by_id(book_id)
     
 
+@router.get("/{book_id}/availability", response_model=List[HoldingResponse])
+async def get_availability(book_id: str):
+    return await get_book_availability(book_id)
+
+
+@router.get("/{book_id}/recommendations", response_model=BookRecommendationsResponse)
+async def get_recommendations(
+    book_id: str,
+    limit: Optional[int] = Query(None, description="Maximum number of recommendations", ge=1, le=100)
+):
+    return await get_book_recommendations(book_id, limit=limit)
+
+
 @router.post("/", response_model=BookResponse)
 async def add_book(book: Book):
     return await create_book(book)
@@ -18,7 +18,8 @@ async def get_categories(
     name: Optional[str] = Query(None, description="Filter by category name"),
     status: Optional[bool] = Query(None, description="Filter by status"),
     min_popularity: Optional[float] = Query(None, description="Minimum popularity score"),
-    parent_category: Optional[str] = Query(None, description="Filter by parent category")
+    parent_category: Optional[str] = Query(None, description="Filter by parent category"),
+    ancestor: Optional[str] = Query(None, description="Filter by any ancestor category (whole subtree)")
 ):
     return await get_all_categories(
         page=page,
@@ -26,7 +27,8 @@ async def get_categories(
         name=name,
         status=status,
         min_popularity=min_popularity,
-        parent_category=parent_category
+        parent_category=parent_category,
+        ancestor=ancestor
     )
 
 
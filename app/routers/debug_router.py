@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+from app.models.profile import ProfileResponse, ProfileSummaryResponse
+from app.services.profile_service import is_authorized, list_profiles, get_profile, get_collapsed_stacks
+
+
+async def require_profiling_token(x_profile_token: Optional[str] = Header(None)):
+    if not is_authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="A valid X-Profile-Token header is required")
+
+
+router = APIRouter(dependencies=[Depends(require_profiling_token)])
+
+@router.get("/profiles", response_model=List[ProfileSummaryResponse])
+async def get_profiles(
+    path: Optional[str] = Query(None, description="Only profiles of this request path"),
+    page: int = Query(1, description="Page number, starting from 1", ge=1),
+    limit: int = Query(20, description="Number of results per page", ge=1, le=100)
+):
+    return await list_profiles(path=path, page=page, limit=limit)
+
+
+@router.get("/profiles/{profile_id}", response_model=ProfileResponse)
+async def get_profile_by_id(profile_id: str):
+    return await get_profile(profile_id)
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def get_profile_collapsed(profile_id: str):
+    return await get_collapsed_stacks(profile_id)
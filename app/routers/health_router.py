@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.models.health import ReadinessResponse
+from app.services.health_service import readiness
+
+router = APIRouter()
+
+@router.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+@router.get("/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def ready():
+    report = readiness.report()
+    if not report.ready:
+        return JSONResponse(status_code=503, content=jsonable_encoder(report))
+    return report
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Query
+from typing import List, Optional
+from app.models.holding import HoldingSchema, HoldingResponse
+from app.services.holding_service import (
+    get_all_holdings,
+    set_holding_copies,
+    withdraw_copy,
+    restore_copy
+)
+
+router = APIRouter()
+
+@router.get("/", response_model=List[HoldingResponse])
+async def get_holdings(
+    page: int = Query(1, description="Page number, starting from 1", ge=1),
+    limit: int = Query(10, description="Number of results per page", ge=1, le=100),
+    library: Optional[str] = Query(None, description="Filter by library ID"),
+    book: Optional[str] = Query(None, description="Filter by book ID"),
+    available: Optional[bool] = Query(None, description="Filter by copies available")
+):
+    return await get_all_holdings(page=page, limit=limit, library=library, book=book, available=available)
+
+
+@router.put("/{library_id}/{book_id}", response_model=HoldingResponse)
+async def edit_holding(library_id: str, book_id: str, holding: HoldingSchema):
+    return await set_holding_copies(library_id, book_id, holding)
+
+
+# Copy adjustments only: they move available_copies without a rental.
+# Rentals are recorded with POST /users/{user_id}/populate-books and ended
+# with POST /users/{user_id}/rentals/{rental_id}/return
+@router.post("/{library_id}/{book_id}/copies/withdraw", response_model=HoldingResponse)
+async def withdraw(library_id: str, book_id: str):
+    return await withdraw_copy(library_id, book_id)
+
+
+@router.post("/{library_id}/{book_id}/copies/restore", response_model=HoldingResponse)
+async def restore(library_id: str, book_id: str):
+    return await restore_copy(library_id, book_id)
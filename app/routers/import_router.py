@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Query, Request
+from typing import List, Optional
+from app.models.import_job import ImportJobResponse, ImportErrorResponse
+from app.services.import_service import run_import, get_import, get_import_errors
+
+router = APIRouter()
+
+@router.post("/{kind}", response_model=ImportJobResponse)
+async def upload_import(
+    kind: str,
+    request: Request,
+    format: str = Query("csv", description="File format", regex="^(csv|jsonl)$"),
+    resume: Optional[str] = Query(None, description="ID of an interrupted import to resume"),
+    source: Optional[str] = Query(None, description="Name of the uploaded file", max_length=200),
+):
+    # The body is read as it arrives, so uploads of any size use constant memory
+    return await run_import(kind, format, request.stream(), source=source, import_id=resume)
+
+
+@router.get("/{import_id}", response_model=ImportJobResponse)
+async def get_import_status(import_id: str):
+    return await get_import(import_id)
+
+
+@router.get("/{import_id}/errors", response_model=List[ImportErrorResponse])
+async def get_errors(
+    import_id: str,
+    page: int = Query(1, description="Page number, starting from 1", ge=1),
+    limit: int = Query(100, description="Number of results per page", ge=1, le=1000)
+):
+    return await get_import_errors(import_id, page=page, limit=limit)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Query
+from app.models.job import JobSchema, JobResponse, JobResultChunkResponse
+from app.services.job_service import submit_job, get_job, get_job_result
+
+router = APIRouter()
+
+@router.post("/", response_model=JobResponse, status_code=202)
+async def add_job(job: JobSchema):
+    return await submit_job(job)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job_status(job_id: str):
+    return await get_job(job_id)
+
+
+@router.get("/{job_id}/result", response_model=JobResultChunkResponse)
+async def get_result(
+    job_id: str,
+    chunk: int = Query(0, description="Result chunk, starting from 0", ge=0)
+):
+    return await get_job_result(job_id, chunk=chunk)
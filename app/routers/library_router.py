@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Query
 from typing import List, Optional
-from app.models.library import Library, LibraryResponse, UpdateLibrarySchema
+from app.models.book import BookIdsPageResponse
+from app.models.library import Library, LibraryResponse, NearbyLibraryResponse, UpdateLibrarySchema
 from app.services.library_service import (
     get_all_libraries,
     get_library_by_id,
+    get_library_books,
+    get_nearby_libraries,
     create_library,
     update_library,
     delete_library
@@ -19,7 +22,8 @@ async def get_libraries(
     is_public: Optional[bool] = Query(None, description="Filter by public/private library"),
     location: Optional[str] = Query(None, description="Filter by location"),
     establish_year: Optional[int] = Query(None, description="Filter by establishment year"),
-    book_id: Optional[str] = Query(None, description="Filter by book ID inside library")
+    book_id: Optional[str] = Query(None, description="Filter by book ID inside library"),
+    expand: Optional[str] = Query(None, description="References to embed, comma-separated: books")
 ):
     return await get_all_libraries(
         page=page,
@@ -28,13 +32,48 @@ async def get_libraries(
         is_public=is_public,
         location=location,
         establish_year=establish_year,
-        book_id=book_id
+        book_id=book_id,
+        expand=expand
+    )
+
+
+@router.get("/near", response_model=List[NearbyLibraryResponse])
+async def get_libraries_near(
+    lng: float = Query(..., description="Longitude of the search point", ge=-180, le=180),
+    lat: float = Query(..., description="Latitude of the search point", ge=-90, le=90),
+    max_distance: float = Query(5000, description="Maximum distance in meters", gt=0, le=100000),
+    min_distance: Optional[float] = Query(None, description="Minimum distance in meters", ge=0),
+    book_id: Optional[str] = Query(None, description="Only libraries holding this book"),
+    available_only: bool = Query(False, description="With book_id, only libraries with a copy available"),
+    limit: int = Query(10, description="Maximum number of libraries", ge=1, le=100)
+):
+    return await get_nearby_libraries(
+        longitude=lng,
+        latitude=lat,
+        max_distance=max_distance,
+        min_distance=min_distance,
+        book_id=book_id,
+        available_only=available_only,
+        limit=limit
     )
 
 
 @router.get("/{library_id}", response_model=LibraryResponse)
-async def get_library(library_id: str):
-    return await get_library_by_id(library_id)
+async def get_library(
+    library_id: str,
+    counts_only: bool = Query(False, description="Return books_count instead of the books array")
+):
+    return await get_library_by_id(library_id, counts_only=counts_only)
+
+
+@router.get("/{library_id}/books", response_model=BookIdsPageResponse)
+async def get_books_of_library(
+    library_id: str,
+    page: int = Query(1, description="Page number, starting from 1", ge=1),
+    limit: int = Query(50, description="Number of results per page", ge=1, le=500),
+    expand: Optional[str] = Query(None, description="Set to 'books' to embed book summaries")
+):
+    return await get_library_books(library_id, page=page, limit=limit, expand=expand)
 
 
 @router.post("/", response_model=LibraryResponse)
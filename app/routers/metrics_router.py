@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.configuration import query_cache
+from app.middlewares import admission
+
+router = APIRouter()
+
+@router.get("/", response_class=PlainTextResponse)
+async def get_metrics():
+    return admission.render_metrics() + query_cache.render_metrics()
@@ -1,24 +1,56 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Response
 from typing import List, Optional
+from datetime import date
+from app.models.book import BookIdsPageResponse
 from app.models.user import User, UserResponse, UpdateUserSchema, PopulateBooksUserSchema, UserResponseAggregate
+from app.models.rental import RentalResponse
+from app.models.job import JobSchema, JobResponse
 from app.services.user_service import (
     get_all_users,
     get_user_by_id,
+    get_user_readed_books,
     create_user,
     update_user,
     delete_user,
-    get_users_with_rental_books_and_libraries,
     populate_books
 )
+from app.services.rental_service import get_user_rentals, return_rental
+from app.services.job_service import submit_job
+from app.services.rental_report_service import get_rental_report, refresh_report, schedule_rebuild
 
 router = APIRouter()
 
 @router.get("/list-rental-books-libraries", response_model=List[UserResponseAggregate])
 async def list_rental_books_libraries(
+    response: Response,
     page: int = Query(1, description="Page number, starting from 1", ge=1),
     limit: int = Query(10, description="Number of results per page", ge=1, le=100)
 ):
-    return await get_users_with_rental_books_and_libraries(page=page, limit=limit)
+    users, freshness = await get_rental_report(page=page, limit=limit)
+    response.headers["X-Report-Refreshed-At"] = freshness["refreshed_at"].isoformat() + "Z"
+    response.headers["X-Report-Staleness-Seconds"] = str(freshness["staleness_seconds"])
+    response.headers["X-Report-Pending-Users"] = str(freshness["pending_users"])
+    return users
+
+
+@router.post("/list-rental-books-libraries/refresh")
+async def refresh_rental_books_libraries(
+    response: Response,
+    full: bool = Query(False, description="Rebuild the whole report instead of only changed users")
+):
+    if full:
+        # A full rebuild re-merges every user: it runs as a job, not in the request
+        job = await schedule_rebuild()
+        response.status_code = 202
+        return {"message": "Report rebuild scheduled", "job": job.id}
+
+    refreshed = await refresh_report()
+    return {"message": "Report refreshed", "users": refreshed}
+
+
+@router.post("/list-rental-books-libraries/jobs", response_model=JobResponse, status_code=202)
+async def submit_rental_books_libraries_report():
+    return await submit_job(JobSchema(kind="users-rental-books-libraries"))
 
 
 @router.get("/", response_model=List[UserResponse])
@@ -30,7 +62,10 @@ async def get_users(
     fav_category: Optional[str] = Query(None, description="Filter by favorite category"),
     fav_author: Optional[str] = Query(None, description="Filter by favorite author"),
     readed_book: Optional[str] = Query(None, description="Filter by readed book"),
-    rental_book: Optional[str] = Query(None, description="Filter by rented book")
+    rental_book: Optional[str] = Query(None, description="Filter by rented book"),
+    birthdate_from: Optional[date] = Query(None, description="Born on or after this date"),
+    birthdate_to: Optional[date] = Query(None, description="Born on or before this date"),
+    expand: Optional[str] = Query(None, description="References to embed, comma-separated: fav_library, fav_category, fav_author, readed_books")
 ):
     return await get_all_users(
         page=page,
@@ -40,13 +75,29 @@ async def get_users(
         fav_category=fav_category,
         fav_author=fav_author,
         readed_book=readed_book,
-        rental_book=rental_book
+        rental_book=rental_book,
+        birthdate_from=birthdate_from,
+        birthdate_to=birthdate_to,
+        expand=expand
     )
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str):
-    return await get_user_by_id(user_id)
+async def get_user(
+    user_id: str,
+    counts_only: bool = Query(False, description="Return readed_books_count instead of the readed_books array")
+):
+    return await get_user_by_id(user_id, counts_only=counts_only)
+
+
+@router.get("/{user_id}/readed-books", response_model=BookIdsPageResponse)
+async def get_readed_books(
+    user_id: str,
+    page: int = Query(1, description="Page number, starting from 1", ge=1),
+    limit: int = Query(50, description="Number of results per page", ge=1, le=500),
+    expand: Optional[str] = Query(None, description="Set to 'books' to embed book summaries")
+):
+    return await get_user_readed_books(user_id, page=page, limit=limit, expand=expand)
 
 
 @router.post("/", response_model=UserResponse)
@@ -68,3 +119,17 @@ async def remove_user(user_id: str):
 async def add_readed_book(user_id: str, user: PopulateBooksUserSchema):
     return await populate_books(user_id, user)
 
+
+@router.get("/{user_id}/rentals", response_model=List[RentalResponse])
+async def list_user_rentals(
+    user_id: str,
+    page: int = Query(1, description="Page number, starting from 1", ge=1),
+    limit: int = Query(10, description="Number of results per page", ge=1, le=100),
+    active: Optional[bool] = Query(None, description="Only open (true) or returned (false) rentals")
+):
+    return await get_user_rentals(user_id, page=page, limit=limit, active=active)
+
+
+@router.post("/{user_id}/rentals/{rental_id}/return", response_model=RentalResponse)
+async def return_user_rental(user_id: str, rental_id: str):
+    return await return_rental(user_id, rental_id)
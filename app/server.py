@@ -0,0 +1,43 @@
+import os
+import uvicorn
+from app.configuration.settings import settings
+
+
+def worker_count() -> int:
+    if settings.APP_WORKERS:
+        return settings.APP_WORKERS
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    # The API is I/O bound on Mongo, so one worker per core is enough;
+    # the cap keeps the total connection pool (workers x maxPoolSize) in check.
+    return max(1, min(cpus, settings.APP_MAX_WORKERS))
+
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def main() -> None:
+    # Each worker imports app.main on its own, and the Motor client is only
+    # created on first use, so every worker ends up with its own connection pool.
+    uvicorn.run(
+        "app.main:app",
+        host=settings.APP_HOST,
+        port=settings.APP_PORT,
+        workers=worker_count(),
+        loop="uvloop" if _available("uvloop") else "asyncio",
+        http="httptools" if _available("httptools") else "h11",
+        timeout_keep_alive=settings.APP_KEEP_ALIVE,
+        backlog=settings.APP_BACKLOG,
+        timeout_graceful_shutdown=settings.APP_GRACEFUL_SHUTDOWN,
+        proxy_headers=True,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import asyncio
+import time
+from array import array
+from typing import Dict, List, Optional
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+import numpy as np
+from ..models.analytics import AuthorReadership, CategoryMonthRentals, LibraryUtilization
+from ..configuration.database import db
+
+BATCH_SIZE = 5000
+
+
+def month_code(value: datetime) -> int:
+    return value.year * 12 + value.month - 1
+
+
+def month_label(code: int) -> str:
+    return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+class Interner:
+    """Maps ObjectIds to dense integer codes (and back) so references can
+    live in NumPy arrays and be used directly as bincount/group-by keys."""
+
+    def __init__(self):
+        self.codes: Dict[ObjectId, int] = {}
+        self.ids: List[ObjectId] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def code(self, value) -> int:
+        if isinstance(value, str) and ObjectId.is_valid(value):
+            value = ObjectId(value)
+        if not isinstance(value, ObjectId):
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.ids)
+            self.ids.append(value)
+        return code
+
+    def lookup(self, value) -> Optional[int]:
+        if isinstance(value, str) and ObjectId.is_valid(value):
+            value = ObjectId(value)
+        return self.codes.get(value)
+
+
+def _author_readership(book_author: np.ndarray, read_user: np.ndarray, read_book: np.ndarray, size: int):
+    authors = book_author[read_book]
+    valid = authors >= 0
+    authors, users = authors[valid].astype(np.int64), read_user[valid]
+    if not len(authors):
+        return np.zeros(size, dtype=np.int64), np.zeros(size, dtype=np.int64)
+
+    reads = np.bincount(authors, minlength=size)
+    # A reader of several books by the same author counts once
+    user_space = int(users.max()) + 1
+    pairs = np.unique(authors * user_space + users)
+    readers = np.bincount(pairs // user_space, minlength=size)
+    return readers, reads
+
+
+class AnalyticsStore:
+    """Columnar in-memory copy of the fields the statistics endpoints group by.
+
+    Books, rentals, reading lists and holdings are reloaded as a whole on
+    every refresh and swapped in at once, so queries always see one
+    consistent snapshot. Each query is a handful of vectorized NumPy
+    operations over those columns.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._loaded = asyncio.Event()
+        self.refreshed_at: Optional[datetime] = None
+        self.refresh_seconds = 0.0
+
+        self.books = Interner()
+        self.categories = Interner()
+        self.authors = Interner()
+        self.libraries = Interner()
+        self.names: Dict[str, Dict[int, str]] = {}
+
+        # Indexed by book code
+        self.book_author = np.empty(0, dtype=np.int32)
+        self.book_category = np.empty(0, dtype=np.int32)
+        # One entry per rental
+        self.rental_book = np.empty(0, dtype=np.int32)
+        self.rental_library = np.empty(0, dtype=np.int32)
+        self.rental_month = np.empty(0, dtype=np.int32)
+        self.rental_active = np.empty(0, dtype=bool)
+        # One entry per (reader, book) pair
+        self.read_user = np.empty(0, dtype=np.int32)
+        self.read_book = np.empty(0, dtype=np.int32)
+        # One entry per holding
+        self.holding_library = np.empty(0, dtype=np.int32)
+        self.holding_total = np.empty(0, dtype=np.int64)
+        self.holding_available = np.empty(0, dtype=np.int64)
+        # Indexed by author code; readership has no parameters, so it is
+        # computed once per refresh
+        self.author_readers = np.empty(0, dtype=np.int64)
+        self.author_reads = np.empty(0, dtype=np.int64)
+
+    async def _names(self, collection_name: str, interner: Interner) -> Dict[int, str]:
+        names = {}
+        async for document in db[collection_name].secondary_preferred().find({}, {"name": 1}).batch_size(BATCH_SIZE):
+            if isinstance(document.get("name"), str):
+                names[interner.code(document["_id"])] = document["name"]
+        return names
+
+    async def rebuild(self) -> None:
+        started = time.perf_counter()
+        books, categories, authors, libraries = Interner(), Interner(), Interner(), Interner()
+
+        book_codes, book_authors, book_categories = array("i"), array("i"), array("i")
+        async for book in db.books.secondary_preferred().find({}, {"author": 1, "category": 1}).batch_size(BATCH_SIZE):
+            book_codes.append(books.code(book["_id"]))
+            book_authors.append(authors.code(book.get("author")))
+            book_categories.append(categories.code(book.get("category")))
+
+        rental_book, rental_library, rental_month = array("i"), array("i"), array("i")
+        rental_active = bytearray()
+        async for rental in db.rentals.secondary_preferred().find(
+            {}, {"_id": 0, "book": 1, "library": 1, "checked_out_at": 1, "active": 1}
+        ).batch_size(BATCH_SIZE):
+            if not isinstance(rental.get("checked_out_at"), datetime):
+                continue
+            rental_book.append(books.code(rental.get("book")))
+            rental_library.append(libraries.code(rental.get("library")))
+            rental_month.append(month_code(rental["checked_out_at"]))
+            rental_active.append(bool(rental.get("active")))
+
+        read_user, read_book = array("i"), array("i")
+        user_count = 0
+        async for user in db.users.secondary_preferred().find({"readed_books.0": {"$exists": True}}, {"readed_books": 1}).batch_size(BATCH_SIZE):
+            for book_id in user["readed_books"]:
+                code = books.code(book_id)
+                if code >= 0:
+                    read_user.append(user_count)
+                    read_book.append(code)
+            user_count += 1
+
+        holding_library, holding_total, holding_available = array("i"), array("q"), array("q")
+        async for holding in db.holdings.secondary_preferred().find(
+            {}, {"_id": 0, "library": 1, "total_copies": 1, "available_copies": 1}
+        ).batch_size(BATCH_SIZE):
+            holding_library.append(libraries.code(holding.get("library")))
+            holding_total.append(holding.get("total_copies") or 0)
+            holding_available.append(holding.get("available_copies") or 0)
+
+        names = {
+            "categories": await self._names("categories", categories),
+            "authors": await self._names("authors", authors),
+            "libraries": await self._names("libraries", libraries),
+        }
+
+        # Rentals and reading lists may reference books that no longer exist:
+        # they keep a code but no author or category
+        book_author = np.full(len(books), -1, dtype=np.int32)
+        book_category = np.full(len(books), -1, dtype=np.int32)
+        codes = np.frombuffer(book_codes, dtype=np.int32)
+        book_author[codes] = np.frombuffer(book_authors, dtype=np.int32)
+        book_category[codes] = np.frombuffer(book_categories, dtype=np.int32)
+
+        author_readers, author_reads = _author_readership(
+            book_author,
+            np.frombuffer(read_user, dtype=np.int32),
+            np.frombuffer(read_book, dtype=np.int32),
+            len(authors)
+        )
+
+        # No awaits from here on: readers see either the old or the new snapshot
+        self.books, self.categories, self.authors, self.libraries = books, categories, authors, libraries
+        self.names = names
+        self.book_author, self.book_category = book_author, book_category
+        self.author_readers, self.author_reads = author_readers, author_reads
+        self.rental_book = np.frombuffer(rental_book, dtype=np.int32)
+        self.rental_library = np.frombuffer(rental_library, dtype=np.int32)
+        self.rental_month = np.frombuffer(rental_month, dtype=np.int32)
+        self.rental_active = np.frombuffer(bytes(rental_active), dtype=bool)
+        self.read_user = np.frombuffer(read_user, dtype=np.int32)
+        self.read_book = np.frombuffer(read_book, dtype=np.int32)
+        self.holding_library = np.frombuffer(holding_library, dtype=np.int32)
+        self.holding_total = np.frombuffer(holding_total, dtype=np.int64)
+        self.holding_available = np.frombuffer(holding_available, dtype=np.int64)
+        self.refreshed_at = datetime.utcnow()
+        self.refresh_seconds = time.perf_counter() - started
+        self.ready = True
+        self._loaded.set()
+
+    async def wait_ready(self) -> None:
+        await self._loaded.wait()
+
+    def _ensure_ready(self) -> None:
+        if not self.ready:
+            raise HTTPException(status_code=503, detail="Analytics are still loading")
+
+    def rentals_by_category(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        category: Optional[str] = None
+    ) -> List[CategoryMonthRentals]:
+        self._ensure_ready()
+        mask = self.rental_book >= 0
+        if start:
+            mask &= self.rental_month >= month_code(start)
+        if end:
+            mask &= self.rental_month <= month_code(end)
+
+        categories = self.book_category[self.rental_book[mask]]
+        months = self.rental_month[mask]
+
+        if category:
+            code = self.categories.lookup(category)
+            if code is None:
+                return []
+            categories, months = categories[categories == code], months[categories == code]
+        if not len(months):
+            return []
+
+        # One bincount over (category, month) keys; -1 (uncategorized) shifts to 0
+        first_month = int(months.min())
+        span = int(months.max()) - first_month + 1
+        keys = (categories.astype(np.int64) + 1) * span + (months - first_month)
+        counts = np.bincount(keys)
+        found = np.nonzero(counts)[0]
+
+        category_codes = found // span - 1
+        month_codes = found % span + first_month
+        order = np.lexsort((category_codes, month_codes))
+
+        names = self.names.get("categories", {})
+        return [
+            CategoryMonthRentals(
+                category=str(self.categories.ids[code]) if code >= 0 else None,
+                category_name=names.get(code),
+                month=month_label(month),
+                rentals=int(counts[key])
+            )
+            for key, code, month in zip(found[order], category_codes[order].tolist(), month_codes[order].tolist())
+        ]
+
+    def top_authors(self, limit: int = 10) -> List[AuthorReadership]:
+        self._ensure_ready()
+        readers, reads = self.author_readers, self.author_reads
+
+        limit = min(limit, int(np.count_nonzero(readers)))
+        if limit == 0:
+            return []
+        top = np.argpartition(-readers, limit - 1)[:limit]
+        top = top[np.lexsort((-reads[top], -readers[top]))]
+
+        names = self.names.get("authors", {})
+        return [
+            AuthorReadership(
+                author=str(self.authors.ids[code]),
+                name=names.get(code),
+                readers=int(readers[code]),
+                reads=int(reads[code])
+            )
+            for code in top.tolist()
+        ]
+
+    def library_utilization(self, limit: int = 50) -> List[LibraryUtilization]:
+        self._ensure_ready()
+        size = len(self.libraries)
+        if size == 0:
+            return []
+
+        valid = self.holding_library >= 0
+        holding_library = self.holding_library[valid]
+        titles = np.bincount(holding_library, minlength=size)
+        total = np.bincount(holding_library, weights=self.holding_total[valid], minlength=size)
+        available = np.bincount(holding_library, weights=self.holding_available[valid], minlength=size)
+
+        active = self.rental_active & (self.rental_library >= 0)
+        active_rentals = np.bincount(self.rental_library[active], minlength=size)
+
+        utilization = np.divide(total - available, total, out=np.zeros(size), where=total > 0)
+        candidates = np.nonzero((titles > 0) | (active_rentals > 0))[0]
+        order = candidates[np.lexsort((-active_rentals[candidates], -utilization[candidates]))][:limit]
+
+        names = self.names.get("libraries", {})
+        return [
+            LibraryUtilization(
+                library=str(self.libraries.ids[code]),
+                name=names.get(code),
+                titles=int(titles[code]),
+                total_copies=int(total[code]),
+                available_copies=int(available[code]),
+                active_rentals=int(active_rentals[code]),
+                utilization=round(float(utilization[code]), 4)
+            )
+            for code in order.tolist()
+        ]
+
+    def stats(self) -> dict:
+        arrays = (
+            self.book_author, self.book_category, self.rental_book, self.rental_library, self.rental_month,
+            self.rental_active, self.read_user, self.read_book, self.holding_library, self.holding_total,
+            self.holding_available, self.author_readers, self.author_reads,
+        )
+        return {
+            "ready": self.ready,
+            "refreshed_at": self.refreshed_at,
+            "refresh_seconds": round(self.refresh_seconds, 3),
+            "books": len(self.books),
+            "rentals": len(self.rental_book),
+            "reads": len(self.read_book),
+            "holdings": len(self.holding_library),
+            "memory_bytes": sum(column.nbytes for column in arrays),
+        }
+
+
+analytics_store = AnalyticsStore()
+
+
+async def run_refresh_loop(interval: int):
+    # The first load runs here rather than at startup so it never delays boot
+    while True:
+        try:
+            await analytics_store.rebuild()
+        except Exception as e:
+            print(f"⚠️ Falha ao atualizar analytics: {e}")
+        await asyncio.sleep(interval)
@@ -1,18 +1,35 @@
 from typing import List, Optional
 from bson import ObjectId
+from datetime import date
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
+from ..models.book import BookIdsPageResponse
 from ..models.author import Author, AuthorResponse, UpdateAuthorSchema
+from ..models.dates import as_datetime
 from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.query_cache import cached
+from ..configuration.tracing import traced
+from .subresource_service import find_with_counts, get_book_ids_page
 
 collection = db.authors
+# Lists and reports may be served by a secondary; everything else reads the primary
+secondary_collection = collection.secondary_preferred()
 
+
+async def create_indexes():
+    await collection.create_index("birthdate")
+
+@traced
+@cached("authors")
 async def get_all_authors(
     page: int = 1,
     limit: int = 10,
     name: Optional[str] = None,
     written_book: Optional[str] = None,
-    nationality: Optional[str] = None
+    nationality: Optional[str] = None,
+    birthdate_from: Optional[date] = None,
+    birthdate_to: Optional[date] = None
 ) -> List[AuthorResponse]:
     try:
         if page < 1 or limit < 1:
@@ -29,23 +46,37 @@ async def get_all_authors(
             
         if written_book and ObjectId.is_valid(written_book):
             query["written_books"] = {"$in": [ObjectId(written_book)]}
+
+        if birthdate_from or birthdate_to:
+            query["birthdate"] = {}
+            if birthdate_from:
+                query["birthdate"]["$gte"] = as_datetime(birthdate_from)
+            if birthdate_to:
+                query["birthdate"]["$lte"] = as_datetime(birthdate_to)
         
-        authors = await collection.find(query).skip(skip).limit(limit).to_list(length=limit)
+        authors = await secondary_collection.find(query).skip(skip).limit(limit).to_list(length=limit)
 
         return [
             AuthorResponse(id=str(author["_id"]), **{k: v for k, v in author.items() if k != "_id"})
             for author in authors
         ]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-async def get_author_by_id(author_id: str) -> Optional[AuthorResponse]:
+@traced
+async def get_author_by_id(author_id: str, counts_only: bool = False) -> Optional[AuthorResponse]:
     try:
         if not ObjectId.is_valid(author_id):
             raise ValueError("Invalid ObjectId format")
 
-        author = await collection.find_one({"_id": ObjectId(author_id)})
+        if counts_only:
+            author = await find_with_counts(collection, ObjectId(author_id), ["written_books"])
+        else:
+            author = await collection.find_one({"_id": ObjectId(author_id)})
         if author:
             return AuthorResponse(id=str(author["_id"]), **{k: v for k, v in author.items() if k != "_id"})
 
@@ -54,10 +85,19 @@ async def get_author_by_id(author_id: str) -> Optional[AuthorResponse]:
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid author ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@traced
+async def get_author_books(author_id: str, page: int = 1, limit: int = 50, expand: Optional[str] = None) -> BookIdsPageResponse:
+    return await get_book_ids_page(collection, author_id, "written_books", "author", page=page, limit=limit, expand=expand)
+
+
+@traced
 async def create_author(author: Author) -> Optional[AuthorResponse]:
     try:
         new_author = author.dict()
@@ -70,10 +110,14 @@ async def create_author(author: Author) -> Optional[AuthorResponse]:
         result = await collection.insert_one(new_author)
 
         return AuthorResponse(id=str(result.inserted_id), **new_author)
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating author: {str(e)}")
 
 
+@traced
 async def update_author(author_id: str, author: UpdateAuthorSchema) -> Optional[AuthorResponse]:
     try:
         if not ObjectId.is_valid(author_id):
@@ -91,10 +135,14 @@ async def update_author(author_id: str, author: UpdateAuthorSchema) -> Optional[
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid author ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating author: {str(e)}")
 
 
+@traced
 async def delete_author(author_id: str) -> dict:
     try:
         if not ObjectId.is_valid(author_id):
@@ -110,10 +158,14 @@ async def delete_author(author_id: str) -> dict:
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid author ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting author: {str(e)}")
 
 
+@traced
 async def add_written_book(author_id: str, book_id: str) -> Optional[AuthorResponse]:
     try:
         if not ObjectId.is_valid(author_id) or not ObjectId.is_valid(book_id):
@@ -136,5 +188,8 @@ async def add_written_book(author_id: str, book_id: str) -> Optional[AuthorRespo
 
         return AuthorResponse(id=str(updated_author["_id"]), **{k: v for k, v in updated_author.items() if k != "_id"})
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating author: {str(e)}")
\ No newline at end of file
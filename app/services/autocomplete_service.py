@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import sys
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from ..models.book import BookSuggestion
+from ..configuration.database import db
+from ..configuration.settings import settings
+
+SEPARATOR = "\x00"
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+class TitleIndex:
+    """Sorted array of ``normalized title + NUL + book id`` keys.
+
+    A prefix query is two binary searches for the prefix's key range and a
+    top-k pass over it. Suggestions are ranked by how many libraries hold the
+    book, then by title length (the closest completion first), then
+    alphabetically. Results for short prefixes, whose ranges are the widest
+    and the most requested while typing, are kept in a small LRU: an added
+    title is merged into the cached top-k of its prefixes, and a removed one
+    drops the entries it was part of.
+
+    Ranks are refreshed by writes through ``add`` and by every rebuild.
+    Writes made while a rebuild streams the collection are replayed onto the
+    rebuilt index, so they are not lost to the swap.
+    """
+
+    def __init__(self, max_results: int = 20, cache_prefix_length: int = 3, cache_size: int = 4096):
+        self.max_results = max_results
+        self.cache_prefix_length = cache_prefix_length
+        self.cache_size = cache_size
+        self.ready = False
+        self._keys: List[str] = []
+        self._titles: Dict[str, str] = {}
+        self._scores: Dict[str, int] = {}
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        # (book id, title, score) for each add, (book id, None, None) for each
+        # remove, recorded while a rebuild runs
+        self._replay: Optional[List[Tuple[ObjectId, Optional[str], Optional[int]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def rebuild(self) -> int:
+        titles, scores = {}, {}
+        self._replay = []
+        try:
+            async for book in db.books.secondary_preferred().aggregate([
+                {"$match": {"title": {"$type": "string"}}},
+                {"$project": {"title": 1, "score": {"$size": {"$ifNull": ["$libraries", []]}}}},
+            ], batchSize=5000):
+                titles[str(book["_id"])] = book["title"]
+                scores[str(book["_id"])] = book["score"]
+
+            self._keys = sorted(normalize(title) + SEPARATOR + book_id for book_id, title in titles.items())
+            self._titles, self._scores = titles, scores
+            self._cache.clear()
+
+            replay, self._replay = self._replay, None
+            for book_id, title, score in replay:
+                if title is None:
+                    self.remove(book_id)
+                else:
+                    self.add(book_id, title, score)
+        finally:
+            self._replay = None
+
+        self.ready = True
+        return len(self._keys)
+
+    def _rank(self, key: str) -> Tuple[int, int, str]:
+        book_id = key.rsplit(SEPARATOR, 1)[1]
+        return -self._scores.get(book_id, 0), len(key), key
+
+    def _cached_prefixes(self, normalized: str) -> List[str]:
+        return [
+            normalized[:length] for length in range(1, min(self.cache_prefix_length, len(normalized)) + 1)
+            if normalized[:length] in self._cache
+        ]
+
+    def add(self, book_id: ObjectId, title: Optional[str], score: Optional[int] = None) -> None:
+        """Indexes ``title``; ``score`` (libraries holding the book) defaults
+        to the book's current one."""
+        if self._replay is not None:
+            self._replay.append((book_id, title, score))
+        if score is None:
+            score = self._scores.get(str(book_id), 0)
+        self.remove(book_id, record=False)
+        if not title:
+            return
+        normalized = normalize(title)
+        key = normalized + SEPARATOR + str(book_id)
+        insort(self._keys, key)
+        self._titles[str(book_id)] = title
+        self._scores[str(book_id)] = score
+
+        for prefix in self._cached_prefixes(normalized):
+            ranked = self._cache[prefix]
+            insort(ranked, key, key=self._rank)
+            del ranked[self.max_results:]
+
+    def remove(self, book_id: ObjectId, record: bool = True) -> None:
+        if record and self._replay is not None:
+            self._replay.append((book_id, None, None))
+        title = self._titles.pop(str(book_id), None)
+        if title is None:
+            return
+        normalized = normalize(title)
+        key = normalized + SEPARATOR + str(book_id)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+
+        # The next-best title of the range is unknown, so the entry goes
+        for prefix in self._cached_prefixes(normalized):
+            if key in self._cache[prefix]:
+                del self._cache[prefix]
+        self._scores.pop(str(book_id), None)
+
+    def _top(self, normalized: str) -> List[str]:
+        start = bisect_left(self._keys, normalized)
+        # Every key with the prefix sorts before prefix + the highest code point
+        end = bisect_left(self._keys, normalized + "\U0010ffff", lo=start)
+        return heapq.nsmallest(self.max_results, self._keys[start:end], key=self._rank)
+
+    def search(self, prefix: str, limit: int = 10) -> List[BookSuggestion]:
+        normalized = normalize(prefix)
+        if not normalized:
+            return []
+
+        cacheable = len(normalized) <= self.cache_prefix_length
+        if cacheable and normalized in self._cache:
+            self._cache.move_to_end(normalized)
+            ranked = self._cache[normalized]
+        else:
+            ranked = self._top(normalized)
+            if cacheable:
+                self._cache[normalized] = ranked
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        suggestions = []
+        for key in ranked[:limit]:
+            book_id = key.rsplit(SEPARATOR, 1)[1]
+            suggestions.append(BookSuggestion(id=book_id, title=self._titles[book_id]))
+        return suggestions
+
+    def stats(self) -> dict:
+        size = sys.getsizeof(self._keys) + sum(sys.getsizeof(key) for key in self._keys)
+        size += sys.getsizeof(self._titles) + sum(
+            sys.getsizeof(book_id) + sys.getsizeof(title) for book_id, title in self._titles.items()
+        )
+        size += sys.getsizeof(self._scores) + sum(sys.getsizeof(score) for score in self._scores.values())
+        return {
+            "ready": self.ready,
+            "titles": len(self._keys),
+            "cached_prefixes": len(self._cache),
+            "memory_bytes": size,
+            "bytes_per_million_titles": int(size / len(self._keys) * 1_000_000) if self._keys else 0,
+        }
+
+
+title_index = TitleIndex()
+
+
+async def run_rebuild_loop(interval: int):
+    # Other workers' writes only reach this process' index through a rebuild
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await title_index.rebuild()
+        except Exception as e:
+            print(f"⚠️ Falha ao reconstruir índice de títulos: {e}")
@@ -1,22 +1,58 @@
-from typing import List, Optional
+from collections import defaultdict
+from contextlib import suppress
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from bson import ObjectId
-from datetime import date
+from datetime import date, datetime
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from ..models.book import Book, BookResponse, UpdateBookSchema, BookAuthorResponse, BAuthorResponse
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from ..models.book import Book, BookResponse, UpdateBookSchema, BookAuthorResponse, BAuthorResponse, BulkBooksResponse
+from ..models.isbn import normalize_isbn
+from ..models.dates import as_datetime
 from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.query_cache import cached
+from ..configuration.tracing import traced
+from .holding_service import add_holdings, add_holding_pairs, remove_holdings
+from .isbn_service import may_exist, needs_rebuild, remember_isbn, schedule_rebuild
+from .rental_service import DUPLICATE_KEY_ERROR
+from .category_service import get_subtree_ids
+from .autocomplete_service import title_index
+from .expand_service import BOOK_EXPANSIONS, expand_references, parse_expand
 
 collection = db.books
+# Lists and reports may be served by a secondary; everything else reads the primary
+secondary_collection = collection.secondary_preferred()
 
+
+async def create_indexes():
+    await collection.create_index("category")
+    # Serves date ranges and the (published_date, _id) sort in both directions;
+    # it replaces the single-field index, which left the tie-break to a SORT stage
+    await collection.create_index([("published_date", 1), ("_id", 1)])
+    with suppress(OperationFailure):
+        await collection.drop_index("published_date_1")
+    await collection.create_index("updated_at")
+
+@traced
+@cached("books", "categories", expansions=BOOK_EXPANSIONS)
 async def get_all_books(
     page: int = 1,
     limit: int = 10,
     title: Optional[str] = None,
     author: Optional[str] = None,
     library: Optional[str] = None,
+    category: Optional[str] = None,
+    include_subcategories: bool = False,
     start_date: Optional[date] = None,
-    end_date: Optional[date] = None
+    end_date: Optional[date] = None,
+    sort_by_date: Optional[str] = None,
+    expand: Optional[str] = None
 ) -> List[BookResponse]:
+    expand_fields = parse_expand(BOOK_EXPANSIONS, expand)
+
     try:
         if page < 1 or limit < 1:
             raise HTTPException(status_code=400, detail="Page and limit must be greater than zero")
@@ -32,25 +68,44 @@ async def get_all_books(
             
         if library and ObjectId.is_valid(library):
             query["libraries"] = {"$in": [ObjectId(library)]}
+
+        if category and ObjectId.is_valid(category):
+            if include_subcategories:
+                query["category"] = {"$in": await get_subtree_ids(ObjectId(category))}
+            else:
+                query["category"] = ObjectId(category)
         
         if start_date:
-            query["published_date"] = {"$gte": start_date}
+            query["published_date"] = {"$gte": as_datetime(start_date)}
             
         if end_date:
             if "published_date" not in query:
                 query["published_date"] = {}
-            query["published_date"]["$lte"] = end_date
+            query["published_date"]["$lte"] = as_datetime(end_date)
+
+        cursor = secondary_collection.find(query)
+
+        if sort_by_date:
+            # The _id tie-break follows the date's direction so the compound
+            # index is walked forwards or backwards instead of sorted in memory
+            direction = 1 if sort_by_date == "asc" else -1
+            cursor = cursor.sort([("published_date", direction), ("_id", direction)])
             
-        books = await collection.find(query).skip(skip).limit(limit).to_list(length=limit)
+        books = await cursor.skip(skip).limit(limit).to_list(length=limit)
+        expanded = await expand_references(BOOK_EXPANSIONS, books, expand_fields)
         
         return [
-            BookResponse(id=str(book["_id"]), **{k: v for k, v in book.items() if k != "_id"})
-            for book in books
+            BookResponse(id=str(book["_id"]), expanded=book_expanded, **{k: v for k, v in book.items() if k != "_id"})
+            for book, book_expanded in zip(books, expanded)
         ]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@traced
 async def get_book_by_id(book_id: str) -> Optional[BookResponse]:
     try:
         if not ObjectId.is_valid(book_id):
@@ -65,47 +120,177 @@ async def get_book_by_id(book_id: str) -> Optional[BookResponse]:
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid book ID format")
     
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
             
     
+def prepare_book(book: Book) -> dict:
+    new_book = book.dict()
+
+    author_id = new_book.get("author")
+    if author_id and ObjectId.is_valid(author_id):
+        new_book["author"] = ObjectId(author_id)
+
+    category_id = new_book.get("category")
+    if category_id and ObjectId.is_valid(category_id):
+        new_book["category"] = ObjectId(category_id)
+
+    new_book["libraries"] = [
+        ObjectId(lib_id) for lib_id in new_book.get("libraries", []) if ObjectId.is_valid(lib_id)
+    ]
+    return new_book
+
+
+async def _link_books(new_books: List[dict]) -> None:
+    """Registers inserted books with their authors, libraries and holdings,
+    with one write per author/library instead of one per book."""
+    books_by_author: Dict[ObjectId, List[ObjectId]] = defaultdict(list)
+    books_by_library: Dict[ObjectId, List[ObjectId]] = defaultdict(list)
+
+    for new_book in new_books:
+        if isinstance(new_book.get("author"), ObjectId):
+            books_by_author[new_book["author"]].append(new_book["_id"])
+        for library_id in new_book["libraries"]:
+            books_by_library[library_id].append(new_book["_id"])
+        title_index.add(new_book["_id"], new_book.get("title"), len(new_book["libraries"]))
+        remember_isbn(new_book["isbn"])
+
+    if books_by_author:
+        await db.authors.bulk_write([
+            UpdateOne({"_id": author_id}, {"$addToSet": {"written_books": {"$each": book_ids}}})
+            for author_id, book_ids in books_by_author.items()
+        ], ordered=False)
+
+    if books_by_library:
+        await db.libraries.bulk_write([
+            UpdateOne(
+                {"_id": library_id},
+                {"$addToSet": {"books": {"$each": book_ids}}, "$set": {"updated_at": datetime.utcnow()}}
+            )
+            for library_id, book_ids in books_by_library.items()
+        ], ordered=False)
+        await add_holding_pairs([
+            (library_id, book_id)
+            for library_id, book_ids in books_by_library.items()
+            for book_id in book_ids
+        ])
+
+    if needs_rebuild():
+        # A full scan of the isbn index; the saturated filter still answers
+        # correctly meanwhile, only with more false positives
+        schedule_rebuild()
+
+
+@traced
 async def create_book(book: Book) -> Optional[BookResponse]:
+    new_book = prepare_book(book)
+
+    if may_exist(new_book["isbn"]) and await collection.count_documents({"isbn": new_book["isbn"]}, limit=1):
+        raise HTTPException(status_code=409, detail="A book with this ISBN already exists")
+
     try:
-        new_book = book.dict()
-        
-        author_id = new_book.get("author")
-        if author_id and ObjectId.is_valid(author_id):
-            new_book["author"] = ObjectId(author_id)
-            
-        category_id = new_book.get("category")
-        if category_id and ObjectId.is_valid(category_id):
-            new_book["category"] = ObjectId(category_id)
-            
-        library_ids = new_book.get("libraries", [])
-        new_book["libraries"] = [
-            ObjectId(lib_id) for lib_id in library_ids if ObjectId.is_valid(lib_id)
-        ]
-        
         result = await collection.insert_one(new_book)
-        book_id = result.inserted_id
+        await _link_books([new_book])
         
-        if author_id and ObjectId.is_valid(author_id):
-            await db.authors.update_one(
-                {"_id": ObjectId(author_id)},
-                {"$addToSet": {"written_books": book_id}}
-            )
-            
-        if library_ids:
-            await db.libraries.update_many(
-                {"_id": {"$in": new_book["libraries"]}},
-                {"$addToSet": {"books": book_id}}
-            )
-        
-        return BookResponse(id=str(book_id), **new_book)
+        return BookResponse(id=str(result.inserted_id), **{k: v for k, v in new_book.items() if k != "_id"})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A book with this ISBN already exists")
+
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating book: {str(e)}")
 
 
+@traced
+async def insert_books(new_books: List[dict]) -> Tuple[List[dict], List[dict], List[Tuple[dict, str]]]:
+    """Inserts prepared book documents, skipping ISBNs that already exist.
+
+    Returns the inserted documents, the duplicates and any other rejected
+    documents with their error message.
+    """
+    unique_books = {}
+    duplicates = []
+
+    for new_book in new_books:
+        if new_book["isbn"] in unique_books:
+            duplicates.append(new_book)
+        else:
+            unique_books[new_book["isbn"]] = new_book
+
+    # Only ISBNs the Bloom filter cannot rule out cost a lookup, all in one query
+    candidates = [isbn for isbn in unique_books if may_exist(isbn)]
+    if candidates:
+        async for existing in collection.find({"isbn": {"$in": candidates}}, {"_id": 0, "isbn": 1}):
+            duplicates.append(unique_books.pop(existing["isbn"]))
+
+    to_insert = list(unique_books.values())
+    if not to_insert:
+        return [], duplicates, []
+
+    errors = []
+    try:
+        await collection.insert_many(to_insert, ordered=False)
+        inserted = to_insert
+    except BulkWriteError as e:
+        failed = set()
+        for error in e.details["writeErrors"]:
+            failed.add(error["index"])
+            if error["code"] == DUPLICATE_KEY_ERROR:
+                duplicates.append(to_insert[error["index"]])
+            else:
+                errors.append((to_insert[error["index"]], error["errmsg"]))
+        inserted = [new_book for index, new_book in enumerate(to_insert) if index not in failed]
+
+    await _link_books(inserted)
+    return inserted, duplicates, errors
+
+
+@traced
+async def create_books(books: List[Book]) -> BulkBooksResponse:
+    try:
+        inserted, duplicates, errors = await insert_books([prepare_book(book) for book in books])
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    if errors:
+        raise HTTPException(status_code=500, detail=f"Error creating books: {errors[0][1]}")
+
+    return BulkBooksResponse(
+        inserted=[
+            BookResponse(id=str(new_book["_id"]), **{k: v for k, v in new_book.items() if k != "_id"})
+            for new_book in inserted
+        ],
+        duplicates=[new_book["isbn"] for new_book in duplicates]
+    )
+
+
+@traced
+async def get_book_by_isbn(isbn: str) -> Optional[BookResponse]:
+    try:
+        normalized = normalize_isbn(isbn)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid ISBN format")
+
+    try:
+        book = await collection.find_one({"isbn": normalized})
+        if book:
+            return BookResponse(id=str(book["_id"]), **{k: v for k, v in book.items() if k != "_id"})
+
+        return JSONResponse(status_code=204, content=None)
+
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@traced
 async def update_book(book_id: str, book: UpdateBookSchema) -> Optional[BookResponse]:
     try:
         if not ObjectId.is_valid(book_id):
@@ -113,20 +298,36 @@ async def update_book(book_id: str, book: UpdateBookSchema) -> Optional[BookResp
         
         updated_book = book.dict(exclude_unset=True)
         
-        result = await collection.update_one({"_id": ObjectId(book_id)}, {"$set": updated_book})
+        result = await collection.update_one(
+            {"_id": ObjectId(book_id)},
+            {"$set": {**updated_book, "updated_at": datetime.utcnow()}}
+        )
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Book not found or no update performed")
+
+        if updated_book.get("title"):
+            title_index.add(ObjectId(book_id), updated_book["title"])
+
+        if updated_book.get("isbn"):
+            remember_isbn(updated_book["isbn"])
         
         return await get_book_by_id(book_id)
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid book ID format")
+
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A book with this ISBN already exists")
     
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating book: {str(e)}")
 
 
+@traced
 async def delete_book(book_id: str) -> dict:
     try:
         if not ObjectId.is_valid(book_id):
@@ -137,15 +338,22 @@ async def delete_book(book_id: str) -> dict:
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Book not found")
 
+        await remove_holdings(book_id=ObjectId(book_id))
+        title_index.remove(ObjectId(book_id))
+
         return {"message": "Book deleted successfully"}
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid book ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating book: {str(e)}")
 
 
+@traced
 async def add_libraries_to_book(book_id: str, library_ids: List[str]) -> dict:
     try:
         if not ObjectId.is_valid(book_id):
@@ -158,21 +366,70 @@ async def add_libraries_to_book(book_id: str, library_ids: List[str]) -> dict:
         
         result = await collection.update_one(
             {"_id": ObjectId(book_id)},
-            {"$addToSet": {"library": {"$each": valid_library_ids}}},
+            {"$addToSet": {"libraries": {"$each": valid_library_ids}}, "$set": {"updated_at": datetime.utcnow()}},
         )
 
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Book not found or no update was performed")
 
+        await add_holdings(valid_library_ids, [ObjectId(book_id)])
+
         return {"message": "Libraries added successfully"}
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid ObjectId format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating book: {str(e)}")
     
 
+def _books_with_authors_pipeline(skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+    pipeline = []
+
+    if skip:
+        pipeline.append({"$skip": skip})
+
+    if limit:
+        pipeline.append({"$limit": limit})
+
+    return pipeline + [
+        {
+            "$lookup": {
+                "from": "authors",
+                "localField": "author",
+                "foreignField": "_id",
+                "as": "author_details"
+            }
+        },
+        {
+            "$unwind": {
+                "path": "$author_details",
+                "preserveNullAndEmptyArrays": True
+            }
+        }
+    ]
+
+
+def _to_book_author_response(book: dict) -> BookAuthorResponse:
+    return BookAuthorResponse(
+        id=str(book["_id"]),
+        title=book.get("title"),
+        author=BAuthorResponse(
+            id=str(book.get("author_details", {}).get("_id")),
+            name=str(book.get("author_details").get("name")),
+            nationality=str(book.get("author_details").get("nationality"))
+        ) if book.get("author_details") else None,
+        published_date=book.get("published_date"),
+        isbn=book.get("isbn"),
+        libraries=book.get("libraries", [])
+    )
+
+
+@traced
+@cached("books", "authors")
 async def list_books_with_authors(page: int = 1, limit: int = 10) -> List[BookAuthorResponse]:
     try:
         if page < 1 or limit < 1:
@@ -180,43 +437,19 @@ async def list_books_with_authors(page: int = 1, limit: int = 10) -> List[BookAu
 
         skip = (page - 1) * limit
 
-        books_with_authors = await collection.aggregate([
-            {
-                "$lookup": {
-                    "from": "authors",
-                    "localField": "author",
-                    "foreignField": "_id",
-                    "as": "author_details"
-                }
-            },
-            {
-                "$unwind": {
-                    "path": "$author_details",
-                    "preserveNullAndEmptyArrays": True
-                }
-            },
-            {
-                "$skip": skip
-            },
-            {
-                "$limit": limit
-            }
-        ]).to_list(length=limit)
+        books_with_authors = await secondary_collection.aggregate(
+            _books_with_authors_pipeline(skip=skip, limit=limit)
+        ).to_list(length=limit)
+
+        return [_to_book_author_response(book) for book in books_with_authors]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
 
-        return [
-            BookAuthorResponse(
-                id=str(book["_id"]),
-                title=book.get("title"),
-                author=BAuthorResponse(
-                    id=str(book.get("author_details", {}).get("_id")),
-                    name=str(book.get("author_details").get("name")),
-                    nationality=str(book.get("author_details").get("nationality"))
-                ) if book.get("author_details") else None,
-                published_date=book.get("published_date"),
-                isbn=book.get("isbn"),
-                libraries=book.get("libraries", [])
-            )
-            for book in books_with_authors
-        ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@traced
+async def stream_books_with_authors() -> AsyncIterator[dict]:
+    async for book in secondary_collection.aggregate(_books_with_authors_pipeline(), allowDiskUse=True):
+        yield jsonable_encoder(_to_book_author_response(book))
@@ -4,17 +4,43 @@ from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 from ..models.category import Category, CategoryResponse, UpdateCategorySchema
 from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.query_cache import cached
+from ..configuration.tracing import traced
 from datetime import datetime
 
 collection = db.categories
+# Lists and reports may be served by a secondary; everything else reads the primary
+secondary_collection = collection.secondary_preferred()
 
+
+async def create_indexes():
+    await collection.create_index("ancestors")
+    await collection.create_index("parent_category")
+
+
+@traced
+async def get_subtree_ids(category_id: ObjectId) -> List[ObjectId]:
+    descendants = await collection.distinct("_id", {"ancestors": category_id})
+    return [category_id] + descendants
+
+
+async def _ancestors_for_parent(parent_id: ObjectId) -> List[ObjectId]:
+    parent = await collection.find_one({"_id": parent_id}, {"ancestors": 1})
+    if not parent:
+        raise HTTPException(status_code=400, detail="Parent category not found")
+    return parent.get("ancestors", []) + [parent["_id"]]
+
+@traced
+@cached("categories")
 async def get_all_categories(
     page: int,
     limit: int,
     name: Optional[str] = None,
     status: Optional[bool] = None,
     min_popularity: Optional[float] = None,
-    parent_category: Optional[str] = None
+    parent_category: Optional[str] = None,
+    ancestor: Optional[str] = None
 ) -> List[CategoryResponse]:
     try:
         query = {}
@@ -31,16 +57,23 @@ async def get_all_categories(
         if parent_category and ObjectId.is_valid(parent_category):
             query["parent_category"] = ObjectId(parent_category)
 
-        categories = await collection.find(query).skip((page - 1) * limit).limit(limit).to_list(limit)
+        if ancestor and ObjectId.is_valid(ancestor):
+            query["ancestors"] = ObjectId(ancestor)
+
+        categories = await secondary_collection.find(query).skip((page - 1) * limit).limit(limit).to_list(limit)
 
         return [
             CategoryResponse(id=str(cat["_id"]), **{k: v for k, v in cat.items() if k != "_id"})
             for cat in categories
         ]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@traced
 async def get_category_by_id(category_id: str) -> Optional[CategoryResponse]:
     try:
         if not ObjectId.is_valid(category_id):
@@ -55,50 +88,104 @@ async def get_category_by_id(category_id: str) -> Optional[CategoryResponse]:
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid category ID format")
     
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@traced
 async def create_category(category: Category) -> Optional[CategoryResponse]:
+    new_category = category.dict()
+    new_category["ancestors"] = []
+
+    if new_category["parent_category"] is None:
+        del new_category["parent_category"]
+    elif ObjectId.is_valid(new_category["parent_category"]):
+        new_category["parent_category"] = ObjectId(new_category["parent_category"])
+        new_category["ancestors"] = await _ancestors_for_parent(new_category["parent_category"])
+    else:
+        raise HTTPException(status_code=400, detail="Invalid parent category ID format")
+
     try:
-        new_category = category.dict()
         new_category["created_at"] = new_category["updated_at"] = datetime.utcnow()
         
-        if not ObjectId.is_valid(new_category["parent_category"]):
-            del new_category["parent_category"]
-        
         result = await collection.insert_one(new_category)
     
         return CategoryResponse(id=str(result.inserted_id), **new_category)
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating category: {str(e)}")
 
 
+@traced
 async def update_category(category_id: str, category: UpdateCategorySchema) -> Optional[CategoryResponse]:
+    if not ObjectId.is_valid(category_id):
+        raise HTTPException(status_code=400, detail="Invalid category ID format")
+
+    category_oid = ObjectId(category_id)
+    updated_category = category.dict(exclude_unset=True)
+    new_ancestors = None
+
+    if "parent_category" in updated_category and updated_category["parent_category"] is None:
+        # An explicit null moves the category (and its subtree) to the root
+        new_ancestors = []
+        updated_category["ancestors"] = new_ancestors
+
+    elif ObjectId.is_valid(updated_category.get("parent_category")):
+        updated_category["parent_category"] = ObjectId(updated_category["parent_category"])
+        new_ancestors = await _ancestors_for_parent(updated_category["parent_category"])
+
+        if category_oid in new_ancestors:
+            raise HTTPException(status_code=400, detail="A category cannot be moved under itself or its subcategories")
+
+        updated_category["ancestors"] = new_ancestors
+
+    elif "parent_category" in updated_category:
+        raise HTTPException(status_code=400, detail="Invalid parent category ID format")
+
     try:
-        if not ObjectId.is_valid(category_id):
-            raise ValueError("Invalid ObjectId format")
-        
-        updated_category = category.dict(exclude_unset=True)
         updated_category["updated_at"] = datetime.utcnow()
         
-        if not ObjectId.is_valid(updated_category["parent_category"]):
-            del updated_category["parent_category"]
-        
-        result = await collection.update_one({"_id": ObjectId(category_id)}, {"$set": updated_category})
+        result = await collection.update_one({"_id": category_oid}, {"$set": updated_category})
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Category not found or no update performed")
+
+        if new_ancestors is not None:
+            # Re-parent the whole subtree in one statement: keep each descendant's
+            # path from this category down and swap the prefix above it
+            await collection.update_many(
+                {"ancestors": category_oid},
+                [{"$set": {
+                    "ancestors": {"$concatArrays": [
+                        new_ancestors,
+                        {"$slice": [
+                            "$ancestors",
+                            {"$indexOfArray": ["$ancestors", category_oid]},
+                            {"$size": "$ancestors"}
+                        ]}
+                    ]},
+                    "updated_at": updated_category["updated_at"]
+                }}]
+            )
         
         return await get_category_by_id(category_id)
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid category ID format")
     
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating category: {str(e)}")
 
 
+@traced
 async def delete_category(category_id: str) -> dict:
     try:
         if not ObjectId.is_valid(category_id):
@@ -114,6 +201,9 @@ async def delete_category(category_id: str) -> dict:
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid category ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating category: {str(e)}")
 
@@ -0,0 +1,134 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Type
+from bson import ObjectId
+from fastapi import HTTPException
+from pydantic import BaseModel
+from ..models.expand import ExpandedAuthor, ExpandedBook, ExpandedCategory, ExpandedLibrary
+from ..configuration.database import db
+from ..configuration.settings import settings
+
+
+class Expansion(NamedTuple):
+    collection: str
+    model: Type[BaseModel]
+    many: bool = False
+
+
+# Only these references can be expanded, one level deep: an expanded book's
+# author stays an id
+BOOK_EXPANSIONS: Dict[str, Expansion] = {
+    "author": Expansion("authors", ExpandedAuthor),
+    "category": Expansion("categories", ExpandedCategory),
+    "libraries": Expansion("libraries", ExpandedLibrary, many=True),
+}
+
+USER_EXPANSIONS: Dict[str, Expansion] = {
+    "fav_library": Expansion("libraries", ExpandedLibrary),
+    "fav_category": Expansion("categories", ExpandedCategory),
+    "fav_author": Expansion("authors", ExpandedAuthor),
+    "readed_books": Expansion("books", ExpandedBook, many=True),
+}
+
+LIBRARY_EXPANSIONS: Dict[str, Expansion] = {
+    "books": Expansion("books", ExpandedBook, many=True),
+}
+
+
+def parse_expand(expansions: Dict[str, Expansion], expand: Optional[str]) -> List[str]:
+    """Validates a comma-separated ``expand`` parameter against ``expansions``."""
+    fields = []
+    for field in (part.strip() for part in (expand or "").split(",")):
+        if not field or field in fields:
+            continue
+        if "." in field:
+            raise HTTPException(status_code=400, detail="Nested expansion is not supported")
+        if field not in expansions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot expand '{field}'. Available: {', '.join(expansions)}"
+            )
+        fields.append(field)
+    return fields
+
+
+def _reference_ids(value, many: bool) -> List[ObjectId]:
+    values = (value if isinstance(value, list) else []) if many else [value]
+    ids = []
+    for item in values:
+        if isinstance(item, str) and ObjectId.is_valid(item):
+            item = ObjectId(item)
+        if isinstance(item, ObjectId):
+            ids.append(item)
+    # List references are expanded for the first items only
+    return ids[:settings.EXPAND_MAX_LIST_ITEMS] if many else ids[:1]
+
+
+def _to_model(expansion: Expansion, document: dict) -> BaseModel:
+    return expansion.model(id=str(document["_id"]), **{
+        k: str(v) if isinstance(v, ObjectId) else v for k, v in document.items() if k != "_id"
+    })
+
+
+async def _fetch(collection_name: str, ids: Set[ObjectId], fields: Set[str]) -> Dict[ObjectId, dict]:
+    cursor = db[collection_name].secondary_preferred().find(
+        {"_id": {"$in": list(ids)}}, {field: 1 for field in fields}
+    )
+    return {document["_id"]: document async for document in cursor}
+
+
+def _projection(expansion: Expansion) -> Set[str]:
+    return {name for name in expansion.model.__fields__ if name != "id"}
+
+
+async def resolve_ids(expansion: Expansion, ids: List[ObjectId]) -> List[BaseModel]:
+    """Expands a list of ids with one ``$in`` query, keeping their order."""
+    if not ids:
+        return []
+    found = await _fetch(expansion.collection, set(ids), _projection(expansion))
+    return [_to_model(expansion, found[reference]) for reference in ids if reference in found]
+
+
+async def expand_references(
+    expansions: Dict[str, Expansion],
+    documents: List[dict],
+    fields: List[str]
+) -> List[Optional[dict]]:
+    """Resolves ``fields`` for a whole page of ``documents``.
+
+    References are gathered across the page and each referenced collection
+    is read once, with a projected ``$in`` query, instead of once per
+    document. Returns one ``{field: expanded}`` dict per document; missing
+    references expand to ``None`` (or are left out of lists).
+    """
+    if not fields or not documents:
+        return [None] * len(documents)
+
+    references = [
+        {field: _reference_ids(document.get(field), expansions[field].many) for field in fields}
+        for document in documents
+    ]
+
+    ids: Dict[str, Set[ObjectId]] = defaultdict(set)
+    projections: Dict[str, Set[str]] = defaultdict(set)
+    for field in fields:
+        expansion = expansions[field]
+        projections[expansion.collection].update(_projection(expansion))
+        for document_references in references:
+            ids[expansion.collection].update(document_references[field])
+
+    collections = [name for name in ids if ids[name]]
+    fetched = dict(zip(collections, await asyncio.gather(*[
+        _fetch(name, ids[name], projections[name]) for name in collections
+    ])))
+
+    expanded = []
+    for document_references in references:
+        item = {}
+        for field in fields:
+            expansion = expansions[field]
+            found = fetched.get(expansion.collection, {})
+            resolved = [_to_model(expansion, found[reference]) for reference in document_references[field] if reference in found]
+            item[field] = resolved if expansion.many else (resolved[0] if resolved else None)
+        expanded.append(item)
+    return expanded
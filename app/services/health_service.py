@@ -0,0 +1,90 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from datetime import datetime
+import pymongo
+from ..models.health import ReadinessResponse, StartupStep
+from ..configuration.database import get_client
+from ..configuration.settings import settings
+
+
+class Readiness:
+    """Startup progress reported by ``/health/ready``.
+
+    The process is live as soon as it serves requests; it is ready once the
+    server answered, the indexes exist and the warm-up finished, and stops
+    being ready when shutdown begins.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.started_at = datetime.utcnow()
+        self.ready_at: Optional[datetime] = None
+        self.steps: Dict[str, StartupStep] = {}
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.ready_at = datetime.utcnow()
+
+    def mark_draining(self) -> None:
+        self.ready = False
+
+    def report(self) -> ReadinessResponse:
+        return ReadinessResponse(
+            status="ready" if self.ready else "starting" if self.ready_at is None else "draining",
+            ready=self.ready,
+            started_at=self.started_at,
+            ready_at=self.ready_at,
+            steps=list(self.steps.values())
+        )
+
+
+readiness = Readiness()
+
+
+async def run_step(name: str, step: Callable[[], Awaitable], required: bool = False) -> bool:
+    """Runs one startup step and records its outcome.
+
+    A required step is retried every ``STARTUP_RETRY_SECONDS`` until it
+    succeeds, keeping the process unready meanwhile; an optional one is
+    recorded as failed and startup moves on.
+    """
+    attempts = 0
+    while True:
+        attempts += 1
+        started = time.perf_counter()
+        readiness.steps[name] = StartupStep(name=name, status="running", attempts=attempts)
+        try:
+            await step()
+        except asyncio.CancelledError:
+            readiness.steps[name] = StartupStep(
+                name=name, status="timed out", attempts=attempts, seconds=round(time.perf_counter() - started, 3)
+            )
+            raise
+        except Exception as e:
+            readiness.steps[name] = StartupStep(
+                name=name, status="failed", attempts=attempts,
+                seconds=round(time.perf_counter() - started, 3), error=str(e)
+            )
+            print(f"⚠️ Falha na etapa de inicialização {name}: {e}")
+            if not required:
+                return False
+            await asyncio.sleep(settings.STARTUP_RETRY_SECONDS)
+            continue
+
+        readiness.steps[name] = StartupStep(
+            name=name, status="done", attempts=attempts, seconds=round(time.perf_counter() - started, 3)
+        )
+        return True
+
+
+async def ping() -> None:
+    with pymongo.timeout(settings.STARTUP_RETRY_SECONDS * 5):
+        await get_client().admin.command("ping")
+
+
+async def warm_connection_pool(size: int) -> None:
+    """Opens ``size`` connections up front with concurrent pings, so the
+    first requests do not pay for TCP and auth handshakes."""
+    if size > 0:
+        await asyncio.gather(*[get_client().admin.command("ping") for _ in range(size)])
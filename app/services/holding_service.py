@@ -0,0 +1,216 @@
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+from ..models.holding import HoldingSchema, HoldingResponse
+from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.query_cache import cached
+from ..configuration.tracing import traced
+
+collection = db.holdings
+# Lists and reports may be served by a secondary; everything else reads the primary
+secondary_collection = collection.secondary_preferred()
+
+
+async def create_indexes():
+    # (library, book) answers "what does this library hold", (book, available_copies)
+    # answers "where can I rent this book now" with a single index range
+    await collection.create_index([("library", 1), ("book", 1)], unique=True)
+    await collection.create_index([("book", 1), ("available_copies", 1)])
+
+
+def _to_response(holding: dict) -> HoldingResponse:
+    return HoldingResponse(id=str(holding["_id"]), **{k: v for k, v in holding.items() if k != "_id"})
+
+
+@traced
+async def add_holding_pairs(pairs: List[Tuple[ObjectId, ObjectId]], copies: int = 1) -> None:
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"library": library_id, "book": book_id},
+            {"$setOnInsert": {"total_copies": copies, "available_copies": copies, "updated_at": now}},
+            upsert=True
+        )
+        for library_id, book_id in pairs
+    ]
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+
+
+@traced
+async def add_holdings(library_ids: List[ObjectId], book_ids: List[ObjectId], copies: int = 1) -> None:
+    await add_holding_pairs(
+        [(library_id, book_id) for library_id in library_ids for book_id in book_ids],
+        copies=copies
+    )
+
+
+@traced
+async def remove_holdings(library_id: Optional[ObjectId] = None, book_id: Optional[ObjectId] = None) -> None:
+    query = {}
+    if library_id:
+        query["library"] = library_id
+    if book_id:
+        query["book"] = book_id
+    if query:
+        await collection.delete_many(query)
+
+
+@traced
+async def take_copy(library_id: ObjectId, book_id: ObjectId) -> Optional[dict]:
+    return await collection.find_one_and_update(
+        {"library": library_id, "book": book_id, "available_copies": {"$gt": 0}},
+        {"$inc": {"available_copies": -1}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+@traced
+async def release_copy(library_id: ObjectId, book_id: ObjectId) -> Optional[dict]:
+    return await collection.find_one_and_update(
+        {
+            "library": library_id,
+            "book": book_id,
+            "$expr": {"$lt": ["$available_copies", "$total_copies"]}
+        },
+        {"$inc": {"available_copies": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+@traced
+@cached("holdings")
+async def get_all_holdings(
+    page: int,
+    limit: int,
+    library: Optional[str] = None,
+    book: Optional[str] = None,
+    available: Optional[bool] = None
+) -> List[HoldingResponse]:
+    try:
+        query = {}
+
+        if library and ObjectId.is_valid(library):
+            query["library"] = ObjectId(library)
+
+        if book and ObjectId.is_valid(book):
+            query["book"] = ObjectId(book)
+
+        if available is True:
+            query["available_copies"] = {"$gt": 0}
+        elif available is False:
+            query["available_copies"] = 0
+
+        holdings = await secondary_collection.find(query).skip((page - 1) * limit).limit(limit).to_list(limit)
+
+        return [_to_response(holding) for holding in holdings]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@traced
+async def get_book_availability(book_id: str) -> List[HoldingResponse]:
+    try:
+        if not ObjectId.is_valid(book_id):
+            raise ValueError("Invalid ObjectId format")
+
+        holdings = await collection.find(
+            {"book": ObjectId(book_id), "available_copies": {"$gt": 0}}
+        ).to_list(length=None)
+
+        return [_to_response(holding) for holding in holdings]
+
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid book ID format")
+
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@traced
+async def set_holding_copies(library_id: str, book_id: str, holding: HoldingSchema) -> HoldingResponse:
+    if not ObjectId.is_valid(library_id) or not ObjectId.is_valid(book_id):
+        raise HTTPException(status_code=400, detail="Invalid ObjectId format")
+
+    total = holding.total_copies
+
+    try:
+        # Copies currently rented out stay rented: available moves by the same delta as total
+        updated = await collection.find_one_and_update(
+            {"library": ObjectId(library_id), "book": ObjectId(book_id)},
+            [{"$set": {
+                "available_copies": {"$max": [0, {"$add": [
+                    {"$ifNull": ["$available_copies", 0]},
+                    {"$subtract": [total, {"$ifNull": ["$total_copies", 0]}]}
+                ]}]},
+                "total_copies": total,
+                "updated_at": datetime.utcnow()
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating holding: {str(e)}")
+
+    # The books/libraries arrays mirror the holdings: a holding with copies
+    # links the pair, one without copies unlinks it. updated_at moves with
+    # the membership so incremental snapshots pick it up
+    now = datetime.utcnow()
+    operator = "$addToSet" if total else "$pull"
+    await db.libraries.update_one(
+        {"_id": ObjectId(library_id)},
+        {operator: {"books": ObjectId(book_id)}, "$set": {"updated_at": now}}
+    )
+    await db.books.update_one(
+        {"_id": ObjectId(book_id)},
+        {operator: {"libraries": ObjectId(library_id)}, "$set": {"updated_at": now}}
+    )
+
+    return _to_response(updated)
+
+
+@traced
+async def withdraw_copy(library_id: str, book_id: str) -> HoldingResponse:
+    """Copy adjustment: takes a copy off the shelf (repair, display, lost)
+    without recording a rental. Rentals go through ``record_rentals``, which
+    takes the copy and writes the ledger entry together."""
+    if not ObjectId.is_valid(library_id) or not ObjectId.is_valid(book_id):
+        raise HTTPException(status_code=400, detail="Invalid ObjectId format")
+
+    holding = await take_copy(ObjectId(library_id), ObjectId(book_id))
+
+    if not holding:
+        if await collection.count_documents({"library": ObjectId(library_id), "book": ObjectId(book_id)}, limit=1):
+            raise HTTPException(status_code=409, detail="No copies available")
+        raise HTTPException(status_code=404, detail="Holding not found")
+
+    return _to_response(holding)
+
+
+@traced
+async def restore_copy(library_id: str, book_id: str) -> HoldingResponse:
+    """Copy adjustment: puts a withdrawn copy back on the shelf. Rented
+    copies come back through ``return_rental``."""
+    if not ObjectId.is_valid(library_id) or not ObjectId.is_valid(book_id):
+        raise HTTPException(status_code=400, detail="Invalid ObjectId format")
+
+    holding = await release_copy(ObjectId(library_id), ObjectId(book_id))
+
+    if not holding:
+        if await collection.count_documents({"library": ObjectId(library_id), "book": ObjectId(book_id)}, limit=1):
+            raise HTTPException(status_code=409, detail="All copies are already on the shelf")
+        raise HTTPException(status_code=404, detail="Holding not found")
+
+    return _to_response(holding)
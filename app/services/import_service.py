@@ -0,0 +1,385 @@
+import asyncio
+import codecs
+import csv
+import hashlib
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Type
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import SHAPE_LIST
+from pymongo.errors import BulkWriteError
+from ..models.author import Author
+from ..models.book import Book
+from ..models.import_job import ImportJobResponse, ImportErrorResponse
+from ..models.library import Library
+from ..configuration.database import db
+from ..configuration.settings import settings
+from .book_service import insert_books, prepare_book
+from .holding_service import add_holding_pairs
+from .rental_service import DUPLICATE_KEY_ERROR
+
+collection = db.import_jobs
+errors_collection = db.import_errors
+
+IMPORT_KINDS: Dict[str, Type[BaseModel]] = {
+    "books": Book,
+    "authors": Author,
+    "libraries": Library,
+}
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# CSV cells holding a list (libraries, written_books, books) use this separator
+LIST_SEPARATOR = "|"
+
+
+async def create_indexes():
+    await collection.create_index("created_at")
+    await errors_collection.create_index([("import", 1), ("row", 1)])
+
+
+def _to_response(job: dict) -> ImportJobResponse:
+    return ImportJobResponse(id=str(job["_id"]), **{k: v for k, v in job.items() if k != "_id"})
+
+
+def _row_id(import_id: ObjectId, row: int) -> ObjectId:
+    """Deterministic _id for a row, so replaying a batch after a resume hits
+    a duplicate key instead of inserting the row twice."""
+    digest = hashlib.blake2b(f"{import_id}:{row}".encode(), digest_size=8).digest()
+    return ObjectId(import_id.binary[:4] + digest)
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Optional[str]]:
+    """Splits the upload into lines. A line longer than
+    ``IMPORT_MAX_LINE_BYTES`` is never held whole: it is dropped up to its
+    line break and yielded as ``None``."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending, oversized = b"", False
+    async for chunk in chunks:
+        # A UTF-8 multi-byte sequence never contains a newline byte
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if oversized or len(line) > settings.IMPORT_MAX_LINE_BYTES:
+                oversized = False
+                yield None
+            else:
+                yield decoder.decode(line).rstrip("\r")
+        if oversized or len(pending) > settings.IMPORT_MAX_LINE_BYTES:
+            pending, oversized = b"", True
+
+    if oversized:
+        yield None
+    elif pending:
+        yield decoder.decode(pending, final=True).rstrip("\r")
+
+
+def _csv_row(model: Type[BaseModel], header: List[str], values: List[str]) -> dict:
+    row = {}
+    for name, value in zip(header, values):
+        if value == "":
+            continue
+        field = model.__fields__.get(name)
+        if field is not None and field.shape == SHAPE_LIST:
+            row[name] = [item for item in value.split(LIST_SEPARATOR) if item]
+        else:
+            row[name] = value
+    return row
+
+
+def _line_too_long() -> str:
+    return f"Line longer than {settings.IMPORT_MAX_LINE_BYTES} bytes"
+
+
+async def iter_rows(model: Type[BaseModel], chunks: AsyncIterator[bytes], format: str) -> AsyncIterator[Tuple[Optional[dict], Optional[str]]]:
+    """Parses CSV (with a header line) or JSONL incrementally, yielding one
+    ``(row, parse_error)`` pair per record."""
+    if format == "jsonl":
+        async for line in _lines(chunks):
+            if line is None:
+                yield None, _line_too_long()
+                continue
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(row, dict):
+                yield row, None
+            else:
+                yield None, "Each line must be a JSON object"
+        return
+
+    header, record, skipping = None, "", False
+    async for line in _lines(chunks):
+        if line is None:
+            record = ""
+            yield None, _line_too_long()
+            continue
+        if skipping:
+            # The rest of a record dropped for its length, up to its closing quote
+            skipping = not line.count('"') % 2
+            continue
+        # A quoted cell may span lines: the record is complete once its
+        # quotes are balanced
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            if len(record) > settings.IMPORT_MAX_LINE_BYTES:
+                record, skipping = "", True
+                yield None, _line_too_long()
+            continue
+        values, record = next(csv.reader([record])), ""
+        if header is None:
+            header = [name.strip() for name in values]
+        elif any(values):
+            yield _csv_row(model, header, values), None
+
+    if record:
+        yield None, "Unterminated quoted field at end of file"
+
+
+def _prepare(kind: str, document: BaseModel) -> dict:
+    if kind == "books":
+        return prepare_book(document)
+
+    new_document = document.dict()
+    for field in ("written_books", "books"):
+        if field in new_document:
+            new_document[field] = [ObjectId(item) for item in new_document[field] if ObjectId.is_valid(item)]
+    return new_document
+
+
+async def _insert_documents(kind: str, documents: List[dict]) -> Tuple[int, int, List[Tuple[dict, str]]]:
+    """Writes one validated batch; returns (inserted, duplicates, errors)."""
+    if kind == "books":
+        inserted, duplicates, errors = await insert_books(documents)
+        return len(inserted), len(duplicates), errors
+
+    errors = []
+    failed = set()
+    try:
+        await db[kind].insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            failed.add(error["index"])
+            # A duplicate _id is a row already written before a resume
+            if error["code"] != DUPLICATE_KEY_ERROR:
+                errors.append((documents[error["index"]], error["errmsg"]))
+
+    inserted = [document for index, document in enumerate(documents) if index not in failed]
+    if kind == "libraries":
+        await add_holding_pairs([
+            (library["_id"], book_id) for library in inserted for book_id in library.get("books", [])
+        ])
+    return len(inserted), 0, errors
+
+
+class _ImportRun:
+    """State of one import while it streams: the write semaphore that bounds
+    in-flight batches and the watermark of contiguously committed rows."""
+
+    def __init__(self, job: dict):
+        self.job = job
+        self.model = IMPORT_KINDS[job["kind"]]
+        self.in_flight = asyncio.Semaphore(settings.IMPORT_MAX_IN_FLIGHT)
+        self.tasks: List[asyncio.Task] = []
+        self.batch_ends: Dict[int, int] = {}
+        self.finished_batches = set()
+        self.next_batch = 0
+        self.submitted = 0
+        self.rows = 0
+        self.committed = job.get("rows_committed", 0)
+        self.errors_recorded = job.get("failed", 0)
+
+    async def record_errors(self, errors: List[Tuple[int, str, Optional[dict]]]) -> None:
+        room = settings.IMPORT_MAX_ERRORS - self.errors_recorded
+        self.errors_recorded += len(errors)
+        if errors and room > 0:
+            # Rows are kept as JSON text: keys with "$" or "." are not valid
+            # field names and would fail the whole insert
+            await errors_collection.insert_many([
+                {
+                    "import": self.job["_id"],
+                    "row": row,
+                    "error": error,
+                    "data": None if data is None else json.dumps(data, default=str, ensure_ascii=False)
+                }
+                for row, error, data in errors[:room]
+            ])
+
+    async def write_batch(self, sequence: int, batch: List[Tuple[int, dict]], invalid: List[Tuple[int, str, Optional[dict]]]) -> None:
+        try:
+            rows_by_id = {document["_id"]: row for row, document in batch}
+            inserted, duplicates, errors = 0, 0, []
+            if batch:
+                inserted, duplicates, errors = await _insert_documents(
+                    self.job["kind"], [document for _, document in batch]
+                )
+
+            failed = invalid + [
+                (rows_by_id[document["_id"]], message, None) for document, message in errors
+            ]
+            await self.record_errors(failed)
+
+            self.finished_batches.add(sequence)
+            while self.next_batch in self.finished_batches:
+                self.finished_batches.discard(self.next_batch)
+                self.committed = self.batch_ends.pop(self.next_batch)
+                self.next_batch += 1
+
+            await collection.update_one(
+                {"_id": self.job["_id"]},
+                {
+                    "$inc": {"inserted": inserted, "duplicates": duplicates, "failed": len(failed)},
+                    "$max": {"rows_committed": self.committed},
+                    "$set": {"updated_at": datetime.utcnow()},
+                }
+            )
+        finally:
+            self.in_flight.release()
+
+    async def submit(self, batch: List[Tuple[int, dict]], invalid: List[Tuple[int, str, Optional[dict]]], last_row: int) -> None:
+        # Waiting here stops the reader, which stops pulling from the upload
+        await self.in_flight.acquire()
+        for task in self.tasks:
+            if task.done() and not task.cancelled() and task.exception():
+                self.in_flight.release()
+                raise task.exception()
+        self.tasks = [task for task in self.tasks if not task.done()]
+
+        sequence = self.submitted
+        self.submitted += 1
+        self.batch_ends[sequence] = last_row
+        self.tasks.append(asyncio.create_task(self.write_batch(sequence, batch, invalid)))
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> int:
+        import_id, skip = self.job["_id"], self.job.get("rows_committed", 0)
+        batch, invalid, row = [], [], 0
+
+        async for data, parse_error in iter_rows(self.model, chunks, self.job["format"]):
+            row += 1
+            self.rows = row
+            if row <= skip:
+                continue
+
+            if parse_error:
+                invalid.append((row, parse_error, None))
+            else:
+                try:
+                    document = _prepare(self.job["kind"], self.model(**data))
+                    document["_id"] = _row_id(import_id, row)
+                    batch.append((row, document))
+                except (ValidationError, ValueError, TypeError) as e:
+                    invalid.append((row, str(e), data))
+
+            if len(batch) + len(invalid) >= settings.IMPORT_BATCH_SIZE:
+                await self.submit(batch, invalid, row)
+                batch, invalid = [], []
+
+        if batch or invalid:
+            await self.submit(batch, invalid, row)
+
+        await asyncio.gather(*self.tasks)
+        return row
+
+
+async def run_import(
+    kind: str,
+    format: str,
+    chunks: AsyncIterator[bytes],
+    source: Optional[str] = None,
+    import_id: Optional[str] = None
+) -> ImportJobResponse:
+    """Streams ``chunks`` into the ``kind`` collection.
+
+    Passing the ``import_id`` of an interrupted import resumes it: rows up to
+    its ``rows_committed`` watermark are skipped, and rows written past the
+    watermark are recognised by their deterministic ``_id``.
+    """
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown import kind. Valid kinds: {', '.join(IMPORT_KINDS)}")
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown import format. Valid formats: {', '.join(IMPORT_FORMATS)}")
+
+    now = datetime.utcnow()
+    if import_id:
+        if not ObjectId.is_valid(import_id):
+            raise HTTPException(status_code=400, detail="Invalid import ID format")
+        job = await collection.find_one_and_update(
+            {"_id": ObjectId(import_id), "kind": kind, "status": "interrupted"},
+            {"$set": {"status": "running", "format": format, "updated_at": now, "error": None}},
+        )
+        if not job:
+            raise HTTPException(status_code=409, detail="Import not found, of another kind, or not resumable")
+    else:
+        job = {
+            "kind": kind,
+            "format": format,
+            "source": source,
+            "status": "running",
+            "created_at": now,
+            "updated_at": now,
+            "rows_read": 0,
+            "rows_committed": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "failed": 0,
+        }
+        job["_id"] = (await collection.insert_one(job)).inserted_id
+
+    run = _ImportRun(job)
+    status, error = "done", None
+    try:
+        await run.run(chunks)
+    except asyncio.CancelledError:
+        status = "interrupted"
+        for task in run.tasks:
+            task.cancel()
+        raise
+    except Exception as e:
+        # Let batches already handed to Mongo land so the watermark covers them
+        status, error = "interrupted", str(e)
+        await asyncio.gather(*run.tasks, return_exceptions=True)
+    finally:
+        await asyncio.shield(collection.update_one(
+            {"_id": job["_id"]},
+            {
+                "$set": {"status": status, "error": error, "updated_at": datetime.utcnow(),
+                         **({"finished_at": datetime.utcnow()} if status == "done" else {})},
+                "$max": {"rows_read": run.rows, "rows_committed": run.committed},
+            }
+        ))
+
+    return await get_import(str(job["_id"]))
+
+
+async def get_import(import_id: str) -> ImportJobResponse:
+    if not ObjectId.is_valid(import_id):
+        raise HTTPException(status_code=400, detail="Invalid import ID format")
+
+    job = await collection.find_one({"_id": ObjectId(import_id)})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+
+    return _to_response(job)
+
+
+async def get_import_errors(import_id: str, page: int = 1, limit: int = 100) -> List[ImportErrorResponse]:
+    if not ObjectId.is_valid(import_id):
+        raise HTTPException(status_code=400, detail="Invalid import ID format")
+
+    errors = await errors_collection.find({"import": ObjectId(import_id)}, {"_id": 0, "import": 0}) \
+        .sort("row", 1) \
+        .skip((page - 1) * limit) \
+        .limit(limit) \
+        .to_list(length=limit)
+
+    return [
+        ImportErrorResponse(**{
+            **error,
+            "data": json.loads(error["data"]) if isinstance(error.get("data"), str) else error.get("data")
+        })
+        for error in errors
+    ]
@@ -0,0 +1,128 @@
+import asyncio
+import contextvars
+import hashlib
+import math
+from typing import Iterable, List, Optional
+from pymongo.errors import OperationFailure
+from ..configuration.database import db
+from .rental_service import DUPLICATE_KEY_ERROR
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    @property
+    def saturated(self) -> bool:
+        return self.count > self.capacity
+
+
+# "Maybe present" answers are confirmed against the unique isbn index; a "no"
+# is definitive for this process, and other workers' inserts are caught by
+# the index when the filter is stale.
+isbn_filter: Optional[BloomFilter] = None
+
+# ISBNs remembered while a rebuild scans the collection; added to the new
+# filter when it replaces the old one, so they are not lost to the swap
+_remembered_during_rebuild: Optional[List[str]] = None
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+async def create_indexes():
+    # create_book relies on this index to answer duplicates with 409, so a
+    # failure fails the required indexes step and keeps the process unready
+    try:
+        await db.books.create_index(
+            "isbn",
+            unique=True,
+            partialFilterExpression={"isbn": {"$type": "string"}}
+        )
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY_ERROR:
+            raise
+        raise RuntimeError(
+            "Índice único de ISBN não criado: há ISBNs duplicados. "
+            "Normalize-os com python -m app.migrations.isbn13 e resolva os conflitos listados"
+        ) from e
+
+
+async def rebuild_isbn_filter(headroom: float = 2.0) -> int:
+    """Rebuilds the filter from a covered scan of the isbn index. Errors,
+    including timeouts, propagate and leave the current filter in place."""
+    global isbn_filter, _remembered_during_rebuild
+    total = await db.books.estimated_document_count()
+    bloom = BloomFilter(capacity=max(int(total * headroom), 100_000))
+
+    _remembered_during_rebuild = []
+    try:
+        # Covered by the isbn index: no documents are fetched
+        cursor = db.books.secondary_preferred().find({"isbn": {"$type": "string"}}, {"_id": 0, "isbn": 1}) \
+            .hint([("isbn", 1)]) \
+            .batch_size(10000)
+        async for book in cursor:
+            bloom.add(book["isbn"])
+
+        for isbn in _remembered_during_rebuild:
+            bloom.add(isbn)
+    finally:
+        _remembered_during_rebuild = None
+
+    isbn_filter = bloom
+    return bloom.count
+
+
+async def _rebuild_in_background() -> None:
+    try:
+        count = await rebuild_isbn_filter()
+        print(f"🔁 Filtro de ISBN reconstruído com {count} ISBNs")
+    except Exception as e:
+        print(f"⚠️ Filtro de ISBN não reconstruído: {e}")
+
+
+def schedule_rebuild() -> None:
+    """Starts a rebuild outside the calling request, unless one is running.
+
+    The task gets an empty context, so it runs without the request's time
+    budget, operation id or tracing span.
+    """
+    global _rebuild_task
+    if _rebuild_task is not None and not _rebuild_task.done():
+        return
+    _rebuild_task = asyncio.get_running_loop().create_task(_rebuild_in_background(), context=contextvars.Context())
+
+
+def remember_isbn(isbn: str) -> None:
+    if isbn_filter is not None:
+        isbn_filter.add(isbn)
+    if _remembered_during_rebuild is not None:
+        _remembered_during_rebuild.append(isbn)
+
+
+def may_exist(isbn: str) -> bool:
+    # Until the filter is built every ISBN has to be checked against the index
+    return isbn_filter is None or isbn in isbn_filter
+
+
+def needs_rebuild() -> bool:
+    return isbn_filter is not None and isbn_filter.saturated
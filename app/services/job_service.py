@@ -0,0 +1,242 @@
+import asyncio
+from contextlib import suppress
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set, Type
+from bson import ObjectId
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+from ..models.job import JobSchema, JobResponse, JobResultChunkResponse, NoJobParams
+from ..configuration.database import db
+from ..configuration.settings import settings
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.tracing import current_traceparent, parse_traceparent, start_span
+from .book_service import stream_books_with_authors
+from .user_service import stream_users_with_rental_books_and_libraries
+
+collection = db.jobs
+results_collection = db.job_results
+
+class JobKind(NamedTuple):
+    handler: Callable[..., AsyncIterator[dict]]
+    # Client params are validated against this model and passed as keywords
+    params: Type[BaseModel] = NoJobParams
+
+
+JOB_KINDS: Dict[str, JobKind] = {
+    "books-with-authors": JobKind(stream_books_with_authors),
+    "users-rental-books-libraries": JobKind(stream_users_with_rental_books_and_libraries),
+}
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+# Ids in _queue, so polling does not queue a job twice
+_enqueued: Set[ObjectId] = set()
+
+
+def register_job_kind(kind: str, handler: Callable[..., AsyncIterator[dict]], params: Type[BaseModel] = NoJobParams) -> None:
+    """Lets services that depend on this module add their own job kinds."""
+    JOB_KINDS[kind] = JobKind(handler, params)
+
+
+async def create_indexes():
+    await collection.create_index([("status", 1), ("created_at", 1)])
+    # Jobs expire once finished; queued and running ones have no finished_at
+    await collection.create_index("finished_at", expireAfterSeconds=settings.JOB_RETENTION_SECONDS)
+    with suppress(OperationFailure):
+        await collection.drop_index("created_at_1")
+    await results_collection.create_index([("job", 1), ("chunk", 1)], unique=True)
+    await results_collection.create_index("created_at", expireAfterSeconds=settings.JOB_RETENTION_SECONDS)
+
+
+def to_job_response(job: dict) -> JobResponse:
+    return JobResponse(id=str(job["_id"]), **{k: v for k, v in job.items() if k != "_id"})
+
+
+async def _run_job(job: dict) -> None:
+    kind = JOB_KINDS[job["kind"]]
+    params = kind.params(**job.get("params", {}))
+    chunk, items, total = 0, [], 0
+
+    async for item in kind.handler(**params.dict()):
+        items.append(item)
+        total += 1
+        if len(items) >= settings.JOB_RESULT_CHUNK_SIZE:
+            await results_collection.insert_one(
+                {"job": job["_id"], "chunk": chunk, "items": items, "created_at": job["created_at"]}
+            )
+            chunk, items = chunk + 1, []
+
+    if items or chunk == 0:
+        await results_collection.insert_one(
+            {"job": job["_id"], "chunk": chunk, "items": items, "created_at": job["created_at"]}
+        )
+        chunk += 1
+
+    await collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "done", "finished_at": datetime.utcnow(), "total_items": total, "chunks": chunk}}
+    )
+
+
+async def _worker() -> None:
+    while True:
+        job_id = await _queue.get()
+        _enqueued.discard(job_id)
+        try:
+            # Claiming is atomic, so a job re-queued by several processes still runs once
+            job = await collection.find_one_and_update(
+                {"_id": job_id, "status": "queued"},
+                {"$set": {"status": "running", "started_at": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                continue
+
+            # The job continues the trace of the request that submitted it
+            with start_span(f"job {job['kind']}", parent=parse_traceparent(job.get("traceparent"))):
+                await results_collection.delete_many({"job": job_id})
+                await asyncio.wait_for(_run_job(job), timeout=settings.JOB_TIMEOUT_SECONDS)
+
+        except asyncio.CancelledError:
+            await collection.update_one({"_id": job_id, "status": "running"}, {"$set": {"status": "queued"}})
+            raise
+
+        except asyncio.TimeoutError:
+            await collection.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "finished_at": datetime.utcnow(), "error": "Job timed out"}}
+            )
+
+        except Exception as e:
+            await collection.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "finished_at": datetime.utcnow(), "error": str(e)}}
+            )
+
+        finally:
+            _queue.task_done()
+
+
+def _enqueue(job_id: ObjectId) -> None:
+    # A job that does not fit stays queued in Mongo for the next poll
+    if job_id in _enqueued or _queue.full():
+        return
+    _enqueued.add(job_id)
+    _queue.put_nowait(job_id)
+
+
+async def _fill_queue() -> None:
+    """Queues persisted jobs: ones submitted before a restart or by another
+    process, ones left over when the queue was full, and ones whose worker
+    died mid-run."""
+    stale = datetime.utcnow() - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS)
+    await collection.update_many(
+        {"status": "running", "started_at": {"$lt": stale}},
+        {"$set": {"status": "queued"}}
+    )
+    async for job in collection.find({"status": "queued"}, {"_id": 1}).sort("created_at", 1):
+        if _queue.full():
+            break
+        _enqueue(job["_id"])
+
+
+async def _poll_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _fill_queue()
+        except Exception as e:
+            print(f"⚠️ Falha ao buscar jobs pendentes: {e}")
+
+
+async def start_workers() -> None:
+    global _queue
+    _queue = asyncio.Queue(maxsize=settings.JOB_QUEUE_SIZE)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(settings.JOB_WORKERS))
+
+    await _fill_queue()
+    _workers.append(asyncio.create_task(_poll_loop(settings.JOB_POLL_SECONDS)))
+
+
+async def stop_workers() -> None:
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _enqueued.clear()
+
+
+async def submit_job(job: JobSchema) -> JobResponse:
+    if job.kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind. Available: {', '.join(JOB_KINDS)}")
+
+    try:
+        params = JOB_KINDS[job.kind].params(**job.params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    if _queue is None or _queue.full():
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later")
+
+    new_job = {
+        "kind": job.kind,
+        "params": params.dict(),
+        "status": "queued",
+        "created_at": datetime.utcnow(),
+        "traceparent": current_traceparent(),
+    }
+
+    try:
+        result = await collection.insert_one(new_job)
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating job: {str(e)}")
+
+    _enqueue(result.inserted_id)
+
+    return JobResponse(id=str(result.inserted_id), **new_job)
+
+
+async def get_job(job_id: str) -> JobResponse:
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+    try:
+        job = await collection.find_one({"_id": ObjectId(job_id)})
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading job: {str(e)}")
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return to_job_response(job)
+
+
+async def get_job_result(job_id: str, chunk: int = 0) -> JobResultChunkResponse:
+    job = await get_job(job_id)
+
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    if chunk >= job.chunks:
+        raise HTTPException(status_code=404, detail="Result chunk not found")
+
+    try:
+        result = await results_collection.find_one({"job": ObjectId(job_id), "chunk": chunk})
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading job result: {str(e)}")
+
+    if not result:
+        raise HTTPException(status_code=404, detail="Job result expired")
+
+    return JobResultChunkResponse(job=job_id, chunk=chunk, chunks=job.chunks, items=result["items"])
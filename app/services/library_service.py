@@ -1,12 +1,30 @@
 from typing import List, Optional
 from bson import ObjectId
+from datetime import datetime
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from ..models.library import Library, LibraryResponse, UpdateLibrarySchema
+from ..models.book import BookIdsPageResponse
+from ..models.library import Library, LibraryResponse, NearbyLibraryResponse, UpdateLibrarySchema
 from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.query_cache import cached
+from ..configuration.tracing import traced
+from .expand_service import LIBRARY_EXPANSIONS, expand_references, parse_expand
+from .holding_service import add_holdings, remove_holdings
+from .subresource_service import find_with_counts, get_book_ids_page
 
 collection = db.libraries
+# Lists and reports may be served by a secondary; everything else reads the primary
+secondary_collection = collection.secondary_preferred()
 
+
+async def create_indexes():
+    await collection.create_index("updated_at")
+    # Libraries without coordinates are left out of the index
+    await collection.create_index([("geo", "2dsphere")])
+
+@traced
+@cached("libraries", expansions=LIBRARY_EXPANSIONS)
 async def get_all_libraries(
     page: int,
     limit: int,
@@ -14,8 +32,11 @@ async def get_all_libraries(
     is_public: Optional[bool] = None,
     location: Optional[str] = None,
     establish_year: Optional[int] = None,
-    book_id: Optional[str] = None
+    book_id: Optional[str] = None,
+    expand: Optional[str] = None
 ) -> List[LibraryResponse]:
+    expand_fields = parse_expand(LIBRARY_EXPANSIONS, expand)
+
     try:
         query = {}
 
@@ -34,22 +55,87 @@ async def get_all_libraries(
         if book_id and ObjectId.is_valid(book_id):
             query["books"] = {"$in": [ObjectId(book_id)]}
 
-        libraries = await collection.find(query).skip((page - 1) * limit).limit(limit).to_list(limit)
+        libraries = await secondary_collection.find(query).skip((page - 1) * limit).limit(limit).to_list(limit)
+        expanded = await expand_references(LIBRARY_EXPANSIONS, libraries, expand_fields)
+
+        return [
+            LibraryResponse(id=str(library["_id"]), expanded=library_expanded, **{k: v for k, v in library.items() if k != "_id"})
+            for library, library_expanded in zip(libraries, expanded)
+        ]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@traced
+async def get_nearby_libraries(
+    longitude: float,
+    latitude: float,
+    max_distance: float,
+    min_distance: Optional[float] = None,
+    book_id: Optional[str] = None,
+    available_only: bool = False,
+    limit: int = 10
+) -> List[NearbyLibraryResponse]:
+    """Libraries within ``max_distance`` meters of the point, nearest first.
+
+    With ``book_id`` only libraries holding the book (with a copy on the
+    shelf, with ``available_only``) are considered; they are read from the
+    holdings index and passed to ``$geoNear`` as its filter.
+    """
+    if book_id is not None and not ObjectId.is_valid(book_id):
+        raise HTTPException(status_code=400, detail="Invalid book ID format")
+
+    try:
+        query = {}
+        if book_id:
+            holding_query = {"book": ObjectId(book_id)}
+            if available_only:
+                holding_query["available_copies"] = {"$gt": 0}
+            library_ids = await db.holdings.secondary_preferred().distinct("library", holding_query)
+            if not library_ids:
+                return []
+            query["_id"] = {"$in": library_ids}
+
+        geo_near = {
+            "near": {"type": "Point", "coordinates": [longitude, latitude]},
+            "key": "geo",
+            "distanceField": "distance_meters",
+            "maxDistance": max_distance,
+            "spherical": True,
+            "query": query,
+        }
+        if min_distance:
+            geo_near["minDistance"] = min_distance
+
+        libraries = await secondary_collection.aggregate([
+            {"$geoNear": geo_near},
+            {"$limit": limit},
+        ]).to_list(length=limit)
 
         return [
-            LibraryResponse(id=str(library["_id"]), **{k: v for k, v in library.items() if k != "_id"})
+            NearbyLibraryResponse(id=str(library["_id"]), **{k: v for k, v in library.items() if k != "_id"})
             for library in libraries
         ]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-async def get_library_by_id(library_id: str) -> Optional[LibraryResponse]:
+@traced
+async def get_library_by_id(library_id: str, counts_only: bool = False) -> Optional[LibraryResponse]:
     try:
         if not ObjectId.is_valid(library_id):
             raise ValueError("Invalid ObjectId format")
 
-        library = await collection.find_one({"_id": ObjectId(library_id)})
+        if counts_only:
+            library = await find_with_counts(collection, ObjectId(library_id), ["books"])
+        else:
+            library = await collection.find_one({"_id": ObjectId(library_id)})
         if library:
             return LibraryResponse(id=str(library["_id"]), **{k: v for k, v in library.items() if k != "_id"})
 
@@ -58,10 +144,19 @@ async def get_library_by_id(library_id: str) -> Optional[LibraryResponse]:
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid library ID format")
     
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
             
     
+@traced
+async def get_library_books(library_id: str, page: int = 1, limit: int = 50, expand: Optional[str] = None) -> BookIdsPageResponse:
+    return await get_book_ids_page(collection, library_id, "books", "library", page=page, limit=limit, expand=expand)
+
+
+@traced
 async def create_library(library: Library) -> Optional[LibraryResponse]:
     try:
         new_library = library.dict()
@@ -72,12 +167,19 @@ async def create_library(library: Library) -> Optional[LibraryResponse]:
             ]
         
         result = await collection.insert_one(new_library)
+
+        if new_library.get("books"):
+            await add_holdings([result.inserted_id], new_library["books"])
         
         return LibraryResponse(id=str(result.inserted_id), **new_library)
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating library: {str(e)}")
 
 
+@traced
 async def update_library(library_id: str, library: UpdateLibrarySchema) -> Optional[LibraryResponse]:
     try:
         if not ObjectId.is_valid(library_id):
@@ -85,7 +187,10 @@ async def update_library(library_id: str, library: UpdateLibrarySchema) -> Optio
         
         updated_library = library.dict(exclude_unset=True)
         
-        result = await collection.update_one({"_id": ObjectId(library_id)}, {"$set": updated_library})
+        result = await collection.update_one(
+            {"_id": ObjectId(library_id)},
+            {"$set": {**updated_library, "updated_at": datetime.utcnow()}}
+        )
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Library not found or no update performed")
@@ -95,10 +200,14 @@ async def update_library(library_id: str, library: UpdateLibrarySchema) -> Optio
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid library ID format")
     
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating library: {str(e)}")
 
 
+@traced
 async def delete_library(library_id: str) -> dict:
     try:
         if not ObjectId.is_valid(library_id):
@@ -109,15 +218,21 @@ async def delete_library(library_id: str) -> dict:
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Library not found")
 
+        await remove_holdings(library_id=ObjectId(library_id))
+
         return {"message": "Library deleted successfully"}
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid library ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating library: {str(e)}")
 
 
+@traced
 async def add_book_to_library(library_id: str, books_ids: List[str]) -> dict:
     try:
         if not ObjectId.is_valid(library_id):
@@ -130,16 +245,21 @@ async def add_book_to_library(library_id: str, books_ids: List[str]) -> dict:
         
         result = await collection.update_one(
             {"_id": ObjectId(library_id)},
-            {"$addToSet": {"books": {"$each": valid_book_ids}}},
+            {"$addToSet": {"books": {"$each": valid_book_ids}}, "$set": {"updated_at": datetime.utcnow()}},
         )
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Library not found or no update was performed")
 
+        await add_holdings([ObjectId(library_id)], valid_book_ids)
+
         return {"message": "Books added successfully"}
     
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid ObjectId format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating library: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,75 @@
+import hmac
+from typing import List, Optional
+from bson import ObjectId
+from fastapi import HTTPException
+from ..models.profile import ProfileResponse, ProfileSummaryResponse
+from ..configuration.database import db
+from ..configuration.settings import settings
+
+collection = db.profiles
+
+
+async def create_indexes():
+    await collection.create_index("created_at", expireAfterSeconds=settings.PROFILING_RETENTION_SECONDS)
+    await collection.create_index([("path", 1), ("created_at", -1)])
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    if not settings.PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.PROFILING_TOKEN.encode())
+
+
+async def save_profile(profile: dict) -> None:
+    """Stores a finished profile, keeping at most ``PROFILING_MAX_PROFILES``
+    of them on top of the retention TTL."""
+    try:
+        await collection.insert_one(profile)
+
+        oldest_kept = await collection.find({}, {"created_at": 1}).sort("created_at", -1) \
+            .skip(settings.PROFILING_MAX_PROFILES - 1).limit(1).to_list(length=1)
+        if oldest_kept:
+            await collection.delete_many({"created_at": {"$lt": oldest_kept[0]["created_at"]}})
+    except Exception as e:
+        print(f"⚠️ Falha ao salvar perfil de requisição: {e}")
+
+
+def _summary(profile: dict) -> ProfileSummaryResponse:
+    commands = profile.get("commands", [])
+    return ProfileSummaryResponse(
+        id=str(profile["_id"]),
+        command_count=len(commands),
+        mongo_ms=round(sum(command["duration_ms"] for command in commands), 3),
+        **{k: v for k, v in profile.items() if k not in ("_id", "stacks", "commands")}
+    )
+
+
+async def list_profiles(path: Optional[str] = None, page: int = 1, limit: int = 20) -> List[ProfileSummaryResponse]:
+    query = {"path": path} if path else {}
+    cursor = collection.find(query, {"stacks": 0}).sort("created_at", -1).skip((page - 1) * limit).limit(limit)
+    return [_summary(profile) async for profile in cursor]
+
+
+async def _find_profile(profile_id: str) -> dict:
+    if not ObjectId.is_valid(profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile ID format")
+
+    profile = await collection.find_one({"_id": ObjectId(profile_id)})
+
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return profile
+
+
+async def get_profile(profile_id: str) -> ProfileResponse:
+    profile = await _find_profile(profile_id)
+    summary = _summary(profile)
+    return ProfileResponse(**summary.dict(), stacks=profile.get("stacks", []), commands=profile.get("commands", []))
+
+
+async def get_collapsed_stacks(profile_id: str) -> str:
+    """The profile in the collapsed format read by flamegraph.pl and speedscope,
+    weighted in microseconds."""
+    profile = await _find_profile(profile_id)
+    return "".join(f"{stack['stack']} {stack['micros']}\n" for stack in profile.get("stacks", []))
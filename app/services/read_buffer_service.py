@@ -0,0 +1,121 @@
+import asyncio
+from typing import Dict, List, Set
+from bson import ObjectId
+from datetime import datetime
+from pymongo import UpdateOne
+from ..configuration.database import db
+from ..configuration.settings import settings
+from .rental_service import mark_users_dirty
+
+collection = db.users
+
+
+class ReadBooksBuffer:
+    """Write-behind buffer for ``readed_books`` additions.
+
+    Book ids are merged per user in memory and written with one unordered
+    ``bulk_write`` when ``flush_size`` ids are pending or every flush
+    interval, whichever comes first. At most ``max_pending`` ids are held:
+    a caller that would exceed it waits for a flush instead. Users whose
+    ids were written are marked dirty for the rental report.
+
+    In ``durable`` mode ``add`` returns only once the flush carrying its ids
+    has been acknowledged by Mongo; in ``async`` mode it returns at once and
+    ids still buffered when the process dies are lost.
+    """
+
+    def __init__(self, flush_size: int, max_pending: int):
+        self.flush_size = flush_size
+        self.max_pending = max(max_pending, flush_size)
+        self._pending: Dict[ObjectId, Set[ObjectId]] = {}
+        self._pending_count = 0
+        self._waiters: List[asyncio.Future] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_requested = asyncio.Event()
+
+    def __len__(self) -> int:
+        return self._pending_count
+
+    def _merge(self, user_id: ObjectId, book_ids: List[ObjectId]) -> None:
+        books = self._pending.setdefault(user_id, set())
+        before = len(books)
+        books.update(book_ids)
+        self._pending_count += len(books) - before
+
+    async def add(self, user_id: ObjectId, book_ids: List[ObjectId], wait: bool = False) -> None:
+        while self._pending_count + len(book_ids) > self.max_pending and self._pending_count:
+            await self.flush()
+
+        self._merge(user_id, book_ids)
+
+        waiter = None
+        if wait:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+        if self._pending_count >= self.flush_size:
+            self._flush_requested.set()
+
+        if waiter is not None:
+            await waiter
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            pending, waiters = self._pending, self._waiters
+            self._pending, self._waiters, self._pending_count = {}, [], 0
+            if not pending:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+                return 0
+
+            now = datetime.utcnow()
+            operations = [
+                UpdateOne(
+                    {"_id": user_id},
+                    {
+                        "$addToSet": {"readed_books": {"$each": list(book_ids)}},
+                        "$set": {"readed_updated_at": now, "updated_at": now}
+                    }
+                )
+                for user_id, book_ids in pending.items()
+            ]
+
+            try:
+                await collection.bulk_write(operations, ordered=False)
+                # The rental report carries readed_books
+                await mark_users_dirty(list(pending))
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                # $addToSet is idempotent, so the ids are kept for the next
+                # flush as long as the buffer has room for them
+                if self._pending_count + sum(map(len, pending.values())) <= self.max_pending:
+                    for user_id, book_ids in pending.items():
+                        self._merge(user_id, list(book_ids))
+                raise
+
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            return len(operations)
+
+    async def run_flush_loop(self, interval: float):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️ Falha ao gravar livros lidos em lote: {e}")
+
+
+readed_books_buffer = ReadBooksBuffer(
+    flush_size=settings.READ_BUFFER_FLUSH_SIZE,
+    max_pending=settings.READ_BUFFER_MAX_PENDING
+)
@@ -0,0 +1,186 @@
+import asyncio
+from typing import Dict, List, Optional
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+import numpy as np
+from scipy import sparse
+from pymongo import ReplaceOne
+from ..models.recommendation import BookRecommendationsResponse, RecommendedBook
+from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+
+collection = db.book_recommendations
+state_collection = db.recommendation_state
+
+STATE_ID = "co_reading"
+TOP_K = 20
+TARGET_CHUNK = 2048
+WRITE_BATCH = 1000
+
+
+async def _load_reading_lists(query: dict) -> List[List[ObjectId]]:
+    reading_lists = []
+    async for user in db.users.find(query, {"_id": 0, "readed_books": 1}).batch_size(1000):
+        books = [book for book in user.get("readed_books") or [] if isinstance(book, ObjectId)]
+        if books:
+            reading_lists.append(books)
+    return reading_lists
+
+
+def _build_matrix(reading_lists: List[List[ObjectId]]):
+    vocabulary: Dict[ObjectId, int] = {}
+    rows, cols = [], []
+
+    for row, books in enumerate(reading_lists):
+        for book in set(books):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(book, len(vocabulary)))
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(reading_lists), len(vocabulary))
+    )
+    return matrix, list(vocabulary)
+
+
+def _top_k(matrix, book_ids: List[ObjectId], target_codes: np.ndarray, readers: np.ndarray, k: int) -> dict:
+    """Cosine-normalized co-occurrence rows for the target books.
+
+    Rows are computed ``TARGET_CHUNK`` targets at a time so the
+    targets x catalog product never has to be materialized in full.
+    """
+    results = {}
+    matrix_csc = matrix.tocsc()
+
+    for chunk_start in range(0, len(target_codes), TARGET_CHUNK):
+        targets = target_codes[chunk_start:chunk_start + TARGET_CHUNK]
+        co_occurrence = (matrix_csc[:, targets].T @ matrix).tocsr()
+
+        for row, target in enumerate(targets):
+            start, end = co_occurrence.indptr[row], co_occurrence.indptr[row + 1]
+            cols = co_occurrence.indices[start:end]
+            counts = co_occurrence.data[start:end]
+
+            keep = cols != target
+            cols, counts = cols[keep], counts[keep]
+
+            items = []
+            if len(cols):
+                scores = counts / np.sqrt(readers[target] * readers[cols])
+                best = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+                best = best[np.argsort(-scores[best])]
+                items = [
+                    {"book": book_ids[cols[i]], "score": float(scores[i]), "co_readers": int(counts[i])}
+                    for i in best
+                ]
+
+            results[book_ids[target]] = {"readers": int(readers[target]), "items": items}
+
+    return results
+
+
+async def refresh_recommendations(full: bool = False, k: int = TOP_K) -> int:
+    """Rebuilds the stored top-k lists.
+
+    The incremental path only reloads users who read a book touched by a
+    ``populate_books`` call since the last run; that set contains every
+    reader of the touched books, so their rows and reader counts are exact.
+    Reader counts of untouched neighbours are taken from their stored
+    documents, which are still current because nobody new read them.
+    """
+    started_at = datetime.utcnow()
+    state = await state_collection.find_one({"_id": STATE_ID})
+
+    if full or not state:
+        reading_lists = await _load_reading_lists({"readed_books.0": {"$exists": True}})
+        touched = None
+    else:
+        touched = set()
+        async for user in db.users.find(
+            {"readed_updated_at": {"$gt": state["watermark"]}},
+            {"_id": 0, "readed_books": 1}
+        ):
+            touched.update(book for book in user.get("readed_books") or [] if isinstance(book, ObjectId))
+
+        if not touched:
+            await state_collection.update_one({"_id": STATE_ID}, {"$set": {"watermark": started_at}})
+            return 0
+
+        reading_lists = await _load_reading_lists({"readed_books": {"$in": list(touched)}})
+
+    matrix, book_ids = _build_matrix(reading_lists)
+    readers = np.asarray(matrix.sum(axis=0)).ravel()
+
+    if touched is None:
+        target_codes = np.arange(len(book_ids))
+    else:
+        target_codes = np.array([code for code, book in enumerate(book_ids) if book in touched], dtype=np.int64)
+        neighbours = [book for book in book_ids if book not in touched]
+        stored_readers = {
+            doc["_id"]: doc.get("readers", 0)
+            async for doc in collection.find({"_id": {"$in": neighbours}}, {"readers": 1})
+        }
+        for code, book in enumerate(book_ids):
+            readers[code] = max(readers[code], stored_readers.get(book, 0))
+
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(None, _top_k, matrix, book_ids, target_codes, readers, k)
+
+    operations = [
+        ReplaceOne(
+            {"_id": book_id},
+            {"readers": row["readers"], "items": row["items"], "updated_at": started_at},
+            upsert=True
+        )
+        for book_id, row in results.items()
+    ]
+    for start in range(0, len(operations), WRITE_BATCH):
+        await collection.bulk_write(operations[start:start + WRITE_BATCH], ordered=False)
+
+    await state_collection.update_one(
+        {"_id": STATE_ID},
+        {"$set": {"watermark": started_at, "full": bool(touched is None)}},
+        upsert=True
+    )
+    return len(operations)
+
+
+async def run_refresh_loop(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_recommendations()
+        except Exception as e:
+            print(f"⚠️ Falha ao atualizar recomendações: {e}")
+
+
+async def get_book_recommendations(book_id: str, limit: Optional[int] = None) -> BookRecommendationsResponse:
+    try:
+        if not ObjectId.is_valid(book_id):
+            raise ValueError("Invalid ObjectId format")
+
+        projection = {"items": {"$slice": limit}} if limit else None
+        recommendations = await collection.find_one({"_id": ObjectId(book_id)}, projection)
+
+        if not recommendations:
+            return BookRecommendationsResponse(book=book_id)
+
+        return BookRecommendationsResponse(
+            book=book_id,
+            readers=recommendations.get("readers", 0),
+            recommendations=[
+                RecommendedBook(book=str(item["book"]), score=item["score"], co_readers=item["co_readers"])
+                for item in recommendations.get("items", [])
+            ],
+            updated_at=recommendations.get("updated_at")
+        )
+
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid book ID format")
+
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
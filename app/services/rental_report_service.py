@@ -0,0 +1,207 @@
+import asyncio
+import uuid
+from typing import AsyncIterator, List, Optional, Tuple
+from bson import ObjectId
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from ..models.user import UserResponseAggregate
+from ..models.job import JobResponse, JobSchema
+from ..configuration.database import bump_generation, db, generations_enabled
+from ..configuration.settings import settings
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.query_cache import cached
+from .rental_service import dirty_users_collection as dirty_collection
+from .job_service import collection as jobs_collection, register_job_kind, submit_job, to_job_response
+from .user_service import rental_books_and_libraries_pipeline, to_user_aggregate_response
+
+REPORT_COLLECTION = "user_rental_reports"
+STATE_ID = REPORT_COLLECTION
+LEASE_ID = "refresh-lease"
+REBUILD_JOB_KIND = "rental-report-rebuild"
+# Retry-After while the first build runs
+REBUILD_RETRY_AFTER_SECONDS = 10
+
+collection = db[REPORT_COLLECTION]
+state_collection = db.report_state
+
+# Identifies this process as the holder of the refresh lease
+_lease_holder = uuid.uuid4().hex
+
+
+async def create_indexes():
+    await dirty_collection.create_index("marked_at")
+
+
+async def _merge_users(refreshed_at: datetime, user_ids: Optional[List[ObjectId]] = None) -> None:
+    pipeline = rental_books_and_libraries_pipeline()
+
+    if user_ids is not None:
+        pipeline.insert(0, {"$match": {"_id": {"$in": user_ids}}})
+
+    pipeline += [
+        {
+            "$project": {
+                "name": 1,
+                "readed_books": 1,
+                "rented_books": {"_id": 1, "title": 1},
+                "book_libraries": {"_id": 1, "name": 1},
+                "refreshed_at": {"$literal": refreshed_at}
+            }
+        },
+        {
+            "$merge": {
+                "into": REPORT_COLLECTION,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }
+        }
+    ]
+
+    await db.users.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+    # $merge goes through aggregate, which does not bump generations by itself
+    if generations_enabled():
+        await bump_generation(REPORT_COLLECTION)
+
+    # Users that no longer have open rentals produced no output row
+    stale = {"refreshed_at": {"$lt": refreshed_at}}
+    if user_ids is not None:
+        stale["_id"] = {"$in": user_ids}
+    await collection.delete_many(stale)
+
+
+async def refresh_report(full: bool = False) -> int:
+    refreshed_at = datetime.utcnow()
+    state = await state_collection.find_one({"_id": STATE_ID})
+    pending = await dirty_collection.count_documents({"marked_at": {"$lte": refreshed_at}})
+
+    if full or not state or pending > settings.REPORT_FULL_REBUILD_THRESHOLD:
+        await _merge_users(refreshed_at)
+        await dirty_collection.delete_many({"marked_at": {"$lte": refreshed_at}})
+        refreshed = await collection.count_documents({})
+        full = True
+    else:
+        refreshed = 0
+        while True:
+            batch = await dirty_collection.find({"marked_at": {"$lte": refreshed_at}}, {"_id": 1}) \
+                .limit(settings.REPORT_REFRESH_BATCH) \
+                .to_list(length=settings.REPORT_REFRESH_BATCH)
+            if not batch:
+                break
+
+            user_ids = [user["_id"] for user in batch]
+            await _merge_users(refreshed_at, user_ids)
+            # Users marked again while we merged keep their newer marker
+            await dirty_collection.delete_many({"_id": {"$in": user_ids}, "marked_at": {"$lte": refreshed_at}})
+            refreshed += len(user_ids)
+
+    update = {"refreshed_at": refreshed_at}
+    if full:
+        update["rebuilt_at"] = refreshed_at
+    await state_collection.update_one({"_id": STATE_ID}, {"$set": update}, upsert=True)
+
+    return refreshed
+
+
+async def acquire_refresh_lease() -> bool:
+    """Takes the refresh lease, or renews it if this process holds it.
+
+    The lease lives in ``report_state``: while another process holds an
+    unexpired one, the upsert collides with its document and this process
+    skips the round instead of merging the same dirty users.
+    """
+    now = datetime.utcnow()
+    try:
+        await state_collection.update_one(
+            {"_id": LEASE_ID, "$or": [{"holder": _lease_holder}, {"expires_at": {"$lte": now}}]},
+            {"$set": {
+                "holder": _lease_holder,
+                "expires_at": now + timedelta(seconds=settings.REPORT_REFRESH_LEASE_SECONDS)
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def run_refresh_loop(interval: int):
+    # Every worker runs the loop; only the lease holder refreshes
+    while True:
+        try:
+            if await acquire_refresh_lease():
+                await refresh_report()
+        except Exception as e:
+            print(f"⚠️ Falha ao atualizar relatório de aluguéis: {e}")
+        await asyncio.sleep(interval)
+
+
+async def stream_report_rebuild() -> AsyncIterator[dict]:
+    yield {"users": await refresh_report(full=True)}
+
+
+register_job_kind(REBUILD_JOB_KIND, stream_report_rebuild)
+
+
+async def schedule_rebuild() -> JobResponse:
+    """Submits a full rebuild job, or returns the one already queued or
+    running. A full job queue raises 503."""
+    job = await jobs_collection.find_one({"kind": REBUILD_JOB_KIND, "status": {"$in": ["queued", "running"]}})
+    if job:
+        return to_job_response(job)
+    return await submit_job(JobSchema(kind=REBUILD_JOB_KIND))
+
+
+@cached("user_rental_reports")
+async def get_report_page(page: int, limit: int) -> List[UserResponseAggregate]:
+    # The page may lag the freshness headers by up to MONGO_MAX_STALENESS_SECONDS
+    users = await collection.secondary_preferred().find({}) \
+        .sort("_id", 1) \
+        .skip((page - 1) * limit) \
+        .limit(limit) \
+        .to_list(length=limit)
+    return [to_user_aggregate_response(user) for user in users]
+
+
+async def get_rental_report(page: int = 1, limit: int = 10) -> Tuple[List[UserResponseAggregate], dict]:
+    try:
+        if page < 1 or limit < 1:
+            raise HTTPException(status_code=400, detail="Page and limit must be greater than zero")
+
+        state = await state_collection.find_one({"_id": STATE_ID})
+        if not state:
+            # Never built: building it is a full aggregation, too slow for a request
+            try:
+                await schedule_rebuild()
+            except HTTPException:
+                # Queue full: the next request tries again
+                pass
+            raise HTTPException(
+                status_code=503,
+                detail="Report is being built, try again later",
+                headers={"Retry-After": str(REBUILD_RETRY_AFTER_SECONDS)}
+            )
+
+        users = await get_report_page(page, limit)
+
+        refreshed_at = state["refreshed_at"]
+        freshness = {
+            "refreshed_at": refreshed_at,
+            "staleness_seconds": max(0, int((datetime.utcnow() - refreshed_at).total_seconds())),
+            "pending_users": await dirty_collection.count_documents({}),
+        }
+
+    except HTTPException:
+        raise
+
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    if not users:
+        raise HTTPException(status_code=404, detail="No users found")
+
+    return users, freshness
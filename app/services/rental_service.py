@@ -0,0 +1,185 @@
+import asyncio
+import contextvars
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from ..models.rental import RentalResponse
+from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.tracing import traced
+from .holding_service import take_copy, release_copy
+
+collection = db.rentals
+# Lists and reports may be served by a secondary; everything else reads the primary
+secondary_collection = collection.secondary_preferred()
+dirty_users_collection = db.user_rental_reports_dirty
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def create_indexes():
+    await collection.create_index([("user", 1), ("checked_out_at", -1)])
+    await collection.create_index([("book", 1), ("active", 1)])
+    # At most one open rental per (user, book), mirroring the old $addToSet semantics
+    await collection.create_index(
+        [("user", 1), ("book", 1)],
+        unique=True,
+        partialFilterExpression={"active": True},
+        name="user_1_book_1_active",
+    )
+
+
+@traced
+async def mark_users_dirty(user_ids: List[ObjectId]) -> None:
+    """Flags users whose rentals changed so the rental report refreshes only them."""
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne({"_id": user_id}, {"$set": {"marked_at": now}}, upsert=True)
+        for user_id in dict.fromkeys(user_ids)
+    ]
+    if operations:
+        await dirty_users_collection.bulk_write(operations, ordered=False)
+
+
+async def _release_copies(library_id: ObjectId, book_ids: List[ObjectId]) -> None:
+    for book_id in book_ids:
+        try:
+            await release_copy(library_id, book_id)
+        except Exception as e:
+            print(f"⚠️ Cópia de {book_id} na biblioteca {library_id} não devolvida: {e}")
+
+
+async def release_copies(library_id: ObjectId, book_ids: List[ObjectId]) -> None:
+    """Puts copies taken for unrecorded rentals back on the shelf. Runs in an
+    empty context, shielded, so neither a spent request budget nor a client
+    disconnect leaks the copies."""
+    await asyncio.shield(asyncio.get_running_loop().create_task(
+        _release_copies(library_id, book_ids), context=contextvars.Context()
+    ))
+
+
+@traced
+async def record_rentals(
+    user_id: ObjectId,
+    book_ids: List[ObjectId],
+    library_id: Optional[ObjectId] = None
+) -> Tuple[int, List[ObjectId]]:
+    """Records open rentals and returns how many were inserted, plus the
+    books that had no free copy in ``library_id`` and were not rented."""
+    book_ids = list(dict.fromkeys(book_ids))
+    unavailable = []
+
+    if library_id:
+        # Only books with a free copy in that library can be rented from it
+        taken = [book_id for book_id in book_ids if await take_copy(library_id, book_id)]
+        unavailable = [book_id for book_id in book_ids if book_id not in taken]
+        book_ids = taken
+
+    now = datetime.utcnow()
+    rentals = [
+        {"user": user_id, "book": book_id, "library": library_id, "checked_out_at": now, "active": True}
+        for book_id in book_ids
+    ]
+    if not rentals:
+        return 0, unavailable
+
+    try:
+        result = await collection.insert_many(rentals, ordered=False)
+        inserted = len(result.inserted_ids)
+    except BulkWriteError as e:
+        # Copies taken for rentals that were not recorded go back on the shelf
+        if library_id:
+            await release_copies(library_id, [rentals[error["index"]]["book"] for error in e.details["writeErrors"]])
+
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+            raise
+        inserted = e.details["nInserted"]
+
+    except Exception:
+        # Nothing is known to be recorded, so every copy taken is released
+        if library_id:
+            await release_copies(library_id, book_ids)
+        raise
+
+    if inserted:
+        await db.users.update_one(
+            {"_id": user_id},
+            {"$inc": {"rentals_count": inserted, "active_rentals_count": inserted}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        await mark_users_dirty([user_id])
+
+    return inserted, unavailable
+
+
+@traced
+async def get_user_rentals(
+    user_id: str,
+    page: int = 1,
+    limit: int = 10,
+    active: Optional[bool] = None
+) -> List[RentalResponse]:
+    try:
+        if not ObjectId.is_valid(user_id):
+            raise ValueError("Invalid ObjectId format")
+
+        query = {"user": ObjectId(user_id)}
+
+        if active is True:
+            query["active"] = True
+        elif active is False:
+            query["active"] = {"$exists": False}
+
+        rentals = await secondary_collection.find(query) \
+            .sort("checked_out_at", -1) \
+            .skip((page - 1) * limit) \
+            .limit(limit) \
+            .to_list(length=limit)
+
+        return [
+            RentalResponse(id=str(rental["_id"]), **{k: v for k, v in rental.items() if k != "_id"})
+            for rental in rentals
+        ]
+
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user ID format")
+
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@traced
+async def return_rental(user_id: str, rental_id: str) -> RentalResponse:
+    if not ObjectId.is_valid(user_id) or not ObjectId.is_valid(rental_id):
+        raise HTTPException(status_code=400, detail="Invalid ObjectId format")
+
+    try:
+        rental = await collection.find_one_and_update(
+            {"_id": ObjectId(rental_id), "user": ObjectId(user_id), "active": True},
+            {"$set": {"returned_at": datetime.utcnow()}, "$unset": {"active": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error returning rental: {str(e)}")
+
+    if not rental:
+        raise HTTPException(status_code=404, detail="Rental not found or already returned")
+
+    await db.users.update_one(
+        {"_id": rental["user"]},
+        {"$inc": {"active_rentals_count": -1}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    await mark_users_dirty([rental["user"]])
+
+    if rental.get("library"):
+        await release_copy(rental["library"], rental["book"])
+
+    return RentalResponse(id=str(rental["_id"]), **{k: v for k, v in rental.items() if k != "_id"})
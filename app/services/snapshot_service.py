@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ..configuration.database import db
+from ..configuration.settings import settings
+
+# ObjectIds are stored as their 12 raw bytes instead of 24-character hex strings
+OBJECT_ID = pa.binary(12)
+TIMESTAMP = pa.timestamp("ms")
+
+SNAPSHOT_SCHEMAS: Dict[str, pa.Schema] = {
+    "books": pa.schema([
+        ("_id", OBJECT_ID),
+        ("title", pa.string()),
+        ("author", OBJECT_ID),
+        ("category", OBJECT_ID),
+        ("isbn", pa.string()),
+        ("published_date", TIMESTAMP),
+        ("libraries", pa.list_(OBJECT_ID)),
+        ("updated_at", TIMESTAMP),
+    ]),
+    "users": pa.schema([
+        ("_id", OBJECT_ID),
+        ("name", pa.string()),
+        ("birthdate", TIMESTAMP),
+        ("fav_library", OBJECT_ID),
+        ("fav_category", OBJECT_ID),
+        ("fav_author", OBJECT_ID),
+        ("readed_books", pa.list_(OBJECT_ID)),
+        ("rentals_count", pa.int32()),
+        ("active_rentals_count", pa.int32()),
+        ("updated_at", TIMESTAMP),
+    ]),
+    "libraries": pa.schema([
+        ("_id", OBJECT_ID),
+        ("name", pa.string()),
+        ("is_public", pa.bool_()),
+        ("location", pa.string()),
+        ("establish_year", pa.int32()),
+        ("books", pa.list_(OBJECT_ID)),
+        ("updated_at", TIMESTAMP),
+    ]),
+}
+
+# Writes stamp updated_at before they reach the server, and the secondary read
+# may lag by up to MONGO_MAX_STALENESS_SECONDS, so the next incremental
+# snapshot starts a little before this one did; rows exported twice are
+# resolved by _id when the snapshots are merged.
+WATERMARK_OVERLAP = timedelta(seconds=60 + settings.MONGO_MAX_STALENESS_SECONDS)
+
+
+def _object_id(value) -> Optional[bytes]:
+    if isinstance(value, ObjectId):
+        return value.binary
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value).binary
+    return None
+
+
+def _converter(field: pa.Field):
+    if field.type == OBJECT_ID:
+        return _object_id
+    if isinstance(field.type, pa.ListType) and field.type.value_type == OBJECT_ID:
+        return lambda values: [item for item in map(_object_id, values or []) if item is not None]
+    if field.type == TIMESTAMP:
+        return lambda value: value if isinstance(value, datetime) else None
+    if pa.types.is_integer(field.type):
+        return lambda value: value if isinstance(value, int) and not isinstance(value, bool) else None
+    if pa.types.is_boolean(field.type):
+        return lambda value: value if isinstance(value, bool) else None
+    return lambda value: value if isinstance(value, str) else None
+
+
+def to_record_batch(schema: pa.Schema, documents: List[dict]) -> pa.RecordBatch:
+    columns = []
+    for field in schema:
+        convert = _converter(field)
+        columns.append(pa.array([convert(document.get(field.name)) for document in documents], type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _collection(name: str):
+    # Snapshots are long scans: keep them off the primary when a secondary is up
+    return db[name].secondary_preferred()
+
+
+async def _id_ranges(name: str, query: dict, partitions: int) -> List[dict]:
+    """Splits ``query`` into ``_id`` ranges of equal time span, using the
+    timestamp embedded in the first and last ObjectId."""
+    collection = _collection(name)
+    first = await collection.find_one(query, {"_id": 1}, sort=[("_id", 1)])
+    last = await collection.find_one(query, {"_id": 1}, sort=[("_id", -1)])
+    if not first:
+        return []
+
+    start, end = first["_id"].generation_time, last["_id"].generation_time
+    step = (end - start) / partitions
+    bounds = [first["_id"]] + [ObjectId.from_datetime(start + step * i) for i in range(1, partitions)]
+    bounds = sorted(set(bounds))
+
+    ranges = []
+    for index, lower in enumerate(bounds):
+        id_range = {"$gte": lower}
+        if index + 1 < len(bounds):
+            id_range["$lt"] = bounds[index + 1]
+        else:
+            id_range["$lte"] = last["_id"]
+        ranges.append({"$and": [query, {"_id": id_range}]})
+    return ranges
+
+
+async def _export_range(name: str, query: dict, path: str) -> int:
+    schema = SNAPSHOT_SCHEMAS[name]
+    projection = {field.name: 1 for field in schema}
+    cursor = _collection(name).find(query, projection).sort("_id", 1).batch_size(settings.SNAPSHOT_BATCH_SIZE)
+
+    writer, documents, exported = None, [], 0
+
+    async def flush():
+        nonlocal writer
+        batch = to_record_batch(schema, documents)
+        if writer is None:
+            writer = await asyncio.to_thread(pq.ParquetWriter, path, schema, compression="zstd")
+        await asyncio.to_thread(writer.write_batch, batch)
+
+    try:
+        async for document in cursor:
+            documents.append(document)
+            if len(documents) >= settings.SNAPSHOT_BATCH_SIZE:
+                await flush()
+                exported += len(documents)
+                documents = []
+
+        if documents:
+            await flush()
+            exported += len(documents)
+    finally:
+        if writer is not None:
+            await asyncio.to_thread(writer.close)
+
+    return exported
+
+
+def _watermarks_path() -> str:
+    return os.path.join(settings.SNAPSHOT_DIR, "watermarks.json")
+
+
+def load_watermarks() -> Dict[str, str]:
+    try:
+        with open(_watermarks_path()) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_watermarks(watermarks: Dict[str, str]) -> None:
+    path = _watermarks_path()
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(watermarks, file, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+async def export_collection(name: str, incremental: bool = False) -> Tuple[str, int]:
+    """Writes a Parquet snapshot of ``name`` and returns its directory and row count.
+
+    A full snapshot covers the whole collection. An incremental one covers
+    documents created (by ``_id``) or changed (by ``updated_at``) since the
+    previous snapshot's watermark; consumers keep the latest row per ``_id``.
+    """
+    started_at = datetime.utcnow()
+    watermarks = load_watermarks()
+    since = datetime.fromisoformat(watermarks[name]) if incremental and name in watermarks else None
+
+    kind = "incremental" if since else "full"
+    directory = os.path.join(settings.SNAPSHOT_DIR, name, f"{kind}-{started_at:%Y%m%dT%H%M%S}")
+    os.makedirs(directory, exist_ok=True)
+
+    if since:
+        queries = await _id_ranges(name, {"_id": {"$gte": ObjectId.from_datetime(since)}}, settings.SNAPSHOT_PARTITIONS)
+        queries.append({"_id": {"$lt": ObjectId.from_datetime(since)}, "updated_at": {"$gte": since}})
+    else:
+        queries = await _id_ranges(name, {}, settings.SNAPSHOT_PARTITIONS)
+
+    counts = await asyncio.gather(*[
+        _export_range(name, query, os.path.join(directory, f"part-{index:04d}.parquet"))
+        for index, query in enumerate(queries)
+    ])
+
+    watermarks = load_watermarks()
+    watermarks[name] = (started_at - WATERMARK_OVERLAP).isoformat()
+    _save_watermarks(watermarks)
+
+    return directory, sum(counts)
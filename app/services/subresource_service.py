@@ -0,0 +1,82 @@
+from typing import List, Optional
+from bson import ObjectId
+from fastapi import HTTPException
+from ..models.book import BookIdsPageResponse
+from ..models.expand import ExpandedBook
+from ..configuration.database import LazyCollection
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from .expand_service import Expansion, parse_expand, resolve_ids
+
+BOOK_PAGE_EXPANSIONS = {
+    "books": Expansion("books", ExpandedBook, many=True),
+}
+
+
+def _size(field: str) -> dict:
+    return {"$size": {"$ifNull": [f"${field}", []]}}
+
+
+async def get_book_ids_page(
+    collection: LazyCollection,
+    parent_id: str,
+    field: str,
+    parent_name: str,
+    page: int = 1,
+    limit: int = 50,
+    expand: Optional[str] = None
+) -> BookIdsPageResponse:
+    """Pages through the book ids embedded in ``field`` of one document.
+
+    Only the requested slice of the array and its length leave the server
+    (``$slice``/``$size`` in a ``$project``), however long the array is.
+    """
+    expand_fields = parse_expand(BOOK_PAGE_EXPANSIONS, expand)
+
+    if not ObjectId.is_valid(parent_id):
+        raise HTTPException(status_code=400, detail=f"Invalid {parent_name} ID format")
+
+    try:
+        documents = await collection.aggregate([
+            {"$match": {"_id": ObjectId(parent_id)}},
+            {"$project": {
+                "_id": 0,
+                "total": _size(field),
+                "books": {"$slice": [{"$ifNull": [f"${field}", []]}, (page - 1) * limit, limit]},
+            }},
+        ]).to_list(length=1)
+
+        if not documents:
+            raise HTTPException(status_code=404, detail=f"{parent_name.capitalize()} not found")
+
+        book_ids = [book for book in documents[0]["books"] if isinstance(book, ObjectId)]
+        expanded = await resolve_ids(BOOK_PAGE_EXPANSIONS["books"], book_ids) if expand_fields else None
+
+        return BookIdsPageResponse(
+            total=documents[0]["total"],
+            page=page,
+            limit=limit,
+            books=[str(book) for book in documents[0]["books"]],
+            expanded=expanded
+        )
+    except HTTPException:
+        raise
+
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+async def find_with_counts(collection: LazyCollection, document_id: ObjectId, fields: List[str]) -> Optional[dict]:
+    """``find_one`` by id that returns ``<field>_count`` instead of each of
+    the (possibly huge) ``fields`` arrays, which come back as ``None``."""
+    documents = await collection.aggregate([
+        {"$match": {"_id": document_id}},
+        {"$addFields": {f"{field}_count": _size(field) for field in fields}},
+        {"$project": {field: 0 for field in fields}},
+    ]).to_list(length=1)
+
+    if not documents:
+        return None
+    return {**documents[0], **{field: None for field in fields}}
@@ -1,7 +1,10 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from bson import ObjectId
+from datetime import date, datetime
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
+from ..models.book import BookIdsPageResponse
 from ..models.user import (
     User,
     UserResponse,
@@ -11,10 +14,31 @@ from ..models.user import (
     UBookAResponse,
     ULibraryAResponse
 )
+from ..models.dates import as_datetime
 from ..configuration.database import db
+from ..configuration.deadlines import MONGO_TIMEOUT_ERRORS, deadline_exceeded
+from ..configuration.settings import settings
+from ..configuration.query_cache import cached
+from ..configuration.tracing import traced
+from .expand_service import USER_EXPANSIONS, expand_references, parse_expand
+from .read_buffer_service import readed_books_buffer
+from .rental_service import record_rentals, mark_users_dirty
+from .subresource_service import find_with_counts, get_book_ids_page
 
 collection = db.users
+# Lists and reports may be served by a secondary; everything else reads the primary
+secondary_collection = collection.secondary_preferred()
 
+
+async def create_indexes():
+    await collection.create_index("active_rentals_count")
+    await collection.create_index("readed_books")
+    await collection.create_index("readed_updated_at")
+    await collection.create_index("birthdate")
+    await collection.create_index("updated_at")
+
+@traced
+@cached("users", "rentals", expansions=USER_EXPANSIONS)
 async def get_all_users(
     page: int,
     limit: int,
@@ -23,8 +47,13 @@ async def get_all_users(
     fav_category: Optional[str] = None,
     fav_author: Optional[str] = None,
     readed_book: Optional[str] = None,
-    rental_book: Optional[str] = None
+    rental_book: Optional[str] = None,
+    birthdate_from: Optional[date] = None,
+    birthdate_to: Optional[date] = None,
+    expand: Optional[str] = None
 ) -> List[UserResponse]:
+    expand_fields = parse_expand(USER_EXPANSIONS, expand)
+
     try:
         query = {}
 
@@ -44,24 +73,39 @@ async def get_all_users(
             query["readed_books"] = {"$in": [ObjectId(readed_book)]}
 
         if rental_book and ObjectId.is_valid(rental_book):
-            query["rental_books"] = {"$in": [ObjectId(rental_book)]}
+            query["_id"] = {"$in": await db.rentals.secondary_preferred().distinct("user", {"book": ObjectId(rental_book), "active": True})}
 
-        users = await collection.find(query).skip((page - 1) * limit).limit(limit).to_list(limit)
+        if birthdate_from or birthdate_to:
+            query["birthdate"] = {}
+            if birthdate_from:
+                query["birthdate"]["$gte"] = as_datetime(birthdate_from)
+            if birthdate_to:
+                query["birthdate"]["$lte"] = as_datetime(birthdate_to)
+
+        users = await secondary_collection.find(query).skip((page - 1) * limit).limit(limit).to_list(limit)
+        expanded = await expand_references(USER_EXPANSIONS, users, expand_fields)
 
         return [
-            UserResponse(id=str(user["_id"]), **{k: v for k, v in user.items() if k != "_id"})
-            for user in users
+            UserResponse(id=str(user["_id"]), expanded=user_expanded, **{k: v for k, v in user.items() if k != "_id"})
+            for user, user_expanded in zip(users, expanded)
         ]
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-async def get_user_by_id(user_id: str) -> Optional[UserResponse]:
+@traced
+async def get_user_by_id(user_id: str, counts_only: bool = False) -> Optional[UserResponse]:
     try:
         if not ObjectId.is_valid(user_id):
             raise ValueError("Invalid ObjectId format")
 
-        user = await collection.find_one({"_id": ObjectId(user_id)})
+        if counts_only:
+            user = await find_with_counts(collection, ObjectId(user_id), ["readed_books"])
+        else:
+            user = await collection.find_one({"_id": ObjectId(user_id)})
         if user:
             return UserResponse(id=str(user["_id"]), **{k: v for k, v in user.items() if k != "_id"})
 
@@ -70,21 +114,40 @@ async def get_user_by_id(user_id: str) -> Optional[UserResponse]:
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@traced
+async def get_user_readed_books(user_id: str, page: int = 1, limit: int = 50, expand: Optional[str] = None) -> BookIdsPageResponse:
+    return await get_book_ids_page(collection, user_id, "readed_books", "user", page=page, limit=limit, expand=expand)
+
+
+@traced
 async def create_user(user: User) -> Optional[UserResponse]:
     try:
         new_user = user.dict()
+        rental_books = [ObjectId(book_id) for book_id in new_user.pop("rental_books", []) if ObjectId.is_valid(book_id)]
+        new_user["rentals_count"] = new_user["active_rentals_count"] = 0
 
         result = await collection.insert_one(new_user)
 
+        if rental_books:
+            inserted, _ = await record_rentals(result.inserted_id, rental_books)
+            new_user["rentals_count"] = new_user["active_rentals_count"] = inserted
+
         return UserResponse(id=str(result.inserted_id), **new_user)
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
 
 
+@traced
 async def update_user(user_id: str, user: UpdateUserSchema) -> Optional[UserResponse]:
     try:
         if not ObjectId.is_valid(user_id):
@@ -92,20 +155,29 @@ async def update_user(user_id: str, user: UpdateUserSchema) -> Optional[UserResp
 
         updated_user = user.dict(exclude_unset=True)
 
-        result = await collection.update_one({"_id": ObjectId(user_id)}, {"$set": updated_user})
+        result = await collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {**updated_user, "updated_at": datetime.utcnow()}}
+        )
 
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found or no update performed")
 
+        await mark_users_dirty([ObjectId(user_id)])
+
         return await get_user_by_id(user_id)
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating user: {str(e)}")
 
 
+@traced
 async def delete_user(user_id: str) -> dict:
     try:
         if not ObjectId.is_valid(user_id):
@@ -116,15 +188,84 @@ async def delete_user(user_id: str) -> dict:
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
 
+        await mark_users_dirty([ObjectId(user_id)])
+
         return {"message": "User deleted successfully"}
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user ID format")
 
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting user: {str(e)}")
 
 
+def rental_books_and_libraries_pipeline(skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+    pipeline = [
+        {
+            "$match": {
+                "active_rentals_count": {"$gt": 0}
+            }
+        }
+    ]
+
+    if skip:
+        pipeline.append({"$skip": skip})
+
+    if limit:
+        pipeline.append({"$limit": limit})
+
+    return pipeline + [
+        {
+            "$lookup": {
+                "from": "rentals",
+                "localField": "_id",
+                "foreignField": "user",
+                "pipeline": [
+                    {"$match": {"active": True}},
+                    {"$project": {"book": 1}}
+                ],
+                "as": "rentals"
+            }
+        },
+        {
+            "$lookup": {
+                "from": "books",
+                "localField": "rentals.book",
+                "foreignField": "_id",
+                "as": "rented_books"
+            }
+        },
+        {
+            "$lookup": {
+                "from": "libraries",
+                "localField": "rented_books.libraries",
+                "foreignField": "_id",
+                "as": "book_libraries"
+            }
+        }
+    ]
+
+
+def to_user_aggregate_response(user: dict) -> UserResponseAggregate:
+    return UserResponseAggregate(
+        id=str(user["_id"]),
+        name=user.get("name", "Sem Nome"),
+        readed_books=[str(book) for book in user.get("readed_books", [])],
+        rental_books=[UBookAResponse(
+            id=str(book["_id"]),
+            title=book.get("title", "Título Desconhecido"),
+            libraries=[ULibraryAResponse(
+                id=str(library["_id"]),
+                name=library.get("name", "Biblioteca Desconhecida")
+            ) for library in user.get("book_libraries", [])]
+        ) for book in user.get("rented_books", [])]
+    )
+
+
+@traced
 async def get_users_with_rental_books_and_libraries(page: int = 1, limit: int = 10) -> List[UserResponseAggregate]:
     try:
         if page < 1 or limit < 1:
@@ -132,83 +273,38 @@ async def get_users_with_rental_books_and_libraries(page: int = 1, limit: int =
 
         skip = (page - 1) * limit
 
-        users_with_books_and_libraries = await collection.aggregate([
-            {
-                "$match": {  
-                    "rental_books": {"$exists": True, "$not": {"$size": 0}}  
-                }
-            },
-            {
-                "$addFields": {
-                    "rental_books": {
-                        "$map": {
-                            "input": { "$ifNull": ["$rental_books", []] },
-                            "as": "book_id",
-                            "in": {
-                                "$cond": {
-                                    "if": { "$eq": [{ "$type": "$$book_id" }, "string"] },  
-                                    "then": { "$toObjectId": "$$book_id" },
-                                    "else": "$$book_id" 
-                                }
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "books", 
-                    "localField": "rental_books",
-                    "foreignField": "_id",
-                    "as": "rented_books"
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "libraries",
-                    "localField": "rented_books.libraries", 
-                    "foreignField": "_id",
-                    "as": "book_libraries"
-                }
-            },
-            {
-                "$skip": skip
-            },
-            {
-                "$limit": limit
-            }
-        ]).to_list(length=limit)
+        users_with_books_and_libraries = await secondary_collection.aggregate(
+            rental_books_and_libraries_pipeline(skip=skip, limit=limit)
+        ).to_list(length=limit)
 
         if not users_with_books_and_libraries:
             raise HTTPException(status_code=404, detail="No users found")
 
-        return [
-            UserResponseAggregate(
-                id=str(user["_id"]),
-                name=user.get("name", "Sem Nome"),
-                readed_books=[str(book) for book in user.get("readed_books", [])],
-                rental_books=[UBookAResponse(
-                    id=str(book["_id"]),
-                    title=book.get("title", "Título Desconhecido"),
-                    libraries=[ULibraryAResponse(
-                        id=str(library["_id"]),
-                        name=library.get("name", "Biblioteca Desconhecida")
-                    ) for library in user.get("book_libraries", [])]
-                ) for book in user.get("rented_books", [])]
-            )
-            for user in users_with_books_and_libraries
-        ]
+        return [to_user_aggregate_response(user) for user in users_with_books_and_libraries]
     
+    except MONGO_TIMEOUT_ERRORS:
+        raise deadline_exceeded()
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@traced
+async def stream_users_with_rental_books_and_libraries() -> AsyncIterator[dict]:
+    async for user in secondary_collection.aggregate(rental_books_and_libraries_pipeline(), allowDiskUse=True):
+        yield jsonable_encoder(to_user_aggregate_response(user))
+
+
+@traced
 async def populate_books(user_id: str, user: PopulateBooksUserSchema) -> dict:
     readed_books = user.readed_books or []
     rental_books = user.rental_books or []
     
     if not ObjectId.is_valid(user_id):
         raise HTTPException(status_code=400, detail="ID inválido")
+
+    if user.library and not ObjectId.is_valid(user.library):
+        raise HTTPException(status_code=400, detail="ID de biblioteca inválido")
     
     valid_readed_books = [
         ObjectId(book_id) for book_id in readed_books if ObjectId.is_valid(book_id)
@@ -221,17 +317,46 @@ async def populate_books(user_id: str, user: PopulateBooksUserSchema) -> dict:
     if not valid_readed_books and not valid_rental_books:
         raise HTTPException(status_code=400, detail="Nenhum ID de livro válido fornecido")
 
-    update_query = {"$addToSet": {}}
+    user_oid = ObjectId(user_id)
 
-    if valid_readed_books:
-        update_query["$addToSet"]["readed_books"] = {"$each": valid_readed_books}
+    if not await collection.count_documents({"_id": user_oid}, limit=1):
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-    if valid_rental_books:
-        update_query["$addToSet"]["rental_books"] = {"$each": valid_rental_books}
+    modified = 0
 
-    result = await collection.update_one({"_id": ObjectId(user_id)}, update_query)
+    if valid_readed_books and settings.READ_BUFFER_MODE != "off":
+        # Whether the ids were new is only known at flush time
+        await readed_books_buffer.add(user_oid, valid_readed_books, wait=settings.READ_BUFFER_MODE == "durable")
+        modified += len(valid_readed_books)
 
-    if result.modified_count == 0:
+    elif valid_readed_books:
+        result = await collection.update_one(
+            {"_id": user_oid},
+            {
+                "$addToSet": {"readed_books": {"$each": valid_readed_books}},
+                "$set": {"readed_updated_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+            }
+        )
+        modified += result.modified_count
+        if result.modified_count:
+            # The rental report carries readed_books
+            await mark_users_dirty([user_oid])
+
+    unavailable = []
+    if valid_rental_books:
+        library_id = ObjectId(user.library) if user.library else None
+        inserted, unavailable = await record_rentals(user_oid, valid_rental_books, library_id)
+        modified += inserted
+
+    if unavailable:
+        # Everything else was recorded; sending the same body again is safe
+        raise HTTPException(status_code=409, detail={
+            "message": "Livros sem cópias disponíveis na biblioteca",
+            "unavailable_books": [str(book_id) for book_id in unavailable],
+            "added": modified
+        })
+
+    if modified == 0:
         raise HTTPException(status_code=404, detail="Usuário não encontrado ou livros já adicionados")
 
     return {"message": "Livros adicionados com sucesso"}
\ No newline at end of file
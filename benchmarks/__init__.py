@@ -0,0 +1,11 @@
+"""Microbenchmarks for the Python-side hot paths of the services.
+
+Run from the repository root::
+
+    python -m benchmarks.run                 # compare against baselines.json
+    python -m benchmarks.run --save          # record new baselines
+    python -m benchmarks.run -k books        # only benchmarks matching "books"
+
+Timings depend on the machine, so baselines should be recorded on the
+machine (or CI runner class) that compares against them.
+"""
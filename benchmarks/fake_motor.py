@@ -0,0 +1,243 @@
+"""In-memory stand-in for the parts of Motor the services use.
+
+It answers ``find``/``aggregate`` from Python lists so benchmarks measure
+the service code (query building, model construction, result shaping)
+rather than the network or the server.
+"""
+import re
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+MISSING = object()
+
+
+def _get(document: dict, path: str) -> Any:
+    value = document
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = [item.get(part, MISSING) for item in value if isinstance(item, dict)]
+            value = [item for item in value if item is not MISSING]
+        elif isinstance(value, dict):
+            value = value.get(part, MISSING)
+        else:
+            return MISSING
+    return value
+
+
+def _values(value) -> list:
+    if value is MISSING:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _compare(value, condition) -> bool:
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        return condition in _values(value) or value == condition
+
+    for operator, operand in condition.items():
+        values = _values(value)
+        if operator == "$in":
+            matched = any(item in operand for item in values)
+        elif operator == "$nin":
+            matched = not any(item in operand for item in values)
+        elif operator == "$ne":
+            matched = operand not in values
+        elif operator == "$exists":
+            matched = (value is not MISSING) == bool(operand)
+        elif operator == "$gt":
+            matched = any(item is not None and item > operand for item in values)
+        elif operator == "$gte":
+            matched = any(item is not None and item >= operand for item in values)
+        elif operator == "$lt":
+            matched = any(item is not None and item < operand for item in values)
+        elif operator == "$lte":
+            matched = any(item is not None and item <= operand for item in values)
+        elif operator == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            matched = any(isinstance(item, str) and re.search(operand, item, flags) for item in values)
+        elif operator == "$options":
+            continue
+        else:
+            raise NotImplementedError(f"Unsupported query operator {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif not _compare(_get(document, key), condition):
+            return False
+    return True
+
+
+def _project(document: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return dict(document)
+    included = [key for key, value in projection.items() if value and key != "_id"]
+    if included:
+        result = {key: document[key] for key in included if key in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {key: value for key, value in document.items() if projection.get(key, 1)}
+
+
+class FakeCursor:
+    """Lazy cursor: documents are matched and copied only up to skip + limit."""
+
+    def __init__(self, documents: Iterable[dict], projection: Optional[dict] = None):
+        self._documents = documents
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1):
+        documents = list(self._documents)
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            documents.sort(key=lambda document: (_get(document, field) is MISSING, _get(document, field)), reverse=order < 0)
+        self._documents = documents
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def hint(self, index):
+        return self
+
+    def _window(self, length: Optional[int] = None) -> Iterator[dict]:
+        limit = min(filter(None, (self._limit, length)), default=None)
+        end = self._skip + limit if limit else None
+        for document in islice(self._documents, self._skip, end):
+            yield _project(document, self._projection)
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return list(self._window(length))
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self._window():
+            yield document
+
+
+class FakeCollection:
+    def __init__(self, database: "FakeDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: List[dict] = []
+        self._indexes: Dict[str, Dict[Any, List[dict]]] = {}
+
+    def load(self, documents: List[dict]) -> None:
+        self.documents = list(documents)
+        self._indexes.clear()
+
+    def index(self, field: str) -> Dict[Any, List[dict]]:
+        """Hash index used by $lookup, built once per loaded data set."""
+        if field not in self._indexes:
+            index: Dict[Any, List[dict]] = defaultdict(list)
+            for document in self.documents:
+                for value in _values(_get(document, field)):
+                    index[value].append(document)
+            self._indexes[field] = index
+        return self._indexes[field]
+
+    def with_options(self, **kwargs) -> "FakeCollection":
+        return self
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> FakeCursor:
+        return FakeCursor((document for document in self.documents if matches(document, query)), projection)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> Optional[dict]:
+        for document in self.documents:
+            if matches(document, query):
+                return _project(document, projection)
+        return None
+
+    async def count_documents(self, query: dict, **kwargs) -> int:
+        count = sum(1 for document in self.documents if matches(document, query))
+        return min(count, kwargs["limit"]) if kwargs.get("limit") else count
+
+    async def distinct(self, key: str, query: Optional[dict] = None, **kwargs) -> list:
+        values = []
+        for document in self.documents:
+            if matches(document, query):
+                for value in _values(_get(document, key)):
+                    if value not in values:
+                        values.append(value)
+        return values
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> FakeCursor:
+        documents: Iterable[dict] = iter(self.documents)
+        for stage in pipeline:
+            (operator, spec), = stage.items()
+            # Stages are chained lazily, so each one binds its own spec
+            if operator == "$match":
+                documents = filter(lambda document, spec=spec: matches(document, spec), documents)
+            elif operator == "$skip":
+                documents = islice(documents, spec, None)
+            elif operator == "$limit":
+                documents = islice(documents, spec)
+            elif operator == "$project":
+                documents = map(lambda document, spec=spec: _project(document, spec), documents)
+            elif operator == "$lookup":
+                documents = self._lookup(documents, spec)
+            elif operator == "$unwind":
+                documents = self._unwind(documents, spec)
+            else:
+                raise NotImplementedError(f"Unsupported aggregation stage {operator}")
+        return FakeCursor(documents)
+
+    def _lookup(self, documents: Iterable[dict], spec: dict) -> Iterator[dict]:
+        index = self.database[spec["from"]].index(spec["foreignField"])
+        for document in documents:
+            local_values = [item for value in _values(_get(document, spec["localField"])) for item in _values(value)]
+            joined = list({id(other): other for value in local_values for other in index.get(value, [])}.values())
+            for stage in spec.get("pipeline", []):
+                (operator, stage_spec), = stage.items()
+                if operator == "$match":
+                    joined = [other for other in joined if matches(other, stage_spec)]
+                elif operator == "$project":
+                    joined = [_project(other, stage_spec) for other in joined]
+            yield {**document, spec["as"]: joined}
+
+    def _unwind(self, documents: Iterable[dict], spec) -> Iterator[dict]:
+        path = (spec if isinstance(spec, str) else spec["path"]).lstrip("$")
+        keep_empty = isinstance(spec, dict) and spec.get("preserveNullAndEmptyArrays", False)
+        for document in documents:
+            values = document.get(path)
+            if isinstance(values, list) and values:
+                for value in values:
+                    yield {**document, path: value}
+            elif keep_empty:
+                yield {key: value for key, value in document.items() if key != path}
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self, name)
+        return self._collections[name]
+
+    def get_collection(self, name: str, **kwargs) -> FakeCollection:
+        return self[name]
@@ -0,0 +1,72 @@
+import random
+from datetime import datetime, timedelta
+from bson import ObjectId
+from .fake_motor import FakeDatabase
+
+BOOKS = 2000
+AUTHORS = 200
+LIBRARIES = 20
+CATEGORIES = 10
+USERS = 1000
+
+
+def build_database(seed: int = 42) -> FakeDatabase:
+    """Deterministic catalog shaped like the production collections."""
+    random.seed(seed)
+    database = FakeDatabase()
+
+    categories = [{"_id": ObjectId(), "name": f"Category {i}", "ancestors": []} for i in range(CATEGORIES)]
+    libraries = [
+        {"_id": ObjectId(), "name": f"Library {i}", "location": f"City {i}", "is_public": True, "books": []}
+        for i in range(LIBRARIES)
+    ]
+    authors = [
+        {"_id": ObjectId(), "name": f"Author {i}", "nationality": "Brazilian", "written_books": []}
+        for i in range(AUTHORS)
+    ]
+
+    books = []
+    for i in range(BOOKS):
+        author = random.choice(authors)
+        book = {
+            "_id": ObjectId(),
+            "title": f"Book title {i}",
+            "author": author["_id"],
+            "category": random.choice(categories)["_id"],
+            "published_date": datetime(1950, 1, 1) + timedelta(days=random.randint(0, 27000)),
+            "isbn": f"978{i:010d}",
+            "libraries": [library["_id"] for library in random.sample(libraries, 2)],
+        }
+        author["written_books"].append(book["_id"])
+        books.append(book)
+
+    users, rentals = [], []
+    for i in range(USERS):
+        user = {
+            "_id": ObjectId(),
+            "name": f"User {i}",
+            "birthdate": datetime(1960, 1, 1) + timedelta(days=random.randint(0, 18000)),
+            "readed_books": [book["_id"] for book in random.sample(books, 10)],
+            "fav_library": random.choice(libraries)["_id"],
+            "rentals_count": 0,
+            "active_rentals_count": 0,
+        }
+        for book in random.sample(books, random.randint(0, 3)):
+            rentals.append({
+                "_id": ObjectId(),
+                "user": user["_id"],
+                "book": book["_id"],
+                "library": book["libraries"][0],
+                "checked_out_at": datetime(2024, 1, 1),
+                "active": True,
+            })
+            user["rentals_count"] += 1
+            user["active_rentals_count"] += 1
+        users.append(user)
+
+    for name, documents in (
+        ("categories", categories), ("libraries", libraries), ("authors", authors),
+        ("books", books), ("users", users), ("rentals", rentals),
+    ):
+        database[name].load(documents)
+    return database
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, Optional
+from .fixtures import build_database
+from .suite import BENCHMARKS, install, is_async
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+ROUNDS = 5
+ROUND_SECONDS = 0.2
+
+
+async def _call(function, database, iterations: int) -> float:
+    # Like timeit, keep collector pauses out of the measurement
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        if is_async(function):
+            for _ in range(iterations):
+                await function(database)
+        else:
+            for _ in range(iterations):
+                function(database)
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+async def measure_time(function, database) -> float:
+    """Best per-call time over ``ROUNDS`` rounds of about ``ROUND_SECONDS`` each."""
+    await _call(function, database, 3)
+
+    iterations = 1
+    while (elapsed := await _call(function, database, iterations)) < ROUND_SECONDS / 10:
+        iterations *= 10
+    iterations = max(1, int(iterations * ROUND_SECONDS / max(elapsed, 1e-9)))
+
+    return min([await _call(function, database, iterations) / iterations for _ in range(ROUNDS)])
+
+
+async def measure_peak(function, database) -> int:
+    """Peak bytes allocated while running one call, above what was live before it."""
+    await _call(function, database, 1)
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(3):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await _call(function, database, 1)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        return min(peaks)
+    finally:
+        tracemalloc.stop()
+
+
+async def run(pattern: Optional[str]) -> Dict[str, dict]:
+    database = build_database()
+    install(database)
+
+    results = {}
+    for name, function in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = {
+            "time_us": round(await measure_time(function, database) * 1e6, 2),
+            "peak_bytes": await measure_peak(function, database),
+        }
+    return results
+
+
+def load_baselines() -> dict:
+    try:
+        with open(BASELINES_PATH) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"benchmarks": {}}
+
+
+def compare(results: Dict[str, dict], baselines: dict, time_threshold: float, memory_threshold: float) -> int:
+    regressions = 0
+    print(f"{'benchmark':<50} {'time (µs)':>12} {'Δ':>8} {'peak (B)':>12} {'Δ':>8}")
+
+    for name, result in results.items():
+        baseline = baselines["benchmarks"].get(name)
+        flags, deltas = [], ["", ""]
+        if baseline:
+            time_delta = result["time_us"] / baseline["time_us"] - 1
+            memory_delta = result["peak_bytes"] / max(baseline["peak_bytes"], 1) - 1
+            deltas = [f"{time_delta:+.0%}", f"{memory_delta:+.0%}"]
+            if time_delta > time_threshold:
+                flags.append("time")
+            if memory_delta > memory_threshold:
+                flags.append("memory")
+        else:
+            flags.append("no baseline")
+
+        regressions += any(flag != "no baseline" for flag in flags)
+        marker = f"  ⚠️ {', '.join(flags)}" if flags else ""
+        print(f"{name:<50} {result['time_us']:>12.2f} {deltas[0]:>8} {result['peak_bytes']:>12} {deltas[1]:>8}{marker}")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run service microbenchmarks against an in-memory Motor stand-in.")
+    parser.add_argument("-k", dest="pattern", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baselines")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="Allowed slowdown, as a fraction")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="Allowed peak allocation growth, as a fraction")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.pattern))
+    baselines = load_baselines()
+
+    if args.save:
+        baselines["benchmarks"].update(results)
+        baselines["python"] = platform.python_version()
+        baselines["machine"] = platform.machine()
+        with open(BASELINES_PATH, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baselines saved to {BASELINES_PATH}")
+
+    regressions = compare(results, baselines, args.time_threshold, args.memory_threshold)
+    if regressions and not args.save:
+        print(f"\n{regressions} benchmark(s) regressed beyond the threshold")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import inspect
+from datetime import date
+from typing import Awaitable, Callable, Dict, Union
+from app.configuration import database as database_module
+from app.models.book import BookResponse
+from app.models.user import UserResponse
+from app.services import book_service, user_service
+from .fake_motor import FakeDatabase
+
+Benchmark = Callable[[FakeDatabase], Union[Awaitable, object]]
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str):
+    def register(function: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def is_async(function: Benchmark) -> bool:
+    return inspect.iscoroutinefunction(function)
+
+
+def install(database: FakeDatabase) -> None:
+    """Points every LazyCollection at the in-memory database."""
+    database_module.get_database = lambda: database
+
+
+@benchmark("get_all_books.no_filters")
+async def get_all_books_plain(database: FakeDatabase):
+    await book_service.get_all_books(page=1, limit=100)
+
+
+@benchmark("get_all_books.filters")
+async def get_all_books_filtered(database: FakeDatabase):
+    await book_service.get_all_books(
+        page=1,
+        limit=50,
+        category=str(database["categories"].documents[0]["_id"]),
+        start_date=date(1950, 1, 1),
+        end_date=date(2030, 1, 1),
+        sort_by_date="desc",
+    )
+
+
+@benchmark("get_all_users.filters")
+async def get_all_users_filtered(database: FakeDatabase):
+    await user_service.get_all_users(
+        page=1,
+        limit=50,
+        fav_library=str(database["libraries"].documents[0]["_id"]),
+        birthdate_from=date(1960, 1, 1),
+        birthdate_to=date(2020, 1, 1),
+    )
+
+
+@benchmark("BookResponse.init")
+def book_response(database: FakeDatabase):
+    book = database["books"].documents[0]
+    BookResponse(id=str(book["_id"]), **{k: v for k, v in book.items() if k != "_id"})
+
+
+@benchmark("UserResponse.init")
+def user_response(database: FakeDatabase):
+    user = database["users"].documents[0]
+    UserResponse(id=str(user["_id"]), **{k: v for k, v in user.items() if k != "_id"})
+
+
+@benchmark("list_books_with_authors.page")
+async def books_with_authors(database: FakeDatabase):
+    await book_service.list_books_with_authors(page=2, limit=50)
+
+
+@benchmark("get_users_with_rental_books_and_libraries.page")
+async def users_with_rentals(database: FakeDatabase):
+    await user_service.get_users_with_rental_books_and_libraries(page=1, limit=50)
@@ -0,0 +1,19 @@
+import os
+
+# Settings are read when app modules are imported; no Mongo is contacted,
+# every test points the collections at tests.fakes
+os.environ.setdefault("MONGO_HOST", "localhost")
+os.environ.setdefault("MONGO_PORT", "27017")
+os.environ.setdefault("MONGO_DB", "library_test")
+
+import pytest
+from app.configuration import database
+from .fakes import FakeDatabase
+
+
+@pytest.fixture
+def fake_db(monkeypatch) -> FakeDatabase:
+    """Points every LazyCollection at a fresh in-memory database."""
+    fake = FakeDatabase()
+    monkeypatch.setattr(database, "get_database", lambda: fake)
+    return fake
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional, Tuple
+from benchmarks.fake_motor import matches
+
+
+class FakeCursor:
+    def __init__(self, documents: List[dict]):
+        self.documents = documents
+
+    def sort(self, key, direction: int = 1):
+        self.documents = sorted(self.documents, key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count: int):
+        self.documents = self.documents[:count or None]
+        return self
+
+    def hint(self, index):
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return self.documents[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeCollection:
+    """Records every write and answers with ``results[method]``; an
+    exception there is raised instead. Reads and deletes match
+    ``documents`` with the benchmarks' query matcher."""
+
+    def __init__(self):
+        self.documents: Dict[Any, dict] = {}
+        self.calls: List[Tuple[str, tuple, dict]] = []
+        self.results: Dict[str, Any] = {}
+
+    def _record(self, method: str, args: tuple, kwargs: dict):
+        self.calls.append((method, args, kwargs))
+        result = self.results.get(method)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def called(self, method: str) -> List[tuple]:
+        return [args for name, args, _ in self.calls if name == method]
+
+    def _matching(self, query: Optional[dict]) -> List[dict]:
+        return [document for document in self.documents.values() if matches(document, query)]
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> FakeCursor:
+        return FakeCursor(self._matching(query))
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> Optional[dict]:
+        found = self._matching(query)
+        return found[0] if found else None
+
+    async def count_documents(self, query: dict, limit: int = 0, **kwargs) -> int:
+        return len(self._matching(query)[:limit or None])
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self.documents)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False, **kwargs):
+        if upsert and "$inc" in update:
+            document = self.documents.setdefault(query["_id"], {"_id": query["_id"]})
+            for field, amount in update["$inc"].items():
+                document[field] = document.get(field, 0) + amount
+        return self._record("update_one", (query, update), kwargs)
+
+    async def update_many(self, query: dict, update, **kwargs):
+        return self._record("update_many", (query, update), kwargs)
+
+    async def delete_many(self, query: dict, **kwargs):
+        for document in self._matching(query):
+            del self.documents[document["_id"]]
+        return self._record("delete_many", (query,), kwargs)
+
+    async def bulk_write(self, operations: list, **kwargs):
+        return self._record("bulk_write", (operations,), kwargs)
+
+    async def insert_many(self, documents: List[dict], **kwargs):
+        return self._record("insert_many", (documents,), kwargs)
+
+    async def find_one_and_update(self, query: dict, update, **kwargs):
+        return self._record("find_one_and_update", (query, update), kwargs)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        return self.collections.setdefault(name, FakeCollection())
+
+    def get_collection(self, name: str, **kwargs) -> FakeCollection:
+        return self[name]
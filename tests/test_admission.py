@@ -0,0 +1,135 @@
+import asyncio
+from app.middlewares.admission import AdmissionControlMiddleware, ConcurrencyLimiter
+
+
+def limiter(limit: int = 1, queue_size: int = 2, queue_timeout: float = 1.0) -> ConcurrencyLimiter:
+    return ConcurrencyLimiter("lists", limit=limit, queue_size=queue_size, queue_timeout=queue_timeout)
+
+
+def test_release_hands_the_slot_to_the_oldest_waiter():
+    async def scenario():
+        budget = limiter(queue_size=3)
+        assert await budget.acquire()
+        first = asyncio.ensure_future(budget.acquire())
+        second = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+        assert budget.queue_depth == 2
+
+        budget.release()
+        assert await first
+        assert not second.done()
+        # The slot changed hands without ever being free
+        assert budget.in_flight == 1
+
+        budget.release()
+        assert await second
+        budget.release()
+        assert budget.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_new_arrivals_queue_behind_waiters():
+    async def scenario():
+        budget = limiter(limit=2)
+        await budget.acquire()
+        await budget.acquire()
+        waiter = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+
+        budget.release()
+        # The freed slot went to the waiter, not to whoever comes next
+        late = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+        assert await waiter
+        assert not late.done()
+        late.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_sheds_at_once():
+    async def scenario():
+        budget = limiter(queue_size=1)
+        await budget.acquire()
+        queued = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+        assert not await budget.acquire()
+        assert budget.stats()["shed_total"] == 1
+        queued.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_sheds_the_waiter():
+    async def scenario():
+        budget = limiter(queue_timeout=0.01)
+        await budget.acquire()
+        assert not await budget.acquire()
+        assert budget.stats()["queue_timeouts_total"] == 1
+        assert budget.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_a_slot_handed_to_a_cancelled_waiter_is_not_lost():
+    async def scenario():
+        budget = limiter()
+        await budget.acquire()
+        gone = asyncio.ensure_future(budget.acquire())
+        next_in_line = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+
+        budget.release()
+        # The client goes away after the handoff but before its request resumes.
+        # Depending on the Python version the waiter either still gets the slot
+        # (and releases it once done) or passes it on while being cancelled
+        gone.cancel()
+        try:
+            admitted = await gone
+        except asyncio.CancelledError:
+            admitted = False
+        if admitted:
+            budget.release()
+
+        assert await next_in_line
+        assert budget.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiters_leave_the_queue():
+    async def scenario():
+        budget = limiter()
+        await budget.acquire()
+        gone = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.sleep(0)
+
+        assert budget.queue_depth == 0
+        budget.release()
+        assert budget.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_middleware_answers_503_with_retry_after_when_shedding():
+    budget = ConcurrencyLimiter("lists", limit=1, queue_size=0, queue_timeout=1, retry_after=7)
+    sent = []
+
+    async def app(scope, receive, send):
+        raise AssertionError("the request should have been shed")
+
+    async def send(message):
+        sent.append(message)
+
+    async def scenario():
+        await budget.acquire()
+        middleware = AdmissionControlMiddleware(app, route_limiters={"lists": budget})
+        await middleware({"type": "http", "method": "GET", "path": "/books/", "headers": []}, None, send)
+
+    asyncio.run(scenario())
+    start = sent[0]
+    assert start["status"] == 503
+    assert (b"retry-after", b"7") in start["headers"]
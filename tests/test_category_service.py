@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.results import UpdateResult
+from app.models.category import Category, UpdateCategorySchema
+from app.services import category_service
+
+ROOT, A, B, C, D, X = (ObjectId() for _ in range(6))
+# ROOT > X and A > B > C > D
+TREE = {ROOT: [], X: [ROOT], A: [], B: [A], C: [A, B], D: [A, B, C]}
+
+
+def evaluate(expression, document):
+    """The aggregation operators the re-parenting pipeline uses."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document[expression[1:]]
+    if isinstance(expression, dict):
+        (operator, arguments), = expression.items()
+        values = [evaluate(argument, document) for argument in arguments] if isinstance(arguments, list) else evaluate(arguments, document)
+        if operator == "$concatArrays":
+            return [item for value in values for item in value]
+        if operator == "$slice":
+            array, start, count = values
+            return array[start:start + count]
+        if operator == "$indexOfArray":
+            array, value = values
+            return array.index(value)
+        if operator == "$size":
+            return len(values)
+        raise NotImplementedError(operator)
+    if isinstance(expression, list):
+        return [evaluate(item, document) for item in expression]
+    return expression
+
+
+@pytest.fixture
+def categories(fake_db):
+    categories = fake_db["categories"]
+    now = datetime.utcnow()
+    for category_id, ancestors in TREE.items():
+        categories.documents[category_id] = {
+            "_id": category_id, "name": f"Categoria {category_id}", "ancestors": ancestors,
+            "parent_category": ancestors[-1] if ancestors else None, "created_at": now, "updated_at": now,
+        }
+    categories.results["update_one"] = UpdateResult({"n": 1, "nModified": 1}, acknowledged=True)
+    return categories
+
+
+def move(category_id, **update) -> None:
+    asyncio.run(category_service.update_category(str(category_id), UpdateCategorySchema(**update)))
+
+
+def descendants_after_move(categories, moved) -> dict:
+    (query, pipeline), = categories.called("update_many")
+    assert query == {"ancestors": moved}
+    stage, = pipeline
+    return {
+        document["_id"]: evaluate(stage["$set"]["ancestors"], document)
+        for document in categories.documents.values() if moved in document["ancestors"]
+    }
+
+
+def test_moving_a_category_reroots_its_whole_subtree(categories):
+    move(B, parent_category=str(X))
+
+    (_, update), = categories.called("update_one")
+    assert update["$set"]["ancestors"] == [ROOT, X]
+    assert descendants_after_move(categories, B) == {C: [ROOT, X, B], D: [ROOT, X, B, C]}
+
+
+def test_a_null_parent_moves_the_subtree_to_the_root(categories):
+    move(B, parent_category=None)
+
+    (_, update), = categories.called("update_one")
+    assert update["$set"]["ancestors"] == []
+    assert descendants_after_move(categories, B) == {C: [B], D: [B, C]}
+
+
+def test_a_category_cannot_move_under_its_own_subtree(categories):
+    with pytest.raises(HTTPException) as error:
+        move(B, parent_category=str(D))
+    assert error.value.status_code == 400
+    assert categories.called("update_one") == []
+
+
+@pytest.mark.parametrize("parent", ["not-an-id", "", str(ObjectId())])
+def test_bad_parents_are_rejected(categories, parent):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(category_service.create_category(Category(name="Poesia", parent_category=parent)))
+    assert error.value.status_code == 400
+
+    with pytest.raises(HTTPException) as error:
+        move(B, parent_category=parent)
+    assert error.value.status_code == 400
+    assert categories.calls == []
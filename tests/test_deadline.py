@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from pymongo import _csot
+from app.configuration.context import operation_id_var, request_id_var
+from app.configuration.settings import settings
+from app.middlewares import deadline
+from app.middlewares.deadline import DeadlineMiddleware
+
+
+def scope(path: str = "/books/", method: str = "GET", headers=()) -> dict:
+    return {"type": "http", "method": method, "path": path, "headers": list(headers)}
+
+
+@pytest.fixture
+def killed(monkeypatch) -> list:
+    killed = []
+
+    async def kill_operations(operation_id):
+        killed.append(operation_id)
+
+    monkeypatch.setattr(deadline, "kill_operations", kill_operations)
+    return killed
+
+
+def test_handler_runs_with_the_route_budget_and_ids(killed):
+    seen, sent = {}, []
+
+    async def app(scope, receive, send):
+        seen.update(budget=_csot.get_timeout(), operation=operation_id_var.get(), request=request_id_var.get())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    messages = [{"type": "http.request", "body": b""}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(DeadlineMiddleware(app)(scope(headers=[(b"x-request-id", b"client-chosen")]), receive, send))
+
+    assert seen["budget"] == settings.DEADLINE_LISTS_SECONDS
+    assert seen["request"] == "client-chosen"
+    # killOp matches the server-generated id, never the client's
+    assert seen["operation"] not in (None, "client-chosen")
+    assert (b"x-request-id", b"client-chosen") in sent[0]["headers"]
+    assert killed == []
+
+
+def test_disconnect_cancels_the_handler_and_kills_its_operations(killed):
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["operation"] = operation_id_var.get()
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            seen["cancelled"] = True
+            raise
+
+    messages = [{"type": "http.request", "body": b"{}"}, {"type": "http.disconnect"}]
+
+    async def receive():
+        message = messages.pop(0)
+        if message["type"] == "http.disconnect":
+            await asyncio.sleep(0.01)
+        return message
+
+    async def send(message):
+        raise AssertionError("nothing is sent to a client that went away")
+
+    asyncio.run(DeadlineMiddleware(app)(scope(method="POST", path="/books/"), receive, send))
+
+    assert seen["cancelled"]
+    assert killed == [seen["operation"]]
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, settings.DEADLINE_LOOKUPS_SECONDS),
+    (b"0.5", 0.5),
+    (b"9999", settings.DEADLINE_MAX_SECONDS),
+    (b"0", 0.001),
+    (b"soon", settings.DEADLINE_LOOKUPS_SECONDS),
+])
+def test_requested_timeouts_are_clamped(header, expected):
+    headers = [(b"x-request-timeout", header)] if header else []
+    assert DeadlineMiddleware(None).budget_for(scope("/books/123", headers=headers)) == expected
+
+
+def test_unclassified_routes_get_no_budget():
+    assert DeadlineMiddleware(None).budget_for(scope("/health/ready")) is None
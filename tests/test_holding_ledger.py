@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+from pymongo.results import InsertManyResult
+from app.models.holding import HoldingSchema
+from app.services import holding_service, rental_service
+from app.services.rental_service import DUPLICATE_KEY_ERROR
+
+LIBRARY, USER = ObjectId(), ObjectId()
+BOOKS = [ObjectId() for _ in range(3)]
+
+
+@pytest.fixture
+def ledger(monkeypatch, fake_db):
+    """Copies are taken for every book but BOOKS[2]; released ones are listed."""
+    released = []
+
+    async def take_copy(library_id, book_id):
+        return None if book_id == BOOKS[2] else {"library": library_id, "book": book_id}
+
+    async def release_copy(library_id, book_id):
+        released.append(book_id)
+
+    monkeypatch.setattr(rental_service, "take_copy", take_copy)
+    monkeypatch.setattr(rental_service, "release_copy", release_copy)
+    return released
+
+
+def bulk_error(inserted: int, *errors) -> BulkWriteError:
+    return BulkWriteError({
+        "nInserted": inserted,
+        "writeErrors": [{"index": index, "code": code, "errmsg": "failed"} for index, code in errors],
+    })
+
+
+def test_take_copy_only_matches_available_copies(fake_db):
+    asyncio.run(holding_service.take_copy(LIBRARY, BOOKS[0]))
+    (query, update), = fake_db["holdings"].called("find_one_and_update")
+    assert query["available_copies"] == {"$gt": 0}
+    assert update["$inc"] == {"available_copies": -1}
+
+
+def test_release_copy_never_exceeds_total(fake_db):
+    asyncio.run(holding_service.release_copy(LIBRARY, BOOKS[0]))
+    (query, update), = fake_db["holdings"].called("find_one_and_update")
+    assert query["$expr"] == {"$lt": ["$available_copies", "$total_copies"]}
+    assert update["$inc"] == {"available_copies": 1}
+
+
+def test_only_books_with_a_copy_are_rented(ledger, fake_db):
+    fake_db["rentals"].results["insert_many"] = InsertManyResult([ObjectId(), ObjectId()], acknowledged=True)
+    inserted, unavailable = asyncio.run(rental_service.record_rentals(USER, BOOKS + BOOKS[:1], LIBRARY))
+
+    (rentals,), = fake_db["rentals"].called("insert_many")
+    assert [rental["book"] for rental in rentals] == BOOKS[:2]
+    assert inserted == 2
+    assert unavailable == BOOKS[2:]
+    assert ledger == []
+
+
+def test_duplicate_rentals_give_their_copy_back(ledger, fake_db):
+    fake_db["rentals"].results["insert_many"] = bulk_error(1, (1, DUPLICATE_KEY_ERROR))
+
+    assert asyncio.run(rental_service.record_rentals(USER, BOOKS, LIBRARY)) == (1, BOOKS[2:])
+    assert ledger == [BOOKS[1]]
+    (query, update), = fake_db["users"].called("update_one")
+    assert update["$inc"] == {"rentals_count": 1, "active_rentals_count": 1}
+
+
+def test_other_write_errors_release_and_raise(ledger, fake_db):
+    fake_db["rentals"].results["insert_many"] = bulk_error(1, (0, 121))
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(rental_service.record_rentals(USER, BOOKS, LIBRARY))
+    assert ledger == [BOOKS[0]]
+
+
+def test_unknown_outcome_releases_every_copy(ledger, fake_db):
+    fake_db["rentals"].results["insert_many"] = TimeoutError("no reply")
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(rental_service.record_rentals(USER, BOOKS, LIBRARY))
+    assert ledger == BOOKS[:2]
+    assert fake_db["users"].calls == []
+
+
+@pytest.mark.parametrize("total, operator", [(3, "$addToSet"), (0, "$pull")])
+def test_setting_copies_links_or_unlinks_the_pair(fake_db, total, operator):
+    fake_db["holdings"].results["find_one_and_update"] = {
+        "_id": ObjectId(), "library": LIBRARY, "book": BOOKS[0], "total_copies": total, "available_copies": total,
+    }
+
+    response = asyncio.run(holding_service.set_holding_copies(str(LIBRARY), str(BOOKS[0]), HoldingSchema(total_copies=total)))
+
+    assert response.total_copies == total
+    (library_query, library_update), = fake_db["libraries"].called("update_one")
+    (book_query, book_update), = fake_db["books"].called("update_one")
+    assert library_update[operator] == {"books": BOOKS[0]}
+    assert book_update[operator] == {"libraries": LIBRARY}
+    assert "updated_at" in library_update["$set"] and "updated_at" in book_update["$set"]
+
+
+def test_withdrawing_from_an_empty_shelf_conflicts(fake_db):
+    fake_db["holdings"].documents[1] = {"_id": 1, "library": LIBRARY, "book": BOOKS[0], "available_copies": 0}
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(holding_service.withdraw_copy(str(LIBRARY), str(BOOKS[0])))
+    assert error.value.status_code == 409
+    assert fake_db["rentals"].calls == []
+
+
+def test_restoring_an_unknown_holding_is_not_found(fake_db):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(holding_service.restore_copy(str(LIBRARY), str(BOOKS[0])))
+    assert error.value.status_code == 404
@@ -0,0 +1,93 @@
+import asyncio
+import json
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from app.configuration.settings import settings
+from app.services import import_service
+from app.services.import_service import _row_id, iter_rows
+from app.models.author import Author
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def author(name: str) -> bytes:
+    return json.dumps({"name": name, "nationality": "Brasileira"}).encode() + b"\n"
+
+
+def rows(*chunks: bytes, format: str = "jsonl") -> list:
+    async def collect():
+        return [item async for item in iter_rows(Author, stream(*chunks), format)]
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def small_lines(monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_MAX_LINE_BYTES", 64)
+
+
+def test_lines_split_across_chunks_are_joined(small_lines):
+    line = author("Machado de Assis")
+    assert rows(line[:10], line[10:] + author("Clarice")) == [
+        ({"name": "Machado de Assis", "nationality": "Brasileira"}, None),
+        ({"name": "Clarice", "nationality": "Brasileira"}, None),
+    ]
+
+
+def test_overlong_lines_become_error_rows(small_lines):
+    # Streamed in small chunks without a newline: never buffered whole
+    huge = [b"x" * 40] * 10
+    result = rows(author("Lima Barreto"), *huge, b"\n", author("Cecilia"), b"y" * 100)
+
+    assert [data and data["name"] for data, _ in result] == ["Lima Barreto", None, "Cecilia", None]
+    assert result[1][1] == result[3][1] == "Line longer than 64 bytes"
+
+
+def test_overlong_quoted_csv_records_become_error_rows(small_lines):
+    result = rows(b"name,nationality\n", b'"never closed\n', b"more text\n" * 10, b'closed",Brasileira\n', b"Ariano,Brasileiro\n", format="csv")
+    assert result == [
+        (None, "Line longer than 64 bytes"),
+        ({"name": "Ariano", "nationality": "Brasileiro"}, None),
+    ]
+
+
+@pytest.fixture
+def interrupted_import(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+    job = {
+        "_id": ObjectId(), "kind": "authors", "format": "jsonl", "status": "interrupted",
+        "created_at": datetime.utcnow(), "rows_committed": 2, "inserted": 2,
+    }
+    fake_db["import_jobs"].documents[job["_id"]] = job
+    fake_db["import_jobs"].results["find_one_and_update"] = job
+    return job
+
+
+def test_resume_skips_rows_up_to_the_watermark(fake_db, interrupted_import):
+    upload = stream(*(author(name) for name in ("Aluísio", "Graciliano", "Rachel", "Jorge", "Erico")))
+
+    asyncio.run(import_service.run_import("authors", "jsonl", upload, import_id=str(interrupted_import["_id"])))
+
+    inserted = [document for (documents,) in fake_db["authors"].called("insert_many") for document in documents]
+    assert [document["name"] for document in inserted] == ["Rachel", "Jorge", "Erico"]
+    assert [document["_id"] for document in inserted] == [_row_id(interrupted_import["_id"], row) for row in (3, 4, 5)]
+    (_, final), = [args for args in fake_db["import_jobs"].called("update_one") if "status" in args[1]["$set"]]
+    assert final["$set"]["status"] == "done"
+    assert final["$max"] == {"rows_read": 5, "rows_committed": 5}
+
+
+def test_failed_upload_keeps_the_watermark_of_written_batches(fake_db, interrupted_import):
+    async def broken_upload():
+        for name in ("Aluísio", "Graciliano", "Rachel", "Jorge", "Erico"):
+            yield author(name)
+        raise ConnectionResetError("client went away")
+
+    asyncio.run(import_service.run_import("authors", "jsonl", broken_upload(), import_id=str(interrupted_import["_id"])))
+
+    (_, final), = [args for args in fake_db["import_jobs"].called("update_one") if "status" in args[1]["$set"]]
+    assert final["$set"]["status"] == "interrupted"
+    # Rows 3-4 were a full batch; row 5 was still buffered when the upload broke
+    assert final["$max"]["rows_committed"] == 4
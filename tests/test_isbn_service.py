@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from pymongo.errors import OperationFailure
+from app.configuration.context import request_id_var
+from app.services import isbn_service
+from app.services.isbn_service import BloomFilter
+from app.services.rental_service import DUPLICATE_KEY_ERROR
+from .fakes import FakeCursor
+
+
+@pytest.fixture(autouse=True)
+def no_filter(monkeypatch):
+    monkeypatch.setattr(isbn_service, "isbn_filter", None)
+    monkeypatch.setattr(isbn_service, "_remembered_during_rebuild", None)
+    monkeypatch.setattr(isbn_service, "_rebuild_task", None)
+
+
+def load_books(fake_db, isbns):
+    books = fake_db["books"]
+    books.documents = {index: {"_id": index, "isbn": isbn} for index, isbn in enumerate(isbns)}
+    # The covered scan filters on $type, which the query matcher does not know
+    books.find = lambda *args, **kwargs: FakeCursor(list(books.documents.values()))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    isbns = [f"978{index:010d}" for index in range(1000)]
+    for isbn in isbns:
+        bloom.add(isbn)
+
+    assert all(isbn in bloom for isbn in isbns)
+    false_positives = sum(f"979{index:010d}" in bloom for index in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_filter_saturates_past_capacity():
+    bloom = BloomFilter(capacity=2)
+    for isbn in ("1", "2"):
+        bloom.add(isbn)
+    assert not bloom.saturated
+    bloom.add("3")
+    assert bloom.saturated
+
+
+def test_every_isbn_may_exist_until_the_filter_is_built(fake_db):
+    assert isbn_service.may_exist("9780000000001")
+
+    load_books(fake_db, ["9780000000001"])
+    assert asyncio.run(isbn_service.rebuild_isbn_filter()) == 1
+    assert isbn_service.may_exist("9780000000001")
+    assert not isbn_service.may_exist("9780000000002")
+
+    isbn_service.remember_isbn("9780000000002")
+    assert isbn_service.may_exist("9780000000002")
+
+
+def test_isbns_remembered_during_a_rebuild_survive_the_swap(fake_db):
+    load_books(fake_db, ["9780000000001", "9780000000002"])
+    scan = fake_db["books"].find
+
+    class InsertingCursor(FakeCursor):
+        async def _iterate(self):
+            async for document in super()._iterate():
+                # A book is created while the scan is under way
+                isbn_service.remember_isbn("9780000000003")
+                yield document
+
+    fake_db["books"].find = lambda *args, **kwargs: InsertingCursor(scan(*args, **kwargs).documents)
+
+    asyncio.run(isbn_service.rebuild_isbn_filter())
+    assert isbn_service.may_exist("9780000000003")
+    assert isbn_service._remembered_during_rebuild is None
+
+
+def test_failed_rebuild_keeps_the_current_filter(fake_db, monkeypatch):
+    current = BloomFilter(capacity=10)
+    current.add("9780000000001")
+    monkeypatch.setattr(isbn_service, "isbn_filter", current)
+
+    def timeout(*args, **kwargs):
+        raise TimeoutError("scan timed out")
+
+    fake_db["books"].find = timeout
+    with pytest.raises(TimeoutError):
+        asyncio.run(isbn_service.rebuild_isbn_filter())
+    assert isbn_service.isbn_filter is current
+    assert isbn_service._remembered_during_rebuild is None
+
+
+def test_background_rebuilds_are_single_flight(monkeypatch):
+    runs = []
+
+    async def rebuild():
+        runs.append(request_id_var.get())
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(isbn_service, "_rebuild_in_background", rebuild)
+
+    async def scenario():
+        request_id_var.set("request-1")
+        isbn_service.schedule_rebuild()
+        isbn_service.schedule_rebuild()
+        await isbn_service._rebuild_task
+        isbn_service.schedule_rebuild()
+        await isbn_service._rebuild_task
+
+    asyncio.run(scenario())
+    # Two runs, neither inheriting the scheduling request's context
+    assert runs == [None, None]
+
+
+def failing_index(code: int):
+    async def create_index(*args, **kwargs):
+        raise OperationFailure("index build failed", code=code)
+    return create_index
+
+
+def test_duplicate_isbns_fail_the_index_step(fake_db):
+    fake_db["books"].create_index = failing_index(DUPLICATE_KEY_ERROR)
+
+    with pytest.raises(RuntimeError, match="app.migrations.isbn13"):
+        asyncio.run(isbn_service.create_indexes())
+
+
+def test_other_index_errors_propagate(fake_db):
+    fake_db["books"].create_index = failing_index(85)
+
+    with pytest.raises(OperationFailure):
+        asyncio.run(isbn_service.create_indexes())
@@ -0,0 +1,31 @@
+import asyncio
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import ExecutionTimeout
+from app.services import job_service
+
+
+async def timing_out(*args, **kwargs):
+    raise ExecutionTimeout("operation exceeded time limit")
+
+
+def test_timed_out_job_read_answers_504(fake_db):
+    fake_db["jobs"].find_one = timing_out
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(job_service.get_job(str(ObjectId())))
+    assert error.value.status_code == 504
+
+
+def test_timed_out_result_read_answers_504(fake_db):
+    job_id = ObjectId()
+    fake_db["jobs"].documents[job_id] = {
+        "_id": job_id, "kind": "rental-report-rebuild", "status": "done", "created_at": datetime.utcnow(), "chunks": 1,
+    }
+    fake_db["job_results"].find_one = timing_out
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(job_service.get_job_result(str(job_id)))
+    assert error.value.status_code == 504
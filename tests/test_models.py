@@ -0,0 +1,23 @@
+from datetime import date, datetime
+import pytest
+from app.models.author import AuthorResponse
+from app.models.book import BookResponse
+from app.models.user import UserResponse
+
+
+def book(published_date) -> BookResponse:
+    return BookResponse(id="1", title="Dom Casmurro", isbn="9788535910663", published_date=published_date)
+
+
+@pytest.mark.parametrize("stored, expected", [
+    (datetime(1899, 1, 1), date(1899, 1, 1)),
+    ("1899-01-01", date(1899, 1, 1)),
+    (None, None),
+    ("1 de janeiro de 1899", None),
+    ("01/01/1899", None),
+    ({"year": 1899}, None),
+])
+def test_unparseable_legacy_dates_read_as_none(stored, expected):
+    assert book(stored).published_date == expected
+    assert UserResponse(id="1", name="Bento", birthdate=stored).birthdate == expected
+    assert AuthorResponse(id="1", name="Machado", nationality="Brasileira", birthdate=stored).birthdate == expected
@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from app.configuration import query_cache as query_cache_module
+from app.configuration.context import force_primary_var
+from app.configuration.database import GENERATIONS_COLLECTION, db
+from app.configuration.query_cache import QueryCache, cached
+from app.configuration.settings import settings
+
+
+@pytest.fixture
+def cache(monkeypatch, fake_db) -> QueryCache:
+    cache = QueryCache(16)
+    monkeypatch.setattr(settings, "QUERY_CACHE_SIZE", 16)
+    monkeypatch.setattr(query_cache_module, "query_cache", cache)
+    return cache
+
+
+def counting_query(*collections):
+    calls = []
+
+    @cached(*collections)
+    async def query(page: int, limit: int = 10, name=None):
+        calls.append(force_primary_var.get())
+        return [{"page": page, "limit": limit, "name": name}]
+
+    return query, calls
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats() == {"entries": 2, "hits_total": 2, "misses_total": 1}
+
+
+def test_calls_with_the_same_arguments_share_an_entry(cache):
+    query, calls = counting_query("books")
+
+    async def scenario():
+        await query(1)
+        await query(1, 10)
+        await query(page=1, limit=10, name=None)
+        await query(2)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert cache.hits == 2
+
+
+def test_results_are_copied_in_and_out(cache):
+    query, _ = counting_query("books")
+
+    async def scenario():
+        first = await query(1)
+        first[0]["name"] = "changed"
+        return await query(1)
+
+    assert asyncio.run(scenario()) == [{"page": 1, "limit": 10, "name": None}]
+
+
+def test_misses_read_the_primary(cache):
+    query, calls = counting_query("books")
+    asyncio.run(query(1))
+    assert calls == [True]
+    assert force_primary_var.get() is False
+
+
+def test_write_invalidates_only_its_collection(cache):
+    books, book_calls = counting_query("books")
+    users, user_calls = counting_query("users")
+
+    async def scenario():
+        await books(1)
+        await users(1)
+        await db.books.update_one({"_id": 1}, {"$set": {"title": "x"}})
+        await books(1)
+        await users(1)
+
+    asyncio.run(scenario())
+    assert len(book_calls) == 2
+    assert len(user_calls) == 1
+
+
+def test_write_from_another_process_invalidates_the_next_lookup(cache, fake_db):
+    query, calls = counting_query("books")
+
+    async def scenario():
+        await query(1)
+        # Another worker bumps the shared counter; this process' local one is untouched
+        await fake_db[GENERATIONS_COLLECTION].update_one({"_id": "books"}, {"$inc": {"generation": 1}}, upsert=True)
+        await query(1)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_failed_write_still_bumps_the_generation(cache, fake_db):
+    query, calls = counting_query("books")
+    fake_db["books"].results["update_one"] = RuntimeError("write failed")
+
+    async def scenario():
+        await query(1)
+        with pytest.raises(RuntimeError):
+            await db.books.update_one({"_id": 1}, {"$set": {"title": "x"}})
+        await query(1)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_unknown_collections_are_rejected():
+    with pytest.raises(ValueError):
+        cached("snapshots")
+
+
+def test_disabled_cache_returns_the_function(monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_CACHE_SIZE", 0)
+
+    async def query():
+        return []
+
+    assert cached("books")(query) is query
+
+
+def test_failed_shared_bump_is_raised_and_still_invalidates_locally(cache, fake_db):
+    query, calls = counting_query("books")
+    fake_db[GENERATIONS_COLLECTION].results["update_one"] = RuntimeError("no primary")
+
+    async def scenario():
+        await query(1)
+        with pytest.raises(RuntimeError, match="no primary"):
+            await db.books.update_one({"_id": 1}, {"$set": {"title": "x"}})
+        await query(1)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert fake_db["books"].called("update_one")
+
+
+def test_shared_bump_outlives_a_cancelled_request(cache, fake_db):
+    async def scenario():
+        write = asyncio.ensure_future(db.books.update_one({"_id": 1}, {"$set": {"title": "x"}}))
+        await asyncio.sleep(0)
+        write.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await write
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert fake_db[GENERATIONS_COLLECTION].documents["books"]["generation"] == 1
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from app.services.read_buffer_service import ReadBooksBuffer
+from .fakes import FakeCollection
+
+USER, OTHER_USER = ObjectId(), ObjectId()
+BOOKS = [ObjectId() for _ in range(4)]
+
+
+@pytest.fixture
+def users(fake_db) -> FakeCollection:
+    return fake_db["users"]
+
+
+def written(users: FakeCollection) -> dict:
+    return {
+        operation._filter["_id"]: set(operation._doc["$addToSet"]["readed_books"]["$each"])
+        for (operations,) in users.called("bulk_write")
+        for operation in operations
+    }
+
+
+def test_ids_are_merged_per_user(users):
+    async def scenario():
+        buffer = ReadBooksBuffer(flush_size=100, max_pending=100)
+        await buffer.add(USER, BOOKS[:2])
+        await buffer.add(USER, BOOKS[1:3])
+        await buffer.add(OTHER_USER, BOOKS[:1])
+        assert len(buffer) == 4
+        assert await buffer.flush() == 2
+        assert len(buffer) == 0
+
+    asyncio.run(scenario())
+    assert len(users.called("bulk_write")) == 1
+    assert written(users) == {USER: set(BOOKS[:3]), OTHER_USER: {BOOKS[0]}}
+
+
+def test_empty_flush_writes_nothing(users):
+    assert asyncio.run(ReadBooksBuffer(flush_size=10, max_pending=10).flush()) == 0
+    assert users.calls == []
+
+
+def test_durable_add_returns_after_the_flush(users):
+    async def scenario():
+        buffer = ReadBooksBuffer(flush_size=100, max_pending=100)
+        add = asyncio.ensure_future(buffer.add(USER, BOOKS[:1], wait=True))
+        await asyncio.sleep(0)
+        assert not add.done()
+        await buffer.flush()
+        await add
+
+    asyncio.run(scenario())
+    assert written(users) == {USER: {BOOKS[0]}}
+
+
+def test_failed_flush_fails_waiters_and_keeps_ids(users):
+    users.results["bulk_write"] = RuntimeError("primary stepped down")
+
+    async def scenario():
+        buffer = ReadBooksBuffer(flush_size=100, max_pending=100)
+        add = asyncio.ensure_future(buffer.add(USER, BOOKS[:2], wait=True))
+        await asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            await buffer.flush()
+        with pytest.raises(RuntimeError):
+            await add
+        assert len(buffer) == 2
+
+        users.results.pop("bulk_write")
+        assert await buffer.flush() == 1
+
+    asyncio.run(scenario())
+    assert written(users) == {USER: set(BOOKS[:2])}
+
+
+def test_full_buffer_flushes_before_accepting_more(users):
+    async def scenario():
+        buffer = ReadBooksBuffer(flush_size=2, max_pending=3)
+        await buffer.add(USER, BOOKS[:3])
+        assert users.calls == []
+        await buffer.add(OTHER_USER, BOOKS[3:])
+        assert len(buffer) == 1
+
+    asyncio.run(scenario())
+    assert written(users) == {USER: set(BOOKS[:3])}
+
+
+def test_reaching_flush_size_wakes_the_flush_loop(users):
+    async def scenario():
+        buffer = ReadBooksBuffer(flush_size=2, max_pending=10)
+        loop = asyncio.ensure_future(buffer.run_flush_loop(interval=3600))
+        await buffer.add(USER, BOOKS[:2], wait=True)
+        loop.cancel()
+
+    asyncio.run(scenario())
+    assert written(users) == {USER: set(BOOKS[:2])}
+
+
+def test_flushed_users_are_marked_dirty_for_the_report(users, fake_db):
+    async def scenario():
+        buffer = ReadBooksBuffer(flush_size=100, max_pending=100)
+        await buffer.add(USER, BOOKS[:1])
+        await buffer.add(OTHER_USER, BOOKS[1:2])
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    (operations,), = fake_db["user_rental_reports_dirty"].called("bulk_write")
+    assert {operation._filter["_id"] for operation in operations} == {USER, OTHER_USER}
+
+
+def test_nothing_is_marked_dirty_when_the_write_fails(users, fake_db):
+    users.results["bulk_write"] = RuntimeError("primary stepped down")
+
+    async def scenario():
+        buffer = ReadBooksBuffer(flush_size=100, max_pending=100)
+        await buffer.add(USER, BOOKS[:1])
+        with pytest.raises(RuntimeError):
+            await buffer.flush()
+
+    asyncio.run(scenario())
+    assert fake_db["user_rental_reports_dirty"].calls == []
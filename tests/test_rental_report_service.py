@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from fastapi import Response
+from pymongo.errors import DuplicateKeyError
+from app.routers import user_router
+from app.services import rental_report_service
+from app.services.rental_report_service import REBUILD_JOB_KIND
+
+
+@pytest.fixture
+def no_inline_refresh(monkeypatch):
+    async def refresh_report(full: bool = False):
+        assert not full, "a full rebuild must not run inside the request"
+        return 0
+
+    monkeypatch.setattr(user_router, "refresh_report", refresh_report)
+
+
+def test_full_refresh_returns_the_running_rebuild_job(fake_db, no_inline_refresh):
+    job_id = ObjectId()
+    fake_db["jobs"].documents[job_id] = {
+        "_id": job_id, "kind": REBUILD_JOB_KIND, "params": {}, "status": "running", "created_at": datetime.utcnow(),
+    }
+    response = Response()
+
+    body = asyncio.run(user_router.refresh_rental_books_libraries(response, full=True))
+
+    assert response.status_code == 202
+    assert body["job"] == str(job_id)
+
+
+def test_full_refresh_submits_a_rebuild_job(fake_db, no_inline_refresh, monkeypatch):
+    submitted = []
+
+    async def submit_job(job):
+        submitted.append(job.kind)
+        return rental_report_service.to_job_response(
+            {"_id": ObjectId(), "kind": job.kind, "status": "queued", "created_at": datetime.utcnow()}
+        )
+
+    monkeypatch.setattr(rental_report_service, "submit_job", submit_job)
+    response = Response()
+
+    asyncio.run(user_router.refresh_rental_books_libraries(response, full=True))
+
+    assert submitted == [REBUILD_JOB_KIND]
+    assert response.status_code == 202
+
+
+USERS = [ObjectId() for _ in range(3)]
+
+
+@pytest.fixture
+def merges(monkeypatch):
+    merged = []
+
+    async def merge_users(refreshed_at, user_ids=None):
+        merged.append(user_ids)
+
+    monkeypatch.setattr(rental_report_service, "_merge_users", merge_users)
+    monkeypatch.setattr(rental_report_service.settings, "REPORT_REFRESH_BATCH", 2)
+    monkeypatch.setattr(rental_report_service.settings, "REPORT_FULL_REBUILD_THRESHOLD", 5)
+    return merged
+
+
+def mark_dirty(fake_db, *user_ids, at=None):
+    for user_id in user_ids:
+        fake_db["user_rental_reports_dirty"].documents[user_id] = {"_id": user_id, "marked_at": at or datetime(2000, 1, 1)}
+
+
+def state_update(fake_db) -> dict:
+    (query, update), = fake_db["report_state"].called("update_one")
+    return update["$set"]
+
+
+def test_first_refresh_rebuilds_everything(fake_db, merges):
+    mark_dirty(fake_db, *USERS)
+
+    asyncio.run(rental_report_service.refresh_report())
+
+    assert merges == [None]
+    assert fake_db["user_rental_reports_dirty"].documents == {}
+    assert "rebuilt_at" in state_update(fake_db)
+
+
+def test_later_refreshes_merge_only_dirty_users_in_batches(fake_db, merges):
+    fake_db["report_state"].documents["user_rental_reports"] = {"_id": "user_rental_reports"}
+    mark_dirty(fake_db, *USERS)
+    marked_again = ObjectId()
+    mark_dirty(fake_db, marked_again, at=datetime(2100, 1, 1))
+
+    assert asyncio.run(rental_report_service.refresh_report()) == 3
+
+    assert [set(batch) for batch in merges] == [set(USERS[:2]), set(USERS[2:])]
+    # Marked after the refresh started: left for the next one
+    assert list(fake_db["user_rental_reports_dirty"].documents) == [marked_again]
+    assert "rebuilt_at" not in state_update(fake_db)
+
+
+def test_large_backlogs_rebuild_everything(fake_db, merges):
+    fake_db["report_state"].documents["user_rental_reports"] = {"_id": "user_rental_reports"}
+    mark_dirty(fake_db, *(ObjectId() for _ in range(6)))
+
+    asyncio.run(rental_report_service.refresh_report())
+
+    assert merges == [None]
+
+
+class StopLoop(Exception):
+    pass
+
+
+def run_one_round(monkeypatch):
+    async def sleep(seconds):
+        raise StopLoop
+
+    monkeypatch.setattr(rental_report_service.asyncio, "sleep", sleep)
+    with pytest.raises(StopLoop):
+        asyncio.run(rental_report_service.run_refresh_loop(60))
+
+
+def test_only_the_lease_holder_refreshes(fake_db, merges, monkeypatch):
+    fake_db["report_state"].results["update_one"] = DuplicateKeyError("held by another worker")
+
+    run_one_round(monkeypatch)
+
+    assert merges == []
+
+
+def test_the_lease_is_taken_when_free_or_own(fake_db, merges, monkeypatch):
+    run_one_round(monkeypatch)
+
+    (query, update), = [args for args in fake_db["report_state"].called("update_one") if args[0]["_id"] == "refresh-lease"]
+    assert query["$or"][0] == {"holder": rental_report_service._lease_holder}
+    assert update["$set"]["holder"] == rental_report_service._lease_holder
+    assert merges == [None]
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from app import main
+from app.configuration.settings import settings
+from app.services import health_service
+
+
+@pytest.fixture
+def startup(monkeypatch):
+    """Startup with the database steps stubbed; the warm-up hangs on its
+    first ``hangs`` attempts."""
+    attempts = []
+
+    async def nothing():
+        pass
+
+    async def start_workers():
+        pass
+
+    def warm_up_hanging(hangs: int):
+        async def warm_up():
+            attempts.append(len(attempts) + 1)
+            if len(attempts) <= hangs:
+                await asyncio.sleep(3600)
+        monkeypatch.setattr(main, "warm_up", warm_up)
+
+    monkeypatch.setattr(health_service, "ping", nothing)
+    monkeypatch.setattr(main, "create_indexes", nothing)
+    monkeypatch.setattr(main.job_service, "start_workers", start_workers)
+    monkeypatch.setattr(main, "start_background_loops", lambda: None)
+    monkeypatch.setattr(health_service, "readiness", health_service.Readiness())
+    monkeypatch.setattr(settings, "STARTUP_WARMUP_SECONDS", 0.01)
+    return warm_up_hanging, attempts
+
+
+def test_ready_only_once_a_warm_up_completes(startup):
+    warm_up_hanging, attempts = startup
+    warm_up_hanging(2)
+
+    async def scenario():
+        task = asyncio.ensure_future(main.start_up())
+        await asyncio.sleep(0.015)
+        assert not health_service.readiness.ready
+        await task
+
+    asyncio.run(scenario())
+    assert attempts == [1, 2, 3]
+    assert health_service.readiness.ready
+
+
+def test_ready_after_a_timeout_when_allowed(startup, monkeypatch):
+    warm_up_hanging, attempts = startup
+    warm_up_hanging(1)
+    monkeypatch.setattr(settings, "STARTUP_READY_ON_WARMUP_TIMEOUT", True)
+
+    asyncio.run(main.start_up())
+    assert attempts == [1]
+    assert health_service.readiness.ready
@@ -0,0 +1,94 @@
+import pytest
+from app.configuration import tracing
+from app.configuration.settings import settings
+from app.configuration.tracing import SpanContext, Trace, start_span
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.traces = []
+
+    def put(self, trace: Trace) -> None:
+        self.traces.append(trace)
+
+
+@pytest.fixture
+def exported(monkeypatch) -> list:
+    queue = RecordingQueue()
+    monkeypatch.setattr(settings, "TRACING_EXPORTER", "file")
+    monkeypatch.setattr(settings, "TRACING_SLOW_SECONDS", 60)
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0)
+    monkeypatch.setattr(tracing, "_export_queue", queue)
+    return queue.traces
+
+
+def test_fast_unsampled_traces_are_dropped(exported):
+    with start_span("request"):
+        with start_span("child"):
+            pass
+    assert exported == []
+
+
+def test_failed_traces_are_kept_whole(exported):
+    with pytest.raises(RuntimeError):
+        with start_span("request"):
+            with start_span("ok"):
+                pass
+            with start_span("failing"):
+                raise RuntimeError("boom")
+
+    trace, = exported
+    assert [span.name for span in trace.spans] == ["request", "ok", "failing"]
+    root, ok, failing = trace.spans
+    assert ok.parent_id == failing.parent_id == root.span_id
+    assert failing.error == "RuntimeError: boom"
+
+
+def test_upstream_sampled_traces_are_kept(exported):
+    parent = SpanContext("1" * 32, "2" * 16, sampled=True)
+    with start_span("request", parent=parent) as span:
+        assert span.traceparent == f"00-{'1' * 32}-{span.span_id}-01"
+    trace, = exported
+    assert trace.trace_id == "1" * 32
+    assert trace.spans[0].parent_id == "2" * 16
+
+
+def test_slow_traces_are_kept(exported, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SLOW_SECONDS", 0)
+    with start_span("request"):
+        pass
+    assert len(exported) == 1
+
+
+def test_sample_rate_keeps_a_share(exported, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1)
+    with start_span("request"):
+        pass
+    assert len(exported) == 1
+
+
+def test_span_limit_counts_dropped_spans(exported, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_MAX_SPANS", 2)
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1)
+    with start_span("request"):
+        for _ in range(3):
+            with start_span("child"):
+                pass
+
+    trace, = exported
+    assert len(trace.spans) == 2
+    assert trace.dropped_spans == 2
+
+
+def test_only_the_local_root_decides(exported, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1)
+    with start_span("request"):
+        with start_span("child"):
+            pass
+        assert exported == []
+    assert len(exported) == 1
+
+
+@pytest.mark.parametrize("value", [None, "", "00-" + "0" * 32 + "-" + "1" * 16 + "-01", "garbage"])
+def test_invalid_traceparents_are_ignored(value):
+    assert tracing.parse_traceparent(value) is None
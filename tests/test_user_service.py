@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.results import UpdateResult
+from app.configuration.settings import settings
+from app.models.user import PopulateBooksUserSchema
+from app.services import user_service
+
+USER, BOOK = ObjectId(), ObjectId()
+
+
+@pytest.fixture
+def user(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "READ_BUFFER_MODE", "off")
+    fake_db["users"].documents[USER] = {"_id": USER}
+    return fake_db["users"]
+
+
+def populate(readed_books=(), rental_books=(), library=None):
+    return asyncio.run(user_service.populate_books(str(USER), PopulateBooksUserSchema(
+        readed_books=list(readed_books), rental_books=list(rental_books), library=library
+    )))
+
+
+def test_new_readed_books_mark_the_user_dirty(user, fake_db):
+    user.results["update_one"] = UpdateResult({"n": 1, "nModified": 1}, acknowledged=True)
+
+    populate([str(BOOK)])
+    (operations,), = fake_db["user_rental_reports_dirty"].called("bulk_write")
+    assert [operation._filter["_id"] for operation in operations] == [USER]
+
+
+def test_known_readed_books_leave_the_report_alone(user, fake_db):
+    user.results["update_one"] = UpdateResult({"n": 1, "nModified": 0}, acknowledged=True)
+
+    with pytest.raises(HTTPException) as error:
+        populate([str(BOOK)])
+    assert error.value.status_code == 404
+    assert fake_db["user_rental_reports_dirty"].calls == []
+
+
+def test_books_without_a_free_copy_conflict(user, monkeypatch):
+    library, rented = ObjectId(), ObjectId()
+
+    async def record_rentals(user_id, book_ids, library_id=None):
+        assert library_id == library
+        return 1, [BOOK]
+
+    monkeypatch.setattr(user_service, "record_rentals", record_rentals)
+
+    with pytest.raises(HTTPException) as error:
+        populate(rental_books=[str(rented), str(BOOK)], library=str(library))
+    assert error.value.status_code == 409
+    assert error.value.detail["unavailable_books"] == [str(BOOK)]
+    assert error.value.detail["added"] == 1